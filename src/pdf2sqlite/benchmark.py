@@ -0,0 +1,400 @@
+import argparse
+import asyncio
+import random
+import sqlite3
+import tempfile
+import time
+import zlib
+from dataclasses import replace
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import sqlite_vec
+from rich.console import Console
+from rich.table import Table
+from rich_argparse import RichHelpFormatter
+
+from .embeddings import store_section_embedding
+from .init_db import init_db
+from .mcp_server.db import Database
+from .search import QueryEmbedder, connect, hybrid_search, keyword_search, search_space, semantic_search
+from .ivf import build_ivf
+from .vector_store import EmbeddingSpace, get_or_create_space, get_space, store_embedding
+
+# p95 latency targets, in milliseconds, for the default benchmark scale
+# (10,000 sections and pages, 1024-dimensional embeddings) on a laptop CPU
+SEARCH_TARGETS_MS = {
+    "keyword": 25.0,
+    "vector": 40.0,
+    "hybrid": 60.0,
+    "filtered": 5.0,
+    "lookup": 1.0,
+}
+
+# minimum mean recall@10 of an IVF index searched with its default probes,
+# and how many times lower its median latency must be than exhaustive search's
+IVF_RECALL_TARGET = 0.9
+IVF_SPEEDUP_TARGET = 3.0
+
+# minimum mean recall@10 of each storage format against exact search, after
+# quantized candidates are re-scored
+RECALL_TARGETS = {
+    "none": 1.0,
+    "int8": 0.95,
+    "bit": 0.9,
+}
+
+
+class SyntheticEmbedder(QueryEmbedder):
+    """Deterministic pseudo-random query vectors, so no API is called"""
+
+    def __init__(self, dimension: int):
+        super().__init__("synthetic")
+        self.dimension = dimension
+
+    def embed(self, query: str) -> np.ndarray:
+        rng = np.random.default_rng(zlib.crc32(query.encode()))
+        return unit_rows(rng.standard_normal((1, self.dimension)))[0]
+
+
+def unit_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = matrix.astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def vocabulary(size: int, rng: random.Random) -> list[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    return sorted(words)
+
+
+def build_synthetic_db(
+        path: Path,
+        sections: int,
+        dimension: int = 1024,
+        seed: int = 0,
+        topics: int = 200,
+) -> np.ndarray:
+    """
+    Fill a fresh database with one page and one section per synthetic document
+    chunk, random page text drawn from a Zipf-like vocabulary and unit section
+    embeddings scattered around random topic centroids, so that they have
+    neighbourhoods like real embeddings do.
+
+    Returns:
+        The section embeddings, in section id order
+    """
+    rng = random.Random(seed)
+    words = vocabulary(5000, rng)
+    weights = [1.0 / (rank + 1) for rank in range(len(words))]
+    vector_rng = np.random.default_rng(seed)
+    centroids = unit_rows(vector_rng.standard_normal((topics, dimension)))
+    vectors = unit_rows(
+        centroids[vector_rng.integers(0, topics, sections)]
+        + unit_rows(vector_rng.standard_normal((sections, dimension)))
+    )
+
+    db = sqlite3.connect(path)
+    cursor = db.cursor()
+    init_db(cursor)
+    space = get_or_create_space(cursor, "synthetic", dimension)
+    pages_per_pdf = 100
+    for index in range(sections):
+        pdf_id = index // pages_per_pdf + 1
+        page_number = index % pages_per_pdf + 1
+        if page_number == 1:
+            cursor.execute(
+                "INSERT INTO pdfs (id, title) VALUES (?,?)",
+                [pdf_id, f"Synthetic manual {pdf_id}"],
+            )
+        text = " ".join(rng.choices(words, weights, k=250))
+        text += f" P/N-{rng.randint(1000, 9999)}"
+        cursor.execute(
+            "INSERT INTO pdf_pages (page_number, text, pdf_id) VALUES (?,?,?)",
+            [page_number, text, pdf_id],
+        )
+        cursor.execute(
+            "INSERT INTO pdf_sections (start_page, title, pdf_id) VALUES (?,?,?)",
+            [page_number - 1, " ".join(rng.sample(words[:2000], 3)), pdf_id],
+        )
+        store_section_embedding(cursor, space, cursor.lastrowid, vectors[index])
+    db.commit()
+    db.close()
+    return vectors
+
+
+def percentile(samples: list[float], q: float) -> float:
+    return float(np.percentile(np.array(samples), q))
+
+
+def time_queries(queries: list[str], fn: Callable[[str], object]) -> list[float]:
+    fn(queries[0])  # warm the page cache
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def bench_search(args: argparse.Namespace, console: Console) -> bool:
+    rng = random.Random(args.seed + 1)
+    words = vocabulary(5000, random.Random(args.seed))
+    queries = [" ".join(rng.sample(words[:3000], 3)) for _ in range(args.queries)]
+    embedder = SyntheticEmbedder(1024)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        console.print(f"Building a synthetic database with {args.sections} sections")
+        build_synthetic_db(path, args.sections, seed=args.seed)
+
+        conn = connect(path)
+        space = search_space(conn, embedder.model_name)
+        # uncached, so that lookups measure the pooled connections
+        database = Database(path, result_cache_entries=0)
+        loop = asyncio.new_event_loop()
+        try:
+            timings = {
+                "keyword": time_queries(
+                    queries, lambda q: keyword_search(conn, q, 50)
+                ),
+                "vector": time_queries(
+                    queries, lambda q: semantic_search(conn, space, embedder.embed(q), 50)
+                ),
+                "hybrid": time_queries(
+                    queries, lambda q: hybrid_search(path, q, embedder, 10, 50)
+                ),
+                # vector search within three of the synthetic manuals
+                "filtered": time_queries(
+                    queries,
+                    lambda q: semantic_search(
+                        conn, space, embedder.embed(q), 50, pdf_ids=[1, 2, 3]
+                    ),
+                ),
+                # a page lookup through the MCP server's pooled connections
+                "lookup": time_queries(
+                    queries,
+                    lambda q: loop.run_until_complete(database.get_page_summary(
+                        1 + zlib.crc32(q.encode()) % args.sections
+                    )),
+                ),
+            }
+        finally:
+            database.close()
+            loop.close()
+            conn.close()
+
+    table = Table(title=f"Search latency, {args.sections} sections, {args.queries} queries")
+    for column in ("path", "p50 ms", "p95 ms", "target p95 ms", ""):
+        table.add_column(column)
+    met = True
+    scale = args.sections / 10_000
+    for name, samples in timings.items():
+        p95 = percentile(samples, 95)
+        # brute-force search grows linearly, so scale the targets with the
+        # corpus, except for filtered search, which only scans its partitions,
+        # and lookups by key
+        unscaled = name in ("filtered", "lookup")
+        target = SEARCH_TARGETS_MS[name] * (1.0 if unscaled else max(scale, 1.0))
+        ok = p95 <= target
+        met = met and ok
+        table.add_row(
+            name,
+            f"{percentile(samples, 50):.2f}",
+            f"{p95:.2f}",
+            f"{target:g}",
+            "[green]ok" if ok else "[red]missed",
+        )
+    console.print(table)
+    return met
+
+
+def near_queries(
+        vectors: np.ndarray,
+        count: int,
+        rng: np.random.Generator,
+) -> tuple[np.ndarray, list[set[int]]]:
+    """
+    Queries near randomly chosen stored sections, and the ids of the ten
+    sections nearest each one by exact search
+    """
+    queries = unit_rows(
+        vectors[rng.integers(0, len(vectors), count)]
+        + unit_rows(rng.standard_normal((count, vectors.shape[1])))
+    )
+    truth = [set((np.argsort(-(vectors @ query))[:10] + 1).tolist()) for query in queries]
+    return queries, truth
+
+
+def measure_recall(
+        conn: sqlite3.Connection,
+        space: EmbeddingSpace,
+        queries: np.ndarray,
+        truth: list[set[int]],
+        probes: int | None = None,
+) -> tuple[float, list[float]]:
+    """Mean recall@10 of semantic search in a space, and its latencies"""
+    hits: list[set[int]] = []
+
+    def run(index: int) -> None:
+        rows = semantic_search(conn, space, queries[index], 10, probes)
+        hits.append({row["id"] for row in rows})
+
+    timings = time_queries(list(range(len(queries))), run)
+    # the first search only warms the cache
+    recall = np.mean([len(found & expected) / 10 for found, expected in zip(hits[1:], truth)])
+    return float(recall), timings
+
+
+def bench_quantization(args: argparse.Namespace, console: Console) -> bool:
+    dimension = 1024
+    rng = np.random.default_rng(args.seed + 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        console.print(f"Building a synthetic database with {args.sections} sections")
+        vectors = build_synthetic_db(path, args.sections, dimension, seed=args.seed)
+
+        db = sqlite3.connect(path)
+        db.enable_load_extension(True)
+        sqlite_vec.load(db)
+        cursor = db.cursor()
+        spaces = {"none": get_space(cursor, "synthetic")}
+        for quantization in ("int8", "bit"):
+            console.print(f"Storing {quantization} vectors")
+            space = get_or_create_space(
+                cursor, f"synthetic-{quantization}", dimension, quantization=quantization
+            )
+            for section_id, vector in enumerate(vectors, start=1):
+                store_embedding(cursor, space, section_id, vector)
+            spaces[quantization] = space
+        db.commit()
+        db.close()
+
+        queries, truth = near_queries(vectors, args.queries, rng)
+        conn = connect(path)
+        results = {}
+        try:
+            for quantization, space in spaces.items():
+                results[quantization] = measure_recall(conn, space, queries, truth)
+        finally:
+            conn.close()
+
+    table = Table(title=f"Quantized search, {args.sections} sections, {args.queries} queries")
+    for column in ("storage", "bytes/vector", "recall@10", "target recall", "p50 ms", "p95 ms", ""):
+        table.add_column(column)
+    bytes_per_vector = {"none": dimension * 4, "int8": dimension, "bit": dimension // 8}
+    met = True
+    for quantization, (recall, timings) in results.items():
+        ok = recall >= RECALL_TARGETS[quantization]
+        met = met and ok
+        table.add_row(
+            quantization,
+            str(bytes_per_vector[quantization]),
+            f"{recall:.3f}",
+            f"{RECALL_TARGETS[quantization]:.2f}",
+            f"{percentile(timings, 50):.2f}",
+            f"{percentile(timings, 95):.2f}",
+            "[green]ok" if ok else "[red]missed",
+        )
+    console.print(table)
+    console.print(
+        "bytes/vector counts the vec0 table searched first; quantized spaces "
+        f"also keep {dimension * 4} bytes per vector for re-scoring"
+    )
+    return met
+
+
+def bench_ivf(args: argparse.Namespace, console: Console) -> bool:
+    rng = np.random.default_rng(args.seed + 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        console.print(f"Building a synthetic database with {args.sections} sections")
+        vectors = build_synthetic_db(path, args.sections, seed=args.seed)
+
+        db = sqlite3.connect(path)
+        db.enable_load_extension(True)
+        sqlite_vec.load(db)
+        cursor = db.cursor()
+        console.print("Building the IVF index")
+        start = time.perf_counter()
+        indexed = build_ivf(cursor, get_space(cursor, "synthetic"), seed=args.seed)
+        build_seconds = time.perf_counter() - start
+        db.commit()
+        db.close()
+
+        queries, truth = near_queries(vectors, args.queries, rng)
+        default = indexed.ivf_probes
+        probe_counts = sorted({
+            probes for probes in (1, max(1, default // 2), default, default * 2, default * 4)
+            if probes <= indexed.ivf_lists
+        })
+        conn = connect(path)
+        try:
+            results = {"exhaustive": measure_recall(conn, replace(indexed, ivf_lists=0), queries, truth)}
+            for probes in probe_counts:
+                results[probes] = measure_recall(conn, indexed, queries, truth, probes)
+        finally:
+            conn.close()
+
+    table = Table(
+        title=f"IVF search, {args.sections} sections in {indexed.ivf_lists} lists, "
+        f"{args.queries} queries, built in {build_seconds:.1f}s"
+    )
+    for column in ("probes", "recall@10", "p50 ms", "p95 ms", ""):
+        table.add_column(column)
+    recall = results[default][0]
+    for probes, (probe_recall, timings) in results.items():
+        note = ""
+        if probes == default:
+            note = "[green]default" if recall >= IVF_RECALL_TARGET else "[red]default, missed"
+        table.add_row(
+            str(probes),
+            f"{probe_recall:.3f}",
+            f"{percentile(timings, 50):.2f}",
+            f"{percentile(timings, 95):.2f}",
+            note,
+        )
+    console.print(table)
+    speedup = percentile(results["exhaustive"][1], 50) / percentile(results[default][1], 50)
+    fast = speedup >= IVF_SPEEDUP_TARGET
+    console.print(
+        f"{'[green]' if fast else '[red]'}default probes are {speedup:.1f}x faster "
+        f"than exhaustive search, against a target of {IVF_SPEEDUP_TARGET:g}x"
+    )
+    return recall >= IVF_RECALL_TARGET and fast
+
+
+BENCHMARKS = {
+    "search": bench_search,
+    "quantization": bench_quantization,
+    "ivf": bench_ivf,
+}
+
+
+def benchmark_main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="pdf2sqlite benchmark",
+        description="Run retrieval benchmarks against a synthetic database",
+        formatter_class=RichHelpFormatter,
+    )
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS),
+                        help = "Which benchmark to run")
+    parser.add_argument("-n", "--sections", type=int, default=10_000,
+                        help = "Number of synthetic sections (and pages)")
+    parser.add_argument("-q", "--queries", type=int, default=100,
+                        help = "Number of queries to time")
+    parser.add_argument("--seed", type=int, default=0,
+                        help = "Seed for the synthetic data")
+    parser.add_argument("--check", action = "store_true",
+                        help = "Exit with an error if a latency target is missed")
+    args = parser.parse_args(argv)
+
+    console = Console()
+    met = BENCHMARKS[args.benchmark](args, console)
+    if args.check and not met:
+        raise SystemExit(1)
@@ -0,0 +1,100 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+# chunk size and overlap, in tokens, for chunk-level embeddings
+CHUNK_TOKENS = 512
+CHUNK_OVERLAP_TOKENS = 64
+
+
+@dataclass(frozen=True)
+class Chunk:
+    index: int
+    char_start: int
+    char_end: int
+    start_page: int
+    end_page: int
+    text: str
+
+
+def last_space(text: str, lo: int, hi: int) -> int:
+    """Position of the last whitespace character in text[lo:hi], or -1"""
+    for i in range(hi - 1, lo - 1, -1):
+        if text[i].isspace():
+            return i
+    return -1
+
+
+def chunk_spans(text: str, chunk_chars: int, overlap_chars: int) -> List[Tuple[int, int]]:
+    """
+    Split a text into overlapping spans of at most chunk_chars characters
+
+    Spans end at whitespace where possible, so that words aren't cut, and
+    each span starts roughly overlap_chars before the end of the previous
+    one. Leading and trailing whitespace is trimmed from every span, and
+    whitespace-only spans are dropped.
+
+    Returns:
+        (start, end) character offsets into text
+    """
+    if chunk_chars <= 0:
+        raise ValueError("chunk_chars must be positive")
+    overlap_chars = max(0, min(overlap_chars, chunk_chars // 2))
+
+    spans = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        if end < len(text) and not text[end].isspace():
+            cut = last_space(text, start + chunk_chars // 2, end)
+            if cut > start:
+                end = cut
+
+        trimmed_start = start
+        while trimmed_start < end and text[trimmed_start].isspace():
+            trimmed_start += 1
+        trimmed_end = end
+        while trimmed_end > trimmed_start and text[trimmed_end - 1].isspace():
+            trimmed_end -= 1
+        if trimmed_end > trimmed_start:
+            spans.append((trimmed_start, trimmed_end))
+
+        if end >= len(text):
+            break
+        next_start = max(end - overlap_chars, start + 1)
+        if next_start < end and not text[next_start - 1].isspace():
+            # start the overlap at the beginning of a word
+            cut = last_space(text, next_start, end)
+            if cut >= 0:
+                next_start = cut + 1
+        start = next_start
+    return spans
+
+
+def page_at(page_offsets: Sequence[Tuple[int, int]], offset: int, default: int) -> int:
+    """The page that the character at offset was extracted from"""
+    if not page_offsets:
+        return default
+    position = bisect_right([start for _, start in page_offsets], offset) - 1
+    return page_offsets[max(position, 0)][0]
+
+
+def chunk_section(section: Dict, chunk_chars: int, overlap_chars: int) -> List[Chunk]:
+    """
+    Split the text of an extracted section into overlapping chunks, each
+    recording the (zero-based) pages it spans
+    """
+    text = section['text']
+    offsets = section.get('page_offsets', [])
+    start_page = section['start_page']
+    return [
+        Chunk(
+            index=index,
+            char_start=start,
+            char_end=end,
+            start_page=page_at(offsets, start, start_page),
+            end_page=page_at(offsets, end - 1, start_page),
+            text=text[start:end],
+        )
+        for index, (start, end) in enumerate(chunk_spans(text, chunk_chars, overlap_chars))
+    ]
@@ -1,17 +1,78 @@
 import sys
 import re
+import hashlib
 import litellm
 import numpy as np
-from collections import Counter
-from sklearn.cluster import KMeans
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, replace
 from typing import List, Dict, Tuple
 
+from .chunking import CHUNK_OVERLAP_TOKENS, CHUNK_TOKENS, Chunk, chunk_section
+from .keywords import count_terms, section_keywords
+from .topics import TOPIC_COUNT, refresh_topic_labels, update_topics
+from .vector_store import EmbeddingSpace, delete_embeddings, get_or_create_space, store_embedding
+
+# embedding dimension of each model that has been probed during this run
+_probed_dimensions: Dict[str, int] = {}
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def describe(self) -> str:
+        return f"{self.hits}/{self.lookups} hits ({self.hit_rate:.0%})"
+
+
+# embedding cache hits and misses for this run
+cache_stats = CacheStats()
+
+# embedding requests sent at once
+EMBEDDING_CONCURRENCY = 4
+
+
+# the text embedded for each kind of asset in a PDF, as an id followed by
+# parts that are joined with newlines
+ASSET_TEXT_QUERIES = {
+    "page": "SELECT id, gist FROM pdf_pages WHERE pdf_id = ? AND gist IS NOT NULL",
+    "figure": """
+        SELECT DISTINCT pdf_figures.id, pdf_figures.description
+        FROM pdf_figures
+        JOIN page_to_figure ON page_to_figure.figure_id = pdf_figures.id
+        JOIN pdf_pages ON pdf_pages.id = page_to_figure.page_id
+        WHERE pdf_pages.pdf_id = ? AND pdf_figures.description IS NOT NULL
+    """,
+    "table": """
+        SELECT id, caption_above, description, text, caption_below
+        FROM pdf_tables
+        WHERE pdf_id = ?
+    """,
+}
+
+
+@dataclass(frozen=True)
+class EmbeddingLimits:
+    """How much text one embedding request may carry"""
+    max_item_tokens: int = 2048
+    max_batch_tokens: int = 16384
+    max_batch_items: int = 128
+
 def process_pdf_for_semantic_search(
         toc_and_sections,
         cursor,
         pdf_id,
         model_name: str = "mistral/mistral-embed",
-        n_clusters: int = 5
+        n_clusters: int = TOPIC_COUNT,
+        quantization: str | None = None
 ):
     """
     Process a PDF for semantic search capabilities
@@ -21,7 +82,8 @@ def process_pdf_for_semantic_search(
         cursor: SQLite cursor
         db: SQLite database connection
         model_name: Embedding model to use (OpenAI, AWS Bedrock, HuggingFace)
-        n_clusters: Number of clusters for topic extraction
+        n_clusters: Number of topics in the corpus-wide topic model
+        quantization: How new embedding spaces store vectors (none, int8 or bit)
 
     Returns:
         Dictionary with section embeddings and topics
@@ -33,10 +95,19 @@ def process_pdf_for_semantic_search(
 
     print(f"Generating embeddings for {len(toc_and_sections['sections'])} sections")
 
-    # Step 1: Prepare section texts for embedding
-    section_texts = []
+    # Step 1: Split section texts into overlapping chunks
     section_info = []
 
+    print(f"Setting up embedding model: {model_name}...")
+    dimension = setup_embedding_client(model_name)
+    if dimension is None:
+        print("Failed to setup embedding client. Exiting.")
+        return None
+    section_space = get_or_create_space(cursor, model_name, dimension, quantization=quantization)
+    chunk_space = get_or_create_space(
+        cursor, model_name, dimension, target="chunk", quantization=quantization
+    )
+
     # Retrieve section IDs from database
     for section_id, section_data in toc_and_sections['sections'].items():
         title = section_data['title']
@@ -46,60 +117,112 @@ def process_pdf_for_semantic_search(
         if db_section_id_row:
             db_section_id = db_section_id_row[0]
             cleaned_text = clean_text(section_data['text'])
-
-            if len(cleaned_text.strip()) > 50:
-                section_texts.append(cleaned_text)
-                section_info.append({
-                    'db_id': db_section_id,
-                    'section_id': section_id,
-                    'title': title,
-                    'text': cleaned_text
-                })
-
-    if not section_texts:
+            if not cleaned_text:
+                continue
+
+            chunk_chars, overlap_chars = chunk_size_in_chars(section_data['text'], model_name)
+            chunks = []
+            for chunk in chunk_section(section_data, chunk_chars, overlap_chars):
+                chunk_text = clean_text(chunk.text)
+                if chunk_text:
+                    chunks.append(replace(chunk, index=len(chunks), text=chunk_text))
+            chunk_ids = store_section_chunks(cursor, chunk_space, db_section_id, chunks)
+            section_info.append({
+                'db_id': db_section_id,
+                'section_id': section_id,
+                'title': title,
+                'text': cleaned_text,
+                'chunk_ids': chunk_ids,
+                'chunk_texts': [chunk.text for chunk in chunks],
+            })
+
+    section_info = [section for section in section_info if section['chunk_ids']]
+    if not section_info:
         print("No valid sections found for embedding.")
         return None
 
-    print(f"Prepared {len(section_texts)} sections for embedding")
+    chunk_texts = [text for section in section_info for text in section['chunk_texts']]
+    print(f"Prepared {len(chunk_texts)} chunks from {len(section_info)} sections for embedding")
 
     # Step 2: Generate embeddings
-    print(f"Setting up embedding model: {model_name}...")
-    if not setup_embedding_client(model_name):
-        print("Failed to setup embedding client. Exiting.")
-        return None
-
     print(f"Generating embeddings using {model_name}...")
-    embeddings = get_embeddings(section_texts, model_name)
+    chunk_embeddings = iter(get_embeddings(chunk_texts, model_name, cursor))
 
-    # Step 3: Store embeddings in database
+    # Step 3: Store embeddings in database, with each section represented by
+    # the normalized mean of its chunks
     print("Storing embeddings in database...")
-    for i, section in enumerate(section_info):
-        store_section_embedding(cursor, section['db_id'], embeddings[i])
-
-        # Extract and store keywords
-        keywords = extract_keywords(section['text'])
-        store_section_keywords(cursor, section['db_id'], keywords)
-
-    # Step 4: Cluster sections for topic extraction
-    print(f"Clustering sections using KMeans with {n_clusters} clusters...")
-    cluster_labels, cluster_info = cluster_texts(embeddings, [s['text'] for s in section_info], n_clusters)
-
-    # Step 6: Store topics and section-topic relationships
-    print("Storing topics and section-topic relationships...")
-    for cluster_id, info in cluster_info.items():
-        topic_name = info.get('name', f"Topic {cluster_id}")
-        topic_description = ", ".join(info.get('keywords', []))
-        create_or_get_topic(cursor, cluster_id, name=topic_name, description=topic_description)
-
-    for i, (label, section) in enumerate(zip(cluster_labels, section_info)):
-        store_section_topic(cursor, section['db_id'], label)
-
-# TODO this would be a natural place to return data about the dimension of the
-# embedding vectors
-def setup_embedding_client(model_name: str = "mistral/mistral-embed"):
+    embeddings = []
+    for section in section_info:
+        vectors = []
+        for chunk_id in section['chunk_ids']:
+            vector = next(chunk_embeddings)
+            store_embedding(cursor, chunk_space, chunk_id, vector)
+            vectors.append(vector)
+        embedding = mean_embedding(vectors)
+        embeddings.append(embedding)
+        store_section_embedding(cursor, section_space, section['db_id'], embedding)
+
+    # Count the terms of all of the sections at once, for their TF-IDF
+    # keywords and for the labels of the topics they join
+    section_ids = [section['db_id'] for section in section_info]
+    matrix, terms = count_terms([section['text'] for section in section_info])
+    for section_id, keywords in zip(section_ids, section_keywords(cursor, section_ids, matrix, terms)):
+        store_section_keywords(cursor, section_id, keywords)
+
+    # Step 4: Fold the sections into the corpus-wide topic model
+    print("Updating the corpus topic model...")
+    update_topics(cursor, model_name, section_ids, embeddings, n_clusters, (matrix, terms))
+    relabelled = refresh_topic_labels(cursor, model_name)
+    if relabelled:
+        print(f"Relabelled {relabelled} topics")
+
+def embed_pdf_assets(
+        cursor,
+        pdf_id,
+        targets: List[str],
+        model_name: str = "mistral/mistral-embed",
+        quantization: str | None = None
+):
+    """
+    Embed the page gists, figure descriptions or tables of a PDF, each kind
+    in its own embedding space
+
+    Args:
+        cursor: SQLite cursor
+        pdf_id: The PDF whose assets are embedded
+        targets: Kinds of asset to embed: "page", "figure" and/or "table"
+        model_name: Embedding model to use
+        quantization: How new embedding spaces store vectors (none, int8 or bit)
+    """
+    dimension = setup_embedding_client(model_name)
+    if dimension is None:
+        print("Failed to setup embedding client, skipping page and asset embeddings.")
+        return
+
+    for target in targets:
+        items = []
+        for row in cursor.execute(ASSET_TEXT_QUERIES[target], [pdf_id]).fetchall():
+            text = clean_text("\n".join(part for part in row[1:] if part))
+            if text:
+                items.append((row[0], text))
+        if not items:
+            continue
+
+        space = get_or_create_space(
+            cursor, model_name, dimension, target=target, quantization=quantization
+        )
+        print(f"Embedding {len(items)} {target}s using {model_name}...")
+        vectors = get_embeddings([text for _, text in items], model_name, cursor)
+        for (item_id, _), vector in zip(items, vectors):
+            store_embedding(cursor, space, item_id, vector)
+
+def setup_embedding_client(model_name: str = "mistral/mistral-embed") -> int | None:
     """
     Set up LiteLLM client for embeddings
 
+    The model is probed with a test embedding the first time it is used in a
+    run, and the dimension it reports is cached for later PDFs.
+
     Args:
         model_name: Name of the embedding model to use
                    Options: "mistral/mistral-embed" (Mistral),
@@ -108,9 +231,12 @@ def setup_embedding_client(model_name: str = "mistral/mistral-embed"):
                            "huggingface/sentence-transformers/all-MiniLM-L6-v2"
 
     Returns:
-        True if setup successful, False otherwise
+        The dimension of the model's embeddings if setup is successful, None otherwise
     """
 
+    if model_name in _probed_dimensions:
+        return _probed_dimensions[model_name]
+
     try:
         # Test the embedding model with a simple query
         test_response = litellm.embedding(
@@ -119,11 +245,13 @@ def setup_embedding_client(model_name: str = "mistral/mistral-embed"):
         )
 
         if test_response and test_response.data:
-            print(f"Successfully configured embedding model: {model_name}")
-            return True
+            dimension = len(test_response.data[0].embedding)
+            print(f"Successfully configured embedding model: {model_name} ({dimension} dimensions)")
+            _probed_dimensions[model_name] = dimension
+            return dimension
         else:
             print(f"Failed to configure embedding model: {model_name}")
-            return False
+            return None
 
     except Exception as e:
         print(f"Error setting up LiteLLM embedding client: {e}")
@@ -132,7 +260,7 @@ def setup_embedding_client(model_name: str = "mistral/mistral-embed"):
         print("- For OpenAI: Set OPENAI_API_KEY environment variable")
         print("- For AWS Bedrock: Set AWS credentials (AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY)")
         print("- For Hugging Face: Set HUGGINGFACE_API_KEY environment variable")
-        return False
+        return None
 
 def clean_text(text: str) -> str:
     """
@@ -150,70 +278,258 @@ def clean_text(text: str) -> str:
     text = re.sub(r'[^\w\s\.\,\;\:\?\!]', '', text)
     return text.strip()
 
-def get_embeddings(texts: List[str], model_name: str = "mistral/mistral-embed") -> List[np.ndarray]:
+def text_hash(text: str) -> str:
+    """Key for the embedding cache: the SHA-256 of the text that is embedded"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def lookup_cached_embeddings(cursor, model_name: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+    """Fetch cached embeddings for the given text hashes"""
+    found = {}
+    unique = list(dict.fromkeys(hashes))
+    # stay well below SQLite's limit on bound parameters
+    for i in range(0, len(unique), 500):
+        chunk = unique[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(
+            "SELECT text_hash, embedding FROM embedding_cache "
+            f"WHERE model = ? AND text_hash IN ({placeholders})",
+            [model_name, *chunk]
+        )
+        for key, blob in cursor.fetchall():
+            found[key] = np.frombuffer(blob, dtype=np.float32).copy()
+    return found
+
+def store_cached_embedding(cursor, model_name: str, key: str, embedding: np.ndarray):
+    cursor.execute(
+        "INSERT OR REPLACE INTO embedding_cache (model, text_hash, embedding) VALUES (?, ?, ?)",
+        [model_name, key, embedding.astype(np.float32).tobytes()]
+    )
+
+def get_embeddings(texts: List[str], model_name: str = "mistral/mistral-embed", cursor=None) -> List[np.ndarray]:
     """
     Get embeddings using LiteLLM (supports multiple providers)
 
+    When a cursor is supplied, embeddings are looked up in the database's
+    embedding cache first, and only texts that aren't cached (counting each
+    distinct text once) are sent to the API. New embeddings are added to the
+    cache.
+
     Args:
         texts: List of text strings to embed
         model_name: Name of the embedding model to use
+        cursor: SQLite cursor for the embedding cache, optional
 
     Returns:
         List of embedding vectors as numpy arrays
     """
 
-    embeddings = []
-    batch_size = 20  # Adjust based on API limits
+    if cursor is None:
+        return request_embeddings(texts, model_name)
+
+    hashes = [text_hash(text) for text in texts]
+    cached = lookup_cached_embeddings(cursor, model_name, hashes)
+
+    missing = {}
+    for key, text in zip(hashes, texts):
+        if key not in cached and key not in missing:
+            missing[key] = text
+
+    stats = CacheStats(hits=len(texts) - len(missing), misses=len(missing))
+    cache_stats.hits += stats.hits
+    cache_stats.misses += stats.misses
+    print(f"Embedding cache: {stats.describe()}")
+
+    if missing:
+        fresh = request_embeddings(list(missing.values()), model_name)
+        for key, embedding in zip(missing, fresh):
+            store_cached_embedding(cursor, model_name, key, embedding)
+            cached[key] = embedding
 
-    print(f"Generating embeddings for {len(texts)} texts using {model_name}")
+    return [cached[key] for key in hashes]
 
-    for i in range(0, len(texts), batch_size):
-        batch_texts = texts[i:i + batch_size]
-        print(f"Processing batch {i // batch_size + 1}/{(len(texts) + batch_size - 1) // batch_size}")
+def count_tokens(text: str, model_name: str) -> int:
+    """Estimate the number of tokens the model will see in a text"""
+    try:
+        return litellm.token_counter(model=model_name, text=text)
+    except Exception:
+        # roughly four characters per token for English prose
+        return len(text) // 4 + 1
+
+def embedding_limits(model_name: str) -> EmbeddingLimits:
+    """Look up the model's input limit, falling back to conservative defaults"""
+    defaults = EmbeddingLimits()
+    try:
+        max_input = litellm.get_model_info(model_name).get("max_input_tokens")
+    except Exception:
+        max_input = None
+    if not max_input:
+        return defaults
+    return EmbeddingLimits(
+        max_item_tokens=max_input,
+        max_batch_tokens=max(defaults.max_batch_tokens, max_input),
+        max_batch_items=defaults.max_batch_items,
+    )
 
-        try:
-            # Truncate texts if too long
-            truncated_texts = []
-            for text in batch_texts:
-                if len(text) > 8000:  # Conservative limit
-                    truncated_texts.append(text[:8000])
-                else:
-                    truncated_texts.append(text)
+def truncate_to_tokens(text: str, tokens: int, max_tokens: int, model_name: str) -> Tuple[str, int]:
+    """Shorten a text until its estimated token count fits within max_tokens"""
+    while tokens > max_tokens:
+        # cut proportionally, with some slack since tokens aren't evenly spread
+        text = text[:max(1, int(len(text) * max_tokens / tokens * 0.95))]
+        tokens = count_tokens(text, model_name)
+    return text, tokens
+
+def pack_batches(token_counts: List[int], limits: EmbeddingLimits) -> List[List[int]]:
+    """
+    Group texts into requests, in order, filling each request up to the
+    token and item limits
+
+    Returns:
+        The indices of the texts in each batch
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+    for index, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > limits.max_batch_tokens
+                        or len(current) >= limits.max_batch_items):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def embed_batch(texts: List[str], model_name: str) -> List[np.ndarray]:
+    response = litellm.embedding(model=model_name, input=texts)
+    if len(response.data) != len(texts):
+        raise ValueError(f"expected {len(texts)} embeddings, got {len(response.data)}")
+    return [np.array(item.embedding, dtype=np.float32) for item in response.data]
+
+def request_embeddings(
+        texts: List[str],
+        model_name: str = "mistral/mistral-embed",
+        limits: EmbeddingLimits | None = None,
+        concurrency: int = EMBEDDING_CONCURRENCY,
+) -> List[np.ndarray]:
+    """
+    Request embeddings from the embedding API
+
+    Texts longer than the model accepts are truncated, and the rest are
+    packed into as few requests as the token and item limits allow. Up to
+    `concurrency` requests are in flight at once.
+
+    Args:
+        texts: List of text strings to embed
+        model_name: Name of the embedding model to use
+        limits: Request limits, looked up from the model if not given
+        concurrency: Maximum number of simultaneous requests
+
+    Returns:
+        List of embedding vectors as numpy arrays, in the order of texts
+    """
 
-            # Get embeddings using LiteLLM
-            response = litellm.embedding(
-                model=model_name,
-                input=truncated_texts
-            )
+    if not texts:
+        return []
+    if limits is None:
+        limits = embedding_limits(model_name)
 
-            # Extract embeddings from response
-            batch_embeddings = []
-            for embedding_obj in response.data:
-                embedding = np.array(embedding_obj.embedding, dtype=np.float32)
-                batch_embeddings.append(embedding)
+    prepared = []
+    token_counts = []
+    for text in texts:
+        text, tokens = truncate_to_tokens(
+            text, count_tokens(text, model_name), limits.max_item_tokens, model_name
+        )
+        prepared.append(text)
+        token_counts.append(tokens)
 
-            embeddings.extend(batch_embeddings)
+    batches = pack_batches(token_counts, limits)
+    print(f"Generating embeddings for {len(texts)} texts in {len(batches)} requests using {model_name}")
 
-        except Exception as e:
-            print(f"Error getting embeddings for batch {i // batch_size + 1}: {e}")
-            sys.exit(1)
+    embeddings: List[np.ndarray | None] = [None] * len(texts)
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(batches)))) as pool:
+        futures = {
+            pool.submit(embed_batch, [prepared[i] for i in batch], model_name): number
+            for number, batch in enumerate(batches)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            number = futures[future]
+            try:
+                batch_embeddings = future.result()
+            except Exception as e:
+                print(f"Error getting embeddings for batch {number + 1}: {e}")
+                for pending in futures:
+                    pending.cancel()
+                sys.exit(1)
+            for index, embedding in zip(batches[number], batch_embeddings):
+                embeddings[index] = embedding
+            print(f"Processed batch {done}/{len(batches)}")
 
     print(f"Generated {len(embeddings)} embeddings")
     return embeddings
 
-def store_section_embedding(cursor, section_id, embedding):
-    """Store embedding for a PDF section using sqlite-vec storage"""
+def chunk_size_in_chars(text: str, model_name: str) -> Tuple[int, int]:
+    """Convert the chunk size and overlap from tokens to characters of this text"""
+    chars_per_token = max(len(text), 1) / max(count_tokens(text, model_name), 1)
+    return (
+        max(1, int(CHUNK_TOKENS * chars_per_token)),
+        int(CHUNK_OVERLAP_TOKENS * chars_per_token),
+    )
 
-    # Insert embedding into vec0 table and get the rowid
-    cursor.execute("INSERT INTO section_embeddings_vec(embedding) VALUES (?)", [embedding.astype(np.float32)])
-    vec_rowid = cursor.lastrowid
+def store_section_chunks(cursor, space: EmbeddingSpace, section_id, chunks: List[Chunk]) -> List[int]:
+    """
+    Store the chunks of a section, replacing any from a previous ingest
 
-    # Store the mapping between section_id and vec table rowid
+    Chunks keep their ids when a section is re-ingested, so their embeddings
+    are updated in place. Surplus chunks, and their embeddings, are removed.
+
+    Returns:
+        The ids of the chunks, in order
+    """
+    chunk_ids = []
+    for chunk in chunks:
+        cursor.execute(
+            """
+            INSERT INTO section_chunks
+                (section_id, chunk_index, start_page, end_page, char_start, char_end, text)
+            VALUES (?,?,?,?,?,?,?)
+            ON CONFLICT(section_id, chunk_index) DO UPDATE SET
+                start_page = excluded.start_page,
+                end_page = excluded.end_page,
+                char_start = excluded.char_start,
+                char_end = excluded.char_end,
+                text = excluded.text
+            """,
+            [section_id, chunk.index, chunk.start_page, chunk.end_page,
+             chunk.char_start, chunk.char_end, chunk.text]
+        )
+        row = cursor.execute(
+            "SELECT id FROM section_chunks WHERE section_id = ? AND chunk_index = ?",
+            [section_id, chunk.index]
+        ).fetchone()
+        chunk_ids.append(row[0])
+
+    surplus = cursor.execute(
+        "SELECT id FROM section_chunks WHERE section_id = ? AND chunk_index >= ?",
+        [section_id, len(chunks)]
+    ).fetchall()
+    delete_embeddings(cursor, space, [row[0] for row in surplus])
     cursor.execute(
-        "INSERT OR REPLACE INTO section_vec_mapping (section_id, vec_rowid) VALUES (?, ?)",
-        [section_id, vec_rowid]
+        "DELETE FROM section_chunks WHERE section_id = ? AND chunk_index >= ?",
+        [section_id, len(chunks)]
     )
-    return vec_rowid
+    return chunk_ids
+
+def mean_embedding(vectors: List[np.ndarray]) -> np.ndarray:
+    """The mean of some embeddings, scaled to unit length"""
+    mean = np.mean(np.stack(vectors), axis=0).astype(np.float32)
+    norm = np.linalg.norm(mean)
+    return mean / norm if norm > 0 else mean
+
+def store_section_embedding(cursor, space: EmbeddingSpace, section_id, embedding):
+    """Store embedding for a PDF section in an embedding space, replacing any previous one"""
+    return store_embedding(cursor, space, section_id, embedding)
 
 
 def store_section_keywords(cursor, section_id, keywords):
@@ -239,192 +555,3 @@ def store_section_keywords(cursor, section_id, keywords):
             [section_id, keywords_str]
         )
         return cursor.lastrowid
-
-def store_section_topic(cursor, section_id, topic_id, confidence=1.0):
-    """Store topic/cluster assignment for a PDF section"""
-    # Check if topic assignment already exists
-    cursor.execute(
-        "SELECT id FROM section_topics WHERE section_id = ? AND topic_id = ?",
-        [section_id, topic_id]
-    )
-    existing_id = cursor.fetchone()
-
-    if existing_id:
-        # Update existing topic assignment
-        cursor.execute(
-            "UPDATE section_topics SET confidence = ? WHERE section_id = ? AND topic_id = ?",
-            [confidence, section_id, topic_id]
-        )
-        return existing_id[0]
-    else:
-        # Insert new topic assignment
-        cursor.execute(
-            "INSERT INTO section_topics (section_id, topic_id, confidence) VALUES (?, ?, ?)",
-            [section_id, topic_id, confidence]
-        )
-        return cursor.lastrowid
-
-def cluster_texts(embeddings: List[np.ndarray], texts: List[str] = None, n_clusters: int = 5) -> Tuple[List[int], Dict]:
-    """
-    Cluster text embeddings and generate topic summaries
-
-    Args:
-        embeddings: List of embeddings
-        texts: List of corresponding texts (for topic naming)
-        n_clusters: Number of clusters to create
-
-    Returns:
-        Tuple of (cluster labels, cluster_info)
-    """
-    if not embeddings or len(embeddings) == 0:
-        return [], {}
-
-    # Convert to numpy array
-    embeddings_array = np.array(embeddings)
-
-    # Adjust clusters if needed
-    n_samples = len(embeddings)
-    actual_n_clusters = min(n_clusters, n_samples)
-
-    if actual_n_clusters <= 1:
-        # If only one cluster possible, assign all to cluster 0
-        labels = np.zeros(n_samples, dtype=int)
-        topic_name = "All Content" if texts else "Topic 0"
-        return labels.tolist(), {0: {"size": n_samples, "name": topic_name}}
-
-    # Perform clustering
-    clustering = KMeans(n_clusters=actual_n_clusters, random_state=42, n_init=10)
-    labels = clustering.fit_predict(embeddings_array)
-
-    # Create cluster info
-    cluster_info = {}
-    for cluster_id in range(actual_n_clusters):
-        cluster_indices = np.where(labels == cluster_id)[0]
-
-        # Generate descriptive name if texts are provided
-        if texts:
-            cluster_texts = [texts[i] for i in cluster_indices]
-            topic_name = generate_topic_name(cluster_texts)
-        else:
-            topic_name = f"Topic {cluster_id}"
-
-        # Extract top keywords if texts are provided
-        if texts:
-            cluster_texts = [texts[i] for i in cluster_indices]
-            combined_text = " ".join(cluster_texts)
-            top_keywords = extract_keywords(combined_text, max_keywords=10)
-        else:
-            top_keywords = []
-
-        cluster_info[int(cluster_id)] = {
-            "size": len(cluster_indices),
-            "name": topic_name,
-            "keywords": top_keywords
-        }
-
-    return labels.tolist(), cluster_info
-
-def generate_topic_name(texts: List[str]) -> str:
-    """
-    Generate a descriptive name for a topic based on common keywords
-
-    Args:
-        texts: List of text sections in this topic
-
-    Returns:
-        Descriptive topic name
-    """
-    # Combine all texts
-    combined_text = " ".join(texts)
-
-    # Extract keywords
-    keywords = extract_keywords(combined_text, max_keywords=30)
-
-    if not keywords:
-        return "Miscellaneous"
-
-    # Count keyword frequencies
-    word_counts = Counter([w.lower() for w in re.findall(r'\b[a-zA-Z]{3,}\b', combined_text)])
-
-    # Score keywords by frequency and position in keyword list
-    scored_keywords = {}
-    for i, kw in enumerate(keywords[:10]):  # Consider top 10 keywords
-        score = word_counts.get(kw.lower(), 0) * (1.0 - (i * 0.1))  # Weight by position
-        scored_keywords[kw] = score
-
-    # Select top 2-3 keywords for the name
-    top_keywords = sorted(scored_keywords.items(), key=lambda x: x[1], reverse=True)[:3]
-
-    if not top_keywords:
-        return "Miscellaneous"
-
-    # Construct name based on number of good keywords found
-    if len(top_keywords) >= 3 and top_keywords[2][1] > 0.5:
-        return f"{top_keywords[0][0].title()} & {top_keywords[1][0].title()} - {top_keywords[2][0].title()}"
-    elif len(top_keywords) >= 2 and top_keywords[1][1] > 0.5:
-        return f"{top_keywords[0][0].title()} & {top_keywords[1][0].title()}"
-    else:
-        return f"{top_keywords[0][0].title()}"
-
-def extract_keywords(text: str, max_keywords: int = 15) -> List[str]:
-    """
-    Extract important keywords from text
-
-    Args:
-        text: Input text to extract keywords from
-        max_keywords: Maximum number of keywords to return
-
-    Returns:
-        List of extracted keywords
-    """
-    # Remove common stop words
-    stop_words = {'the', 'and', 'to', 'of', 'a', 'in', 'for', 'is', 'on', 'that',
-                  'by', 'this', 'with', 'are', 'be', 'as', 'at', 'from', 'has', 'have',
-                  'was', 'were', 'which', 'or', 'an', 'not', 'they', 'their', 'but',
-                  'can', 'been', 'will', 'would', 'should', 'could', 'may', 'it', 'its'}
-
-    # Extract words
-    words = re.findall(r'\b[a-zA-Z]{3,}\b', text.lower())
-    filtered_words = [word for word in words if word not in stop_words]
-
-    # Count frequencies
-    word_counts = Counter(filtered_words)
-
-    # Return top keywords
-    return [word for word, _ in word_counts.most_common(max_keywords)]
-
-def create_or_get_topic(cursor, topic_id, name=None, description=None):
-    """Create a new topic or get existing one"""
-    # Check if topic already exists
-    cursor.execute("SELECT id FROM topics WHERE id = ?", [topic_id])
-    existing_id = cursor.fetchone()
-
-    if existing_id:
-        # Update existing topic if name or description provided
-        if name or description:
-            updates = []
-            params = []
-
-            if name:
-                updates.append("name = ?")
-                params.append(name)
-
-            if description:
-                updates.append("description = ?")
-                params.append(description)
-
-            if updates:
-                params.append(topic_id)
-                cursor.execute(
-                    f"UPDATE topics SET {', '.join(updates)} WHERE id = ?",
-                    params
-                )
-
-        return existing_id[0]
-    else:
-        # Insert new topic
-        cursor.execute(
-            "INSERT INTO topics (id, name, description) VALUES (?, ?, ?)",
-            [topic_id, name or f"Topic {topic_id}", description or ""]
-        )
-        return cursor.lastrowid
@@ -70,8 +70,9 @@ def extract_toc_and_sections(reader: PdfReader, live: Live) -> Dict:
                                 except:
                                     pass
 
-                        # Extract text for this section
+                        # Extract text for this section, noting where each page starts
                         section_text = ""
+                        page_offsets = []
                         start_page = page_number
                         end_page = next_page if next_page is not None else len(reader.pages) - 1
 
@@ -79,6 +80,7 @@ def extract_toc_and_sections(reader: PdfReader, live: Live) -> Dict:
                             try:
                                 page_text = reader.pages[p].extract_text()
                                 if page_text:
+                                    page_offsets.append((p, len(section_text)))
                                     section_text += page_text + "\n\n"
                             except Exception as e:
                                 live.console.print(f"Error extracting text from page {p}: {e}")
@@ -90,7 +92,8 @@ def extract_toc_and_sections(reader: PdfReader, live: Live) -> Dict:
                             'level': level,
                             'start_page': page_number,
                             'end_page': end_page,
-                            'text': section_text
+                            'text': section_text,
+                            'page_offsets': page_offsets
                         }
 
         # If no TOC was found or no valid sections were extracted, use page-based sections
@@ -107,7 +110,8 @@ def extract_toc_and_sections(reader: PdfReader, live: Live) -> Dict:
                         'level': 1,
                         'start_page': page_num,
                         'end_page': page_num + 1,
-                        'text': page_text
+                        'text': page_text,
+                        'page_offsets': [(page_num, 0)]
                     }
 
     except Exception as e:
@@ -0,0 +1,116 @@
+from dataclasses import dataclass
+from importlib import resources
+from sqlite3 import Cursor
+from typing import Callable
+
+fts_statement = resources.read_text("pdf2sqlite.sql", "fts.sql")
+
+
+@dataclass(frozen=True)
+class FtsIndex:
+    name: str
+    source: str
+    columns: tuple[str, ...]
+
+
+FTS_INDEXES = (
+    FtsIndex("pdf_pages_fts", "pdf_pages", ("text", "gist")),
+    FtsIndex("pdf_sections_fts", "pdf_sections", ("title", "gist")),
+    FtsIndex("pdf_figures_fts", "pdf_figures", ("description",)),
+    FtsIndex(
+        "pdf_tables_fts",
+        "pdf_tables",
+        ("text", "description", "caption_above", "caption_below"),
+    ),
+)
+
+_BY_NAME = {index.name: index for index in FTS_INDEXES}
+
+
+def ensure_fts(cursor: Cursor) -> None:
+    """
+    Create the FTS5 indexes and their triggers if they are missing.
+
+    Rows that already exist when an index is created are recorded in
+    fts_backfill rather than indexed immediately, see `backfill_fts`.
+    """
+    # everything happens in one transaction, so that no row can be written
+    # between recording the backfill range and creating the triggers
+    cursor.executescript(f"BEGIN IMMEDIATE;\n{fts_statement}\nCOMMIT;")
+
+
+def pending_backfill(cursor: Cursor) -> dict[str, int]:
+    """Return the number of source rowids each index still has to cover"""
+    cursor.execute("SELECT name, target_rowid - last_rowid FROM fts_backfill")
+    return {name: remaining for name, remaining in cursor.fetchall()}
+
+
+def backfill_fts(
+        cursor: Cursor,
+        batch_size: int = 1000,
+        on_progress: Callable[[str, int, int], None] | None = None,
+) -> int:
+    """
+    Index rows that predate the FTS indexes, one batch per transaction
+
+    The backfill is resumable: progress is committed after every batch, so an
+    interrupted run picks up where it left off.
+
+    Args:
+        cursor: SQLite cursor
+        batch_size: Number of source rows to index per transaction
+        on_progress: Called with (index name, last rowid, target rowid)
+
+    Returns:
+        Number of rows indexed
+    """
+    if batch_size <= 0:
+        raise ValueError("batch size must be positive")
+
+    db = cursor.connection
+    indexed = 0
+    cursor.execute("SELECT name, last_rowid, target_rowid FROM fts_backfill ORDER BY name")
+    for name, last_rowid, target_rowid in cursor.fetchall():
+        index = _BY_NAME[name]
+        columns = ", ".join(index.columns)
+        while last_rowid < target_rowid:
+            cursor.execute(
+                f"SELECT MAX(id), COUNT(*) FROM (SELECT id FROM {index.source} "
+                "WHERE id > ? AND id <= ? ORDER BY id LIMIT ?)",
+                [last_rowid, target_rowid, batch_size],
+            )
+            upper, count = cursor.fetchone()
+            if upper is None:
+                upper = target_rowid
+            cursor.execute(
+                f"INSERT INTO {index.name} (rowid, {columns}) "
+                f"SELECT id, {columns} FROM {index.source} WHERE id > ? AND id <= ?",
+                [last_rowid, upper],
+            )
+            cursor.execute(
+                "UPDATE fts_backfill SET last_rowid = ? WHERE name = ?",
+                [upper, name],
+            )
+            db.commit()
+            indexed += count
+            last_rowid = upper
+            if on_progress:
+                on_progress(name, last_rowid, target_rowid)
+        cursor.execute("DELETE FROM fts_backfill WHERE name = ?", [name])
+        db.commit()
+    return indexed
+
+
+def merge_fts(cursor: Cursor, pages: int = 500) -> None:
+    """Run a bounded incremental merge of each index's b-tree segments"""
+    for index in FTS_INDEXES:
+        cursor.execute(
+            f"INSERT INTO {index.name} ({index.name}, rank) VALUES ('merge', ?)",
+            [pages],
+        )
+
+
+def optimize_fts(cursor: Cursor) -> None:
+    """Merge each index into a single b-tree. This can be slow on large indexes"""
+    for index in FTS_INDEXES:
+        cursor.execute(f"INSERT INTO {index.name} ({index.name}) VALUES ('optimize')")
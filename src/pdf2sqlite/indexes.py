@@ -0,0 +1,48 @@
+from dataclasses import dataclass
+from sqlite3 import Cursor
+
+from .vector_store import table_exists
+
+
+@dataclass(frozen=True)
+class SecondaryIndex:
+    table: str
+    columns: tuple[str, ...]
+
+    @property
+    def name(self) -> str:
+        return f"idx_{self.table}_{'_'.join(self.columns)}"
+
+
+# Indexes beyond the primary keys and UNIQUE constraints, for lookups the
+# schema's keys don't lead with. tests/test_query_plans.py checks that the
+# queries behind the MCP server never fall back to a full scan.
+SECONDARY_INDEXES = (
+    # the PDF a figure or table belongs to, and the pages it is on
+    SecondaryIndex("page_to_figure", ("figure_id",)),
+    SecondaryIndex("page_to_table", ("table_id",)),
+    # the sections of a PDF, in reading order
+    SecondaryIndex("pdf_sections", ("pdf_id", "start_page")),
+    SecondaryIndex("pdfs", ("collection",)),
+    SecondaryIndex("section_keywords", ("section_id",)),
+    SecondaryIndex("section_topics", ("section_id", "topic_id")),
+    # the most representative sections of a topic
+    SecondaryIndex("section_topics", ("topic_id", "confidence")),
+    SecondaryIndex("topic_centroids", ("model",)),
+)
+
+
+def ensure_indexes(cursor: Cursor) -> None:
+    """
+    Create any missing secondary index whose table and columns exist; the
+    migration that adds a column creates its index
+    """
+    for index in SECONDARY_INDEXES:
+        if not table_exists(cursor, index.table):
+            continue
+        columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({index.table})")}
+        if columns.issuperset(index.columns):
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {index.name} "
+                f"ON {index.table} ({', '.join(index.columns)})"
+            )
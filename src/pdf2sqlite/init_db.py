@@ -1,8 +1,7 @@
 import sqlite_vec
 from sqlite3 import Cursor
-from importlib import resources
 
-create_statement = resources.read_text("pdf2sqlite.sql", "create_db.sql")
+from .migrations import create_statement, migrate
 
 def init_db(cursor : Cursor):
     cursor.connection.enable_load_extension(True)
@@ -10,4 +9,5 @@ def init_db(cursor : Cursor):
     # Enable sqlite-vec extension
     sqlite_vec.load(cursor.connection)
 
-    cursor.executescript(create_statement)
+    # a new database is built by running every migration
+    migrate(cursor)
@@ -0,0 +1,325 @@
+import math
+from dataclasses import replace
+from sqlite3 import Cursor
+from typing import Callable
+
+import numpy as np
+
+from .vector_store import EmbeddingSpace, list_spaces, table_exists
+
+# training vectors drawn per posting list, and k-means iterations
+IVF_SAMPLE_PER_LIST = 64
+KMEANS_ITERATIONS = 10
+
+# the shadow tables, and their columns, in which sqlite-vec 0.1 keeps the
+# vectors of a float32 vec0 table
+VEC0_CHUNK_COLUMNS = {
+    "chunks": {"chunk_id", "size", "validity", "rowids"},
+    "vector_chunks00": {"rowid", "vectors"},
+}
+
+
+def default_lists(count: int) -> int:
+    """About the square root of the number of vectors, as is usual for IVF"""
+    return max(1, min(count, round(math.sqrt(count))))
+
+
+def default_probes(lists: int) -> int:
+    return max(1, min(lists, round(math.sqrt(lists))))
+
+
+def unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1)
+
+
+def nearest_centroids(matrix: np.ndarray, centroids: np.ndarray, metric: str) -> np.ndarray:
+    """The index of the nearest centroid to each row"""
+    if metric == "cosine":
+        return np.argmax(unit_rows(matrix) @ centroids.T, axis=1)
+    if metric == "l1":
+        return np.array([
+            np.argmin(np.abs(centroids - row).sum(axis=1)) for row in matrix
+        ])
+    distances = (
+        -2 * matrix @ centroids.T
+        + (centroids * centroids).sum(axis=1)[None, :]
+    )
+    return np.argmin(distances, axis=1)
+
+
+def train_centroids(
+        sample: np.ndarray,
+        lists: int,
+        metric: str,
+        seed: int = 0,
+        iterations: int = KMEANS_ITERATIONS,
+) -> np.ndarray:
+    """
+    Lloyd's k-means over a sample of vectors, on the unit sphere for cosine
+    spaces. Lists left empty are re-seeded from random sample vectors.
+    """
+    rng = np.random.default_rng(seed)
+    if metric == "cosine":
+        sample = unit_rows(sample)
+    centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(iterations):
+        labels = nearest_centroids(sample, centroids, metric)
+        for index in range(lists):
+            members = sample[labels == index]
+            if len(members):
+                centroids[index] = members.mean(axis=0)
+            else:
+                centroids[index] = sample[rng.integers(len(sample))]
+        if metric == "cosine":
+            centroids = unit_rows(centroids)
+    return centroids.astype(np.float32)
+
+
+def float_source(space: EmbeddingSpace) -> tuple[str, str]:
+    """The table and rowid column holding a space's float32 vectors"""
+    if space.quantized:
+        return space.full_table, "vec_rowid"
+    return space.vec_table, "rowid"
+
+
+def scan_vectors(cursor: Cursor, space: EmbeddingSpace, batch_size: int):
+    """Yield (rowids, float32 matrix) batches of every vector in a space"""
+    if not space.quantized and has_vec0_chunks(cursor, space):
+        yield from scan_vec0_chunks(cursor, space)
+        return
+    table, key = float_source(space)
+    rows = cursor.connection.execute(f"SELECT {key}, embedding FROM {table}")
+    while batch := rows.fetchmany(batch_size):
+        yield (
+            [rowid for rowid, _ in batch],
+            np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in batch]),
+        )
+
+
+def has_vec0_chunks(cursor: Cursor, space: EmbeddingSpace) -> bool:
+    """
+    Whether a vec0 table keeps its vectors in the shadow tables that
+    `scan_vec0_chunks` reads. They are private to sqlite-vec, so their
+    columns and the sizes of the first chunk's arrays are checked, and
+    anything unexpected falls back to selecting from the vec0 table.
+    """
+    for suffix, columns in VEC0_CHUNK_COLUMNS.items():
+        table = f"{space.vec_table}_{suffix}"
+        found = {row[1] for row in cursor.connection.execute(f"PRAGMA table_info({table})")}
+        if not columns <= found:
+            return False
+    row = cursor.connection.execute(
+        f"""
+        SELECT {space.vec_table}_chunks.size,
+               LENGTH({space.vec_table}_chunks.validity),
+               LENGTH({space.vec_table}_chunks.rowids),
+               LENGTH({space.vec_table}_vector_chunks00.vectors)
+        FROM {space.vec_table}_chunks
+        JOIN {space.vec_table}_vector_chunks00
+            ON {space.vec_table}_vector_chunks00.rowid = {space.vec_table}_chunks.chunk_id
+        LIMIT 1
+        """
+    ).fetchone()
+    if row is None:
+        return True
+    size, validity, rowids, vectors = row
+    return (
+        validity * 8 >= size
+        and rowids == size * 8
+        and vectors == size * space.dimension * 4
+    )
+
+
+def scan_vec0_chunks(cursor: Cursor, space: EmbeddingSpace):
+    """
+    Yield the vectors of a float32 vec0 table a storage chunk at a time
+
+    Selecting vectors from a vec0 table costs a blob read per row, which makes
+    a full scan of a large space take hours. vec0 keeps its vectors in
+    chunks, with a rowid array and a validity bitmap per chunk, and those can
+    be read directly instead, once `has_vec0_chunks` has checked them.
+    """
+    chunks = cursor.connection.execute(
+        f"""
+        SELECT {space.vec_table}_chunks.size,
+               {space.vec_table}_chunks.validity,
+               {space.vec_table}_chunks.rowids,
+               {space.vec_table}_vector_chunks00.vectors
+        FROM {space.vec_table}_chunks
+        JOIN {space.vec_table}_vector_chunks00
+            ON {space.vec_table}_vector_chunks00.rowid = {space.vec_table}_chunks.chunk_id
+        ORDER BY {space.vec_table}_chunks.chunk_id
+        """
+    )
+    for size, validity, rowids, vectors in chunks:
+        valid = np.unpackbits(np.frombuffer(validity, dtype=np.uint8), bitorder="little")[:size]
+        valid = valid.astype(bool)
+        if not valid.any():
+            continue
+        ids = np.frombuffer(rowids, dtype=np.int64)[:size][valid]
+        matrix = np.frombuffer(vectors, dtype=np.float32).reshape(size, space.dimension)[valid]
+        yield ids.tolist(), matrix
+
+
+def sample_vectors(
+        cursor: Cursor,
+        space: EmbeddingSpace,
+        count: int,
+        size: int,
+        seed: int,
+        batch_size: int,
+) -> np.ndarray:
+    """A uniform random sample of a space's vectors, in one scan"""
+    rng = np.random.default_rng(seed)
+    chosen = np.zeros(count, dtype=bool)
+    chosen[rng.choice(count, min(size, count), replace=False)] = True
+    parts = []
+    seen = 0
+    for _, matrix in scan_vectors(cursor, space, batch_size):
+        parts.append(matrix[chosen[seen:seen + len(matrix)]])
+        seen += len(matrix)
+    return np.concatenate(parts)
+
+
+def create_postings_table(cursor: Cursor, space: EmbeddingSpace) -> None:
+    # postings keep a copy of each vector, in the vec0 table's storage format,
+    # clustered by list, so that a probe reads its list's vectors in one range
+    # scan instead of looking each one up in the vec0 table
+    cursor.execute(
+        f"""
+        CREATE TABLE {space.postings_table}(
+            centroid_id INTEGER NOT NULL,
+            vec_rowid INTEGER NOT NULL UNIQUE,
+            embedding BLOB NOT NULL,
+            PRIMARY KEY (centroid_id, vec_rowid)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def file_postings(
+        cursor: Cursor,
+        space: EmbeddingSpace,
+        centroids: np.ndarray,
+        batch_size: int,
+        on_progress: Callable[[int, int], None] | None = None,
+        count: int = 0,
+) -> None:
+    """File every vector of a space under its nearest centroid"""
+    assigned = 0
+    for rowids, matrix in scan_vectors(cursor, space, batch_size):
+        labels = nearest_centroids(matrix, centroids, space.distance_metric)
+        cursor.executemany(
+            f"INSERT INTO {space.postings_table} (centroid_id, vec_rowid, embedding) "
+            f"VALUES (?, ?, {space.vector_sql()})",
+            [(int(label) + 1, rowid, vector) for rowid, label, vector in zip(rowids, labels, matrix)],
+        )
+        assigned += len(rowids)
+        if on_progress is not None:
+            on_progress(assigned, count)
+
+
+def restore_posting_vectors(cursor: Cursor, batch_size: int = 10_000) -> None:
+    """
+    Refile the postings of IVF indexes built while postings held only
+    rowids, so that they hold their vectors again
+    """
+    if not table_exists(cursor, "embedding_spaces"):
+        return
+    for space in list_spaces(cursor):
+        if not table_exists(cursor, space.postings_table):
+            continue
+        columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({space.postings_table})")}
+        if "embedding" in columns:
+            continue
+        centroids = np.stack([
+            np.frombuffer(blob, dtype=np.float32)
+            for (blob,) in cursor.execute(
+                f"SELECT embedding FROM {space.centroid_table} ORDER BY rowid"
+            )
+        ])
+        cursor.execute(f"DROP TABLE {space.postings_table}")
+        create_postings_table(cursor, space)
+        file_postings(cursor, space, centroids, batch_size)
+
+
+def drop_ivf(cursor: Cursor, space: EmbeddingSpace) -> EmbeddingSpace:
+    """Remove a space's IVF index, so that it is searched exhaustively"""
+    cursor.execute(f"DROP TABLE IF EXISTS {space.postings_table}")
+    cursor.execute(f"DROP TABLE IF EXISTS {space.centroid_table}")
+    cursor.execute(
+        "UPDATE embedding_spaces SET ivf_lists = 0, ivf_probes = 0 WHERE id = ?",
+        [space.id],
+    )
+    return replace(space, ivf_lists=0, ivf_probes=0)
+
+
+def build_ivf(
+        cursor: Cursor,
+        space: EmbeddingSpace,
+        lists: int | None = None,
+        probes: int | None = None,
+        seed: int = 0,
+        batch_size: int = 10_000,
+        on_progress: Callable[[int, int], None] | None = None,
+) -> EmbeddingSpace:
+    """
+    Build, or rebuild, the IVF index of an embedding space
+
+    Centroids are trained with k-means on a sample of the space's vectors,
+    then every vector is filed in the posting list of its nearest centroid.
+    Vectors stored later are filed as they are inserted, so the index only
+    needs rebuilding when the corpus has drifted from the centroids.
+
+    Args:
+        cursor: SQLite cursor with the sqlite-vec extension loaded
+        space: The space to index
+        lists: Number of posting lists; about the square root of the number
+            of vectors if not given
+        probes: Lists searched per query by default; more probes trade
+            latency for recall
+        seed: Seed for sampling and centroid initialisation
+        batch_size: Vectors assigned to lists at a time
+        on_progress: Called with (vectors assigned, total) after each batch
+
+    Returns:
+        The space, with its index settings
+
+    Raises:
+        ValueError: if the space has no vectors, or lists or probes are invalid
+    """
+    table, _ = float_source(space)
+    count = cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    if count == 0:
+        raise ValueError(f"the {space.target} space for {space.model} has no embeddings")
+    lists = lists or default_lists(count)
+    if lists <= 0 or lists > count:
+        raise ValueError(f"lists must be between 1 and the number of vectors ({count})")
+    probes = probes or default_probes(lists)
+    if probes <= 0 or probes > lists:
+        raise ValueError(f"probes must be between 1 and the number of lists ({lists})")
+
+    sample = sample_vectors(
+        cursor, space, count, lists * IVF_SAMPLE_PER_LIST, seed, batch_size
+    )
+    centroids = train_centroids(sample, lists, space.distance_metric, seed)
+
+    drop_ivf(cursor, space)
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE {space.centroid_table} USING vec0("
+        f"embedding float[{space.dimension}] distance_metric={space.distance_metric})"
+    )
+    create_postings_table(cursor, space)
+    cursor.executemany(
+        f"INSERT INTO {space.centroid_table} (rowid, embedding) VALUES (?, ?)",
+        [(index + 1, centroid) for index, centroid in enumerate(centroids)],
+    )
+
+    file_postings(cursor, space, centroids, batch_size, on_progress, count)
+
+    cursor.execute(
+        "UPDATE embedding_spaces SET ivf_lists = ?, ivf_probes = ? WHERE id = ?",
+        [lists, probes, space.id],
+    )
+    return replace(space, ivf_lists=lists, ivf_probes=probes)
@@ -0,0 +1,191 @@
+import re
+from sqlite3 import Cursor
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+STOP_WORDS = frozenset({
+    'the', 'and', 'to', 'of', 'a', 'in', 'for', 'is', 'on', 'that',
+    'by', 'this', 'with', 'are', 'be', 'as', 'at', 'from', 'has', 'have',
+    'was', 'were', 'which', 'or', 'an', 'not', 'they', 'their', 'but',
+    'can', 'been', 'will', 'would', 'should', 'could', 'may', 'it', 'its',
+})
+
+WORD_PATTERN = re.compile(r'\b[a-zA-Z]{3,}\b')
+
+# keywords kept for each section, and for each topic label
+SECTION_KEYWORDS = 15
+LABEL_KEYWORDS = 10
+
+# terms looked up per query, under SQLite's default limit on parameters
+LOOKUP_BATCH = 500
+
+# The sections counted in term_document_frequency, whose number is the n of
+# inverse document frequencies. Sections given keywords before frequencies
+# were kept aren't in it, so they don't inflate n.
+COUNTED_SECTIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS term_document_sections(
+    section_id INTEGER PRIMARY KEY,
+    FOREIGN KEY(section_id) REFERENCES pdf_sections(id) ON DELETE CASCADE
+)
+"""
+
+
+def tokenize(text: str) -> List[str]:
+    """The lower-cased words of a text, without stop words"""
+    return [word for word in WORD_PATTERN.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def count_terms(texts: Sequence[str]) -> Tuple[sparse.csr_matrix, List[str]]:
+    """
+    Count the terms of some texts in a single pass
+
+    Returns:
+        A (texts x terms) sparse count matrix, and the term of each column,
+        in alphabetical order
+    """
+    vectorizer = CountVectorizer(tokenizer=tokenize, lowercase=False, token_pattern=None)
+    try:
+        matrix = vectorizer.fit_transform(texts)
+    except ValueError:
+        # nothing but stop words, or no texts at all
+        return sparse.csr_matrix((len(texts), 0), dtype=np.int64), []
+    return sparse.csr_matrix(matrix), vectorizer.get_feature_names_out().tolist()
+
+
+def ensure_counted_sections(cursor: Cursor) -> None:
+    cursor.execute(COUNTED_SECTIONS_TABLE)
+
+
+def add_document_frequencies(
+        cursor: Cursor,
+        section_ids: List[int],
+        matrix: sparse.csr_matrix,
+        terms: List[str],
+) -> None:
+    """Count the sections of a count matrix towards the corpus document frequencies"""
+    cursor.executemany(
+        "INSERT OR IGNORE INTO term_document_sections (section_id) VALUES (?)",
+        [(section_id,) for section_id in section_ids],
+    )
+    frequencies = np.asarray((matrix > 0).sum(axis=0)).ravel()
+    cursor.executemany(
+        """
+        INSERT INTO term_document_frequency (term, sections) VALUES (?, ?)
+        ON CONFLICT(term) DO UPDATE SET sections = sections + excluded.sections
+        """,
+        [(term, int(count)) for term, count in zip(terms, frequencies) if count],
+    )
+
+
+def counted_sections(cursor: Cursor) -> int:
+    """The number of sections counted in the document frequencies"""
+    return cursor.execute("SELECT COUNT(*) FROM term_document_sections").fetchone()[0]
+
+
+def inverse_document_frequencies(cursor: Cursor, terms: List[str], sections: int) -> np.ndarray:
+    """
+    Smoothed inverse document frequencies of some terms in the corpus,
+    ln((1 + n) / (1 + df)) + 1 as scikit-learn's TfidfTransformer computes
+    them, so terms found in every section still count for something
+    """
+    frequencies: Dict[str, int] = {}
+    for start in range(0, len(terms), LOOKUP_BATCH):
+        batch = terms[start:start + LOOKUP_BATCH]
+        frequencies.update(cursor.execute(
+            "SELECT term, sections FROM term_document_frequency "
+            f"WHERE term IN ({', '.join('?' * len(batch))})",
+            batch,
+        ).fetchall())
+    counts = np.array([frequencies.get(term, 0) for term in terms], dtype=np.float64)
+    # sections deleted since they were counted can leave frequencies above n
+    counts = np.minimum(counts, sections)
+    return np.log((1 + sections) / (1 + counts)) + 1
+
+
+def batch_idf(matrix: sparse.csr_matrix) -> np.ndarray:
+    """Smoothed inverse document frequencies within a count matrix alone"""
+    counts = np.asarray((matrix > 0).sum(axis=0)).ravel()
+    return np.log((1 + matrix.shape[0]) / (1 + counts)) + 1
+
+
+def top_terms(weights: sparse.csr_matrix, terms: List[str], count: int) -> List[List[str]]:
+    """The highest weighted terms of each row, ties broken alphabetically"""
+    tops = []
+    for row in range(weights.shape[0]):
+        start, end = weights.indptr[row], weights.indptr[row + 1]
+        columns = weights.indices[start:end]
+        order = np.lexsort((columns, -weights.data[start:end]))[:count]
+        tops.append([terms[columns[index]] for index in order])
+    return tops
+
+
+def section_keywords(
+        cursor: Cursor,
+        section_ids: List[int],
+        matrix: sparse.csr_matrix,
+        terms: List[str],
+        count: int = SECTION_KEYWORDS,
+) -> List[List[str]]:
+    """
+    TF-IDF keywords of a batch of sections, against the whole corpus, from
+    their term counts as `count_terms` makes them
+
+    Term frequencies are sublinear, 1 + ln(count), so a term repeated
+    throughout a section doesn't drown out rarer, more telling ones.
+    Sections that haven't been counted are counted towards the persisted
+    document frequencies first; sections being re-ingested were counted
+    already, so that terms aren't counted twice.
+    """
+    known = set()
+    for start in range(0, len(section_ids), LOOKUP_BATCH):
+        batch = section_ids[start:start + LOOKUP_BATCH]
+        known.update(row[0] for row in cursor.execute(
+            "SELECT section_id FROM term_document_sections "
+            f"WHERE section_id IN ({', '.join('?' * len(batch))})",
+            batch,
+        ))
+    new = [index for index, section_id in enumerate(section_ids) if section_id not in known]
+    add_document_frequencies(cursor, [section_ids[index] for index in new], matrix[new], terms)
+    idf = inverse_document_frequencies(cursor, terms, counted_sections(cursor))
+    frequencies = sparse.csr_matrix(matrix, dtype=np.float64)
+    frequencies.data = 1 + np.log(frequencies.data)
+    return top_terms(sparse.csr_matrix(frequencies.multiply(idf)), terms, count)
+
+
+def class_keywords(
+        matrix: sparse.csr_matrix,
+        classes: Sequence[Hashable],
+        terms: List[str],
+        idf: np.ndarray,
+        count: int = LABEL_KEYWORDS,
+) -> Dict[Hashable, List[str]]:
+    """
+    Class-based TF-IDF keywords: the term counts of each class's texts are
+    pooled, normalized by the size of the class, and weighted by the corpus
+    inverse document frequencies, so labels favour the terms that set a
+    class apart rather than boilerplate shared by the whole corpus
+    """
+    labels = list(dict.fromkeys(classes))
+    position = {label: index for index, label in enumerate(labels)}
+    membership = sparse.csr_matrix(
+        (np.ones(len(classes)), ([position[label] for label in classes], range(len(classes)))),
+        shape=(len(labels), len(classes)),
+    )
+    pooled = sparse.csr_matrix(membership @ matrix, dtype=np.float64)
+    sizes = np.asarray(pooled.sum(axis=1)).ravel()
+    pooled = sparse.diags(1 / np.where(sizes > 0, sizes, 1)) @ pooled
+    weights = sparse.csr_matrix(pooled.multiply(idf))
+    return dict(zip(labels, top_terms(weights, terms, count)))
+
+
+def keywords_name(keywords: List[str]) -> str:
+    """A topic name from its top keywords"""
+    if not keywords:
+        return "Miscellaneous"
+    words = [keyword.title() for keyword in keywords[:3]]
+    if len(words) == 3:
+        return f"{words[0]} & {words[1]} - {words[2]}"
+    return " & ".join(words)
@@ -0,0 +1,230 @@
+from dataclasses import dataclass
+from sqlite3 import Connection, Cursor
+from typing import Callable
+
+from .fts import optimize_fts
+from .stats import refresh_pdf_stats
+from .vector_store import (
+    LEGACY_MAPPING_TABLE,
+    LEGACY_VEC_TABLE,
+    TARGET_TABLES,
+    EmbeddingSpace,
+    delete_embeddings,
+    list_spaces,
+    rebuild_vec_table,
+    table_exists,
+)
+
+
+@dataclass(frozen=True)
+class Reference:
+    """Rows of a table are orphans when no row of the parent matches them"""
+    table: str
+    column: str
+    parent: str
+    parent_column: str = "id"
+
+
+# Foreign keys aren't enforced, so none of the schema's cascades happen when
+# a PDF is deleted. References are checked in order, so that the rows
+# orphaned by one check are found by the next: pages before the figures on
+# them, sections before their chunks, keywords and topics.
+REFERENCES = (
+    Reference("pdf_pages", "pdf_id", "pdfs"),
+    Reference("pdf_sections", "pdf_id", "pdfs"),
+    Reference("pdf_tables", "pdf_id", "pdfs"),
+    Reference("pdf_to_page", "pdf_id", "pdfs"),
+    Reference("pdf_stats", "pdf_id", "pdfs"),
+    Reference("pdf_to_page", "page_id", "pdf_pages"),
+    Reference("pdf_to_section", "pdf_id", "pdfs"),
+    Reference("pdf_to_section", "section_id", "pdf_sections"),
+    Reference("page_to_table", "page_id", "pdf_pages"),
+    Reference("page_to_table", "table_id", "pdf_tables"),
+    Reference("page_to_figure", "page_id", "pdf_pages"),
+    Reference("page_renders", "page_id", "pdf_pages"),
+    Reference("page_to_figure", "figure_id", "pdf_figures"),
+    # figures only belong to a PDF through the pages they are on
+    Reference("pdf_figures", "id", "page_to_figure", "figure_id"),
+    Reference("section_chunks", "section_id", "pdf_sections"),
+    Reference("section_keywords", "section_id", "pdf_sections"),
+    Reference("term_document_sections", "section_id", "pdf_sections"),
+    Reference("section_topics", "section_id", "pdf_sections"),
+    Reference("section_topics", "topic_id", "topics"),
+    # topics only belong to a PDF through the sections in them, and a model
+    # seeds new topics to replace the ones swept here
+    Reference("topics", "id", "section_topics", "topic_id"),
+    Reference("topic_centroids", "topic_id", "topics"),
+    Reference("topic_terms", "topic_id", "topics"),
+)
+
+
+def remove_orphaned_rows(cursor: Cursor) -> dict[str, int]:
+    """
+    Delete rows that refer to deleted PDFs, pages, sections or figures, and
+    figures and topics that nothing refers to
+
+    Returns:
+        The number of rows deleted from each table that had orphans
+    """
+    removed: dict[str, int] = {}
+    for reference in REFERENCES:
+        if not (table_exists(cursor, reference.table) and table_exists(cursor, reference.parent)):
+            continue
+        cursor.execute(
+            f"""
+            DELETE FROM {reference.table} WHERE NOT EXISTS (
+                SELECT 1 FROM {reference.parent}
+                WHERE {reference.parent}.{reference.parent_column}
+                    = {reference.table}.{reference.column}
+            )
+            """
+        )
+        if cursor.rowcount > 0:
+            removed[reference.table] = removed.get(reference.table, 0) + cursor.rowcount
+    return removed
+
+
+def unmapped_rowids(cursor: Cursor, table: str, key: str, mapping_table: str) -> list[int]:
+    return [
+        rowid
+        for (rowid,) in cursor.execute(
+            f"SELECT {key} FROM {table} WHERE {key} NOT IN "
+            f"(SELECT vec_rowid FROM {mapping_table})"
+        ).fetchall()
+    ]
+
+
+def remove_orphaned_vectors(cursor: Cursor, space: EmbeddingSpace) -> int:
+    """
+    Delete the embeddings of items that no longer exist from a space, and
+    any vector that no item maps to
+
+    Returns:
+        The number of vectors deleted
+    """
+    source = TARGET_TABLES[space.target]
+    items = [
+        item_id
+        for (item_id,) in cursor.execute(
+            f"SELECT {space.mapping_key} FROM {space.mapping_table} "
+            f"WHERE {space.mapping_key} NOT IN (SELECT id FROM {source})"
+        ).fetchall()
+    ]
+    delete_embeddings(cursor, space, items)
+    vectors = unmapped_rowids(cursor, space.vec_table, "rowid", space.mapping_table)
+    cursor.executemany(
+        f"DELETE FROM {space.vec_table} WHERE rowid = ?", [(rowid,) for rowid in vectors]
+    )
+    if space.quantized:
+        cursor.execute(
+            f"DELETE FROM {space.full_table} WHERE vec_rowid NOT IN "
+            f"(SELECT vec_rowid FROM {space.mapping_table})"
+        )
+    if space.ivf_lists:
+        cursor.execute(
+            f"DELETE FROM {space.postings_table} WHERE vec_rowid NOT IN "
+            f"(SELECT vec_rowid FROM {space.mapping_table})"
+        )
+    return len(items) + len(vectors)
+
+
+def remove_orphaned_legacy_vectors(cursor: Cursor) -> int:
+    """
+    Clean up the embedding table of a database that predates embedding
+    spaces, where every re-ingest left the section's previous vector behind
+    """
+    if not table_exists(cursor, LEGACY_VEC_TABLE):
+        return 0
+    cursor.execute(
+        f"DELETE FROM {LEGACY_MAPPING_TABLE} "
+        "WHERE section_id NOT IN (SELECT id FROM pdf_sections)"
+    )
+    vectors = unmapped_rowids(cursor, LEGACY_VEC_TABLE, "rowid", LEGACY_MAPPING_TABLE)
+    cursor.executemany(
+        f"DELETE FROM {LEGACY_VEC_TABLE} WHERE rowid = ?", [(rowid,) for rowid in vectors]
+    )
+    return len(vectors)
+
+
+def database_bytes(db: Connection) -> int:
+    page_count = db.execute("PRAGMA page_count").fetchone()[0]
+    page_size = db.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+
+@dataclass
+class MaintenanceReport:
+    rows: dict[str, int]
+    vectors: dict[str, int]
+    bytes_before: int
+    bytes_after: int
+
+    @property
+    def bytes_reclaimed(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+
+def maintain(
+        db: Connection,
+        rebuild: bool = True,
+        on_step: Callable[[str], None] | None = None,
+) -> MaintenanceReport:
+    """
+    Remove orphaned rows and vectors, then compact the database
+
+    Args:
+        db: Connection with the sqlite-vec extension loaded
+        rebuild: Recreate every space's vec0 table, which reclaims the
+            storage vec0 keeps for deleted vectors
+        on_step: Called with a description of each step as it starts
+
+    Returns:
+        What was removed, and the size of the database before and after
+    """
+    def step(description: str) -> None:
+        if on_step is not None:
+            on_step(description)
+
+    cursor = db.cursor()
+    bytes_before = database_bytes(db)
+
+    step("Removing orphaned rows")
+    rows = remove_orphaned_rows(cursor)
+
+    step("Removing orphaned vectors")
+    vectors: dict[str, int] = {}
+    legacy = remove_orphaned_legacy_vectors(cursor)
+    if legacy:
+        vectors[LEGACY_VEC_TABLE] = legacy
+    spaces = list_spaces(cursor)
+    for space in spaces:
+        removed = remove_orphaned_vectors(cursor, space)
+        if removed:
+            vectors[space.vec_table] = removed
+    db.commit()
+
+    if table_exists(cursor, "pdf_stats"):
+        step("Recounting PDF statistics")
+        # removing orphans can change what a PDF's pages link to
+        for (pdf_id,) in cursor.execute("SELECT pdf_id FROM pdf_stats").fetchall():
+            refresh_pdf_stats(cursor, pdf_id)
+        db.commit()
+
+    if rebuild:
+        for space in spaces:
+            step(f"Rebuilding {space.model} {space.target} vectors")
+            rebuild_vec_table(cursor, space)
+            db.commit()
+
+    step("Optimizing full-text indexes")
+    optimize_fts(cursor)
+    db.commit()
+
+    step("Vacuuming")
+    db.execute("VACUUM")
+    step("Analyzing")
+    db.execute("ANALYZE")
+    db.execute("PRAGMA optimize")
+    db.commit()
+    # measured after the last write, statistics tables and all
+    return MaintenanceReport(rows, vectors, bytes_before, database_bytes(db))
@@ -34,6 +34,51 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
         type=int,
         help="Maximum limit for listing queries",
     )
+    parser.add_argument(
+        "--embedder",
+        help="Embedding model used at ingest, enables semantic search "
+        "(litellm naming conventions)",
+    )
+    parser.add_argument(
+        "--pdf-cache-bytes",
+        type=int,
+        help="Memory budget for reconstructed full PDFs (bytes, 0 disables)",
+    )
+    parser.add_argument(
+        "--pdf-cache-dir",
+        help="Directory to also keep reconstructed full PDFs in, across restarts",
+    )
+    parser.add_argument(
+        "--store-renders",
+        action="store_true",
+        help="Store page images rendered on request in the database, which "
+        "must be writable",
+    )
+    parser.add_argument(
+        "--result-cache-entries",
+        type=int,
+        help="Number of listing results to cache between calls (0 disables)",
+    )
+    parser.add_argument(
+        "--result-cache-ttl",
+        type=float,
+        help="Seconds a cached listing result is reused for",
+    )
+    parser.add_argument(
+        "--sql-timeout",
+        type=float,
+        help="Seconds a run_sql query may run before it is interrupted",
+    )
+    parser.add_argument(
+        "--sql-max-rows",
+        type=int,
+        help="Maximum rows a run_sql query returns",
+    )
+    parser.add_argument(
+        "--sql-max-bytes",
+        type=int,
+        help="Maximum bytes of values a run_sql query returns",
+    )
     parser.add_argument(
         "--transport",
         choices=sorted(_TRANSPORTS),
@@ -61,6 +106,15 @@ def main(argv: list[str] | None = None) -> None:
             max_blob_bytes=args.max_blob_bytes,
             default_limit=args.default_limit,
             max_limit=args.max_limit,
+            embedder=args.embedder,
+            pdf_cache_bytes=args.pdf_cache_bytes,
+            pdf_cache_dir=args.pdf_cache_dir,
+            store_renders=args.store_renders,
+            result_cache_entries=args.result_cache_entries,
+            result_cache_ttl=args.result_cache_ttl,
+            sql_timeout=args.sql_timeout,
+            sql_max_rows=args.sql_max_rows,
+            sql_max_bytes=args.sql_max_bytes,
         )
     except Exception as exc:  # noqa: BLE001
         print(f"error: {exc}", file=sys.stderr)
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Hashable
+
+
+@dataclass(slots=True)
+class ByteLRUCache:
+    """
+    A least-recently-used cache of byte strings, bounded by their total size
+
+    Values larger than the whole budget are never cached. A budget of zero
+    disables the cache.
+    """
+    max_bytes: int
+    _entries: OrderedDict[Hashable, bytes] = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )
+    _size: int = field(default=0, init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> bytes | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def discard(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Drop every entry whose key matches a predicate"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self._size -= len(self._entries.pop(key))
+
+
+@dataclass(slots=True)
+class ResultCache:
+    """
+    Query results by key, bounded by entry count and age
+
+    Entries older than ``ttl`` seconds are never returned, and the least
+    recently used are evicted beyond ``max_entries``. A bound of zero
+    entries disables the cache.
+    """
+    max_entries: int
+    ttl: float
+    clock: Callable[[], float] = time.monotonic
+    _entries: OrderedDict[Hashable, tuple[float, Any]] = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            stored_at, value = entry
+            if self.clock() - stored_at > self.ttl:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def database_cache_dir(directory: Path, database: Path) -> Path:
+    """
+    The subdirectory of ``directory`` for one database's documents, named
+    after a hash of the database's path and inode, so that databases sharing
+    a directory, or a database rebuilt at the same path, never serve each
+    other's documents
+    """
+    database = Path(database).resolve()
+    try:
+        stat = database.stat()
+        identity = f"{database}:{stat.st_dev}:{stat.st_ino}"
+    except OSError:
+        identity = str(database)
+    return directory / hashlib.sha256(identity.encode()).hexdigest()[:16]
+
+
+@dataclass(slots=True)
+class PdfCache:
+    """
+    Reconstructed PDF documents, keyed by PDF id and a version of its pages
+
+    Documents are kept in memory, and written to ``directory`` when one is
+    given so they survive server restarts. A new version of a document
+    replaces the older ones, in memory and on disk.
+    """
+    max_bytes: int
+    directory: Path | None = None
+    _memory: ByteLRUCache = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._memory = ByteLRUCache(self.max_bytes)
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, pdf_id: int, version: str) -> Path | None:
+        if self.directory is None:
+            return None
+        return self.directory / f"pdf-{pdf_id}-{version}.pdf"
+
+    def get(self, pdf_id: int, version: str) -> bytes | None:
+        payload = self._memory.get((pdf_id, version))
+        if payload is not None:
+            return payload
+        path = self._path(pdf_id, version)
+        if path is None or not path.exists():
+            return None
+        payload = path.read_bytes()
+        self._memory.put((pdf_id, version), payload)
+        return payload
+
+    def put(self, pdf_id: int, version: str, payload: bytes) -> None:
+        self._memory.discard(lambda key: key[0] == pdf_id)
+        self._memory.put((pdf_id, version), payload)
+        path = self._path(pdf_id, version)
+        if path is None or self.directory is None:
+            return
+        for stale in self.directory.glob(f"pdf-{pdf_id}-*.pdf"):
+            stale.unlink(missing_ok=True)
+        # written to a temporary file first, so that a reader never sees a
+        # partial document
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(handle, "wb") as file:
+            file.write(payload)
+        os.replace(temporary, path)
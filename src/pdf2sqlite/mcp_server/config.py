@@ -5,6 +5,12 @@ from pathlib import Path
 import os
 
 DEFAULT_MAX_BLOB_BYTES = 10 * 1024 * 1024
+DEFAULT_PDF_CACHE_BYTES = 256 * 1024 * 1024
+DEFAULT_RESULT_CACHE_ENTRIES = 1024
+DEFAULT_RESULT_CACHE_TTL = 60.0
+DEFAULT_SQL_TIMEOUT = 2.0
+DEFAULT_SQL_MAX_ROWS = 500
+DEFAULT_SQL_MAX_BYTES = 1024 * 1024
 DEFAULT_LIMIT = 50
 MAX_LIMIT = 200
 
@@ -15,6 +21,15 @@ class ServerConfig:
     max_blob_bytes: int = DEFAULT_MAX_BLOB_BYTES
     default_limit: int = DEFAULT_LIMIT
     max_limit: int = MAX_LIMIT
+    embedder: str | None = None
+    pdf_cache_bytes: int = DEFAULT_PDF_CACHE_BYTES
+    pdf_cache_dir: Path | None = None
+    store_renders: bool = False
+    result_cache_entries: int = DEFAULT_RESULT_CACHE_ENTRIES
+    result_cache_ttl: float = DEFAULT_RESULT_CACHE_TTL
+    sql_timeout: float = DEFAULT_SQL_TIMEOUT
+    sql_max_rows: int = DEFAULT_SQL_MAX_ROWS
+    sql_max_bytes: int = DEFAULT_SQL_MAX_BYTES
 
     @classmethod
     def from_cli(
@@ -23,6 +38,15 @@ class ServerConfig:
         max_blob_bytes: int | None = None,
         default_limit: int | None = None,
         max_limit: int | None = None,
+        embedder: str | None = None,
+        pdf_cache_bytes: int | None = None,
+        pdf_cache_dir: str | None = None,
+        store_renders: bool = False,
+        result_cache_entries: int | None = None,
+        result_cache_ttl: float | None = None,
+        sql_timeout: float | None = None,
+        sql_max_rows: int | None = None,
+        sql_max_bytes: int | None = None,
     ) -> "ServerConfig":
         db_path = database or os.getenv("PDF2SQLITE_MCP_DATABASE")
         if not db_path:
@@ -53,11 +77,61 @@ class ServerConfig:
         if default_lim > max_lim:
             raise ValueError("default limit cannot exceed max limit")
 
+        embedding_model = embedder or os.getenv("PDF2SQLITE_MCP_EMBEDDER") or None
+
+        cache_bytes = pdf_cache_bytes
+        if cache_bytes is None:
+            cache_bytes = int(
+                os.getenv("PDF2SQLITE_MCP_PDF_CACHE_BYTES", DEFAULT_PDF_CACHE_BYTES)
+            )
+        if cache_bytes < 0:
+            raise ValueError("PDF cache size must not be negative")
+        cache_dir = pdf_cache_dir or os.getenv("PDF2SQLITE_MCP_PDF_CACHE_DIR") or None
+        keep_renders = store_renders or os.getenv(
+            "PDF2SQLITE_MCP_STORE_RENDERS", ""
+        ).lower() in {"1", "true", "yes"}
+
+        cache_entries = result_cache_entries
+        if cache_entries is None:
+            cache_entries = int(
+                os.getenv("PDF2SQLITE_MCP_RESULT_CACHE_ENTRIES", DEFAULT_RESULT_CACHE_ENTRIES)
+            )
+        if cache_entries < 0:
+            raise ValueError("result cache size must not be negative")
+        cache_ttl = result_cache_ttl
+        if cache_ttl is None:
+            cache_ttl = float(
+                os.getenv("PDF2SQLITE_MCP_RESULT_CACHE_TTL", DEFAULT_RESULT_CACHE_TTL)
+            )
+        if cache_ttl < 0:
+            raise ValueError("result cache TTL must not be negative")
+
+        timeout = sql_timeout
+        if timeout is None:
+            timeout = float(os.getenv("PDF2SQLITE_MCP_SQL_TIMEOUT", DEFAULT_SQL_TIMEOUT))
+        row_limit = sql_max_rows
+        if row_limit is None:
+            row_limit = int(os.getenv("PDF2SQLITE_MCP_SQL_MAX_ROWS", DEFAULT_SQL_MAX_ROWS))
+        byte_limit = sql_max_bytes
+        if byte_limit is None:
+            byte_limit = int(os.getenv("PDF2SQLITE_MCP_SQL_MAX_BYTES", DEFAULT_SQL_MAX_BYTES))
+        if timeout <= 0 or row_limit <= 0 or byte_limit <= 0:
+            raise ValueError("SQL query budgets must be positive")
+
         return cls(
             database_path=resolved,
             max_blob_bytes=blob_limit,
             default_limit=default_lim,
             max_limit=max_lim,
+            embedder=embedding_model,
+            pdf_cache_bytes=cache_bytes,
+            pdf_cache_dir=Path(cache_dir).expanduser().resolve() if cache_dir else None,
+            store_renders=keep_renders,
+            result_cache_entries=cache_entries,
+            result_cache_ttl=cache_ttl,
+            sql_timeout=timeout,
+            sql_max_rows=row_limit,
+            sql_max_bytes=byte_limit,
         )
 
     def clamp_limit(self, value: int | None) -> int:
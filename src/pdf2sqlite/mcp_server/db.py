@@ -1,13 +1,128 @@
 from __future__ import annotations
 
 import asyncio
+import base64
+import re
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import closing
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable, Sequence, TypeVar, cast
+
+import numpy as np
+import sqlite_vec
+
+from .. import search
+from ..migrations import SCHEMA_VERSION, pending_migrations, schema_version
+from ..render import store_render
+from ..vector_store import EmbeddingSpace, get_space
+from .cache import ResultCache
+from .config import DEFAULT_RESULT_CACHE_ENTRIES, DEFAULT_RESULT_CACHE_TTL
 
 Row = sqlite3.Row
+T = TypeVar("T")
+
+
+# queries shared by the single lookups and the page asset bundle
+_PAGE_SUMMARY_SQL = """
+    SELECT
+        id,
+        pdf_id,
+        page_number,
+        gist,
+        LENGTH(text) AS text_length,
+        LENGTH(data) AS data_bytes
+    FROM pdf_pages
+    WHERE id = ?
+"""
+
+_PAGE_FIGURES_SQL = """
+    SELECT
+        pdf_figures.id,
+        pdf_figures.description,
+        pdf_figures.mime_type,
+        LENGTH(pdf_figures.data) AS data_bytes
+    FROM pdf_figures
+    JOIN page_to_figure ON page_to_figure.figure_id = pdf_figures.id
+    WHERE page_to_figure.page_id = ?
+    ORDER BY page_to_figure.figure_id
+"""
+
+_PAGE_TABLES_SQL = """
+    SELECT
+        pdf_tables.id,
+        pdf_tables.pdf_id,
+        pdf_tables.page_number,
+        pdf_tables.text,
+        pdf_tables.description,
+        pdf_tables.caption_above,
+        pdf_tables.caption_below,
+        pdf_tables.xmin,
+        pdf_tables.ymin,
+        LENGTH(pdf_tables.image) AS data_bytes,
+        LENGTH(pdf_tables.text) AS text_length
+    FROM pdf_tables
+    JOIN page_to_table ON page_to_table.table_id = pdf_tables.id
+    WHERE page_to_table.page_id = ?
+    ORDER BY page_to_table.table_id
+"""
+
+# PDFs with the statistics counted at ingest; the page count of PDFs not yet
+# counted (see `pdf2sqlite migrate`) is counted here, which is what databases
+# without the statistics table fall back to for every PDF
+_PDF_LIST_SQL = """
+    SELECT
+        pdfs.id,
+        pdfs.title,
+        pdfs.description,
+        COALESCE(
+            pdf_stats.page_count,
+            (SELECT COUNT(*) FROM pdf_pages WHERE pdf_pages.pdf_id = pdfs.id)
+        ) AS page_count,
+        pdf_stats.section_count,
+        pdf_stats.figure_count,
+        pdf_stats.table_count,
+        pdf_stats.total_bytes,
+        pdf_stats.has_abstract,
+        pdf_stats.gists_complete,
+        pdf_stats.figure_descriptions_complete,
+        pdf_stats.table_descriptions_complete
+    FROM pdfs
+    LEFT JOIN pdf_stats ON pdf_stats.pdf_id = pdfs.id
+    {keyset}
+    ORDER BY pdfs.id
+    LIMIT ? OFFSET ?
+"""
+
+_UNCOUNTED_PDF_LIST_SQL = """
+    SELECT
+        pdfs.id,
+        pdfs.title,
+        pdfs.description,
+        (SELECT COUNT(*) FROM pdf_pages WHERE pdf_pages.pdf_id = pdfs.id) AS page_count
+    FROM pdfs
+    {keyset}
+    ORDER BY pdfs.id
+    LIMIT ? OFFSET ?
+"""
+
+# the page count, total page bytes and newest page of a PDF, which together
+# change whenever its stored pages do. LENGTH of a blob is read from the row
+# header, so this doesn't load the pages themselves
+_PDF_VERSION_SQL = """
+    SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0), COALESCE(MAX(id), 0)
+    FROM pdf_pages
+    WHERE pdf_id = ?
+"""
+
+
+def _pdf_version(row: Row | None) -> str:
+    if row is None:
+        return "0-0-0"
+    return "-".join(str(value) for value in row)
 
 
 class DatabaseError(Exception):
@@ -18,31 +133,488 @@ class NotFoundError(DatabaseError):
     """Raised when the requested entity is not present."""
 
 
+class QueryError(DatabaseError):
+    """Raised when an ad hoc query is refused, fails, or runs out of time."""
+
+
+class BlobTooLargeError(DatabaseError):
+    """Raised instead of reading a blob range larger than the caller allows."""
+
+    def __init__(self, size: int, limit: int) -> None:
+        super().__init__(f"{size} bytes exceeds the limit of {limit} bytes")
+        self.size = size
+        self.limit = limit
+
+
+# the blob columns that can be read a range at a time, by resource kind
+BLOB_COLUMNS = {
+    "pdf_page": ("pdf_pages", "data"),
+    "figure": ("pdf_figures", "data"),
+    "table_image": ("pdf_tables", "image"),
+}
+
+# bytes read from a blob at a time while encoding it; a multiple of three, so
+# that every chunk but the last encodes to base64 without padding
+BLOB_CHUNK_BYTES = 3 * 64 * 1024
+
+
+@dataclass(frozen=True, slots=True)
+class BlobRange:
+    """Part of a stored blob: its bytes, or their base64 encoding"""
+    size: int
+    offset: int
+    length: int
+    data: bytes | str
+
+    @property
+    def next_offset(self) -> int | None:
+        end = self.offset + self.length
+        return end if end < self.size else None
+
+
+def encode_base64_chunks(
+        read: Callable[[int], bytes],
+        length: int,
+        chunk_bytes: int = BLOB_CHUNK_BYTES,
+) -> str:
+    """
+    Base64-encode ``length`` bytes taken from ``read`` a chunk at a time
+
+    The encoding is written into a buffer allocated once at its final size,
+    so at most one chunk of the input is held alongside it.
+    """
+    if chunk_bytes % 3:
+        raise ValueError("chunk_bytes must be a multiple of 3")
+    encoded = bytearray(4 * ((length + 2) // 3))
+    position = 0
+    remaining = length
+    while remaining:
+        chunk = read(min(chunk_bytes, remaining))
+        if not chunk:
+            raise ValueError(f"expected {remaining} more bytes")
+        piece = base64.b64encode(chunk)
+        encoded[position:position + len(piece)] = piece
+        position += len(piece)
+        remaining -= len(chunk)
+    return encoded.decode("ascii")
+
+
+def read_blob_range(
+        conn: sqlite3.Connection,
+        kind: str,
+        rowid: int,
+        offset: int = 0,
+        length: int | None = None,
+        *,
+        max_bytes: int | None = None,
+        encode: bool = False,
+) -> BlobRange:
+    """
+    Read part of a stored blob incrementally, without loading the rest of it
+
+    ``length`` defaults to the rest of the blob. The size of the range is
+    checked against ``max_bytes`` before anything is read.
+
+    Raises:
+        NotFoundError: if the row doesn't exist or its blob is NULL
+        BlobTooLargeError: if the range is larger than ``max_bytes``
+        ValueError: if the range doesn't fit in the blob
+    """
+    table, column = BLOB_COLUMNS[kind]
+    try:
+        blob = conn.blobopen(table, column, rowid, readonly=True)
+    except sqlite3.OperationalError as exc:
+        # raised both for missing rows and for NULL values
+        raise NotFoundError(f"No {kind.replace('_', ' ')} data for row {rowid}") from exc
+    with blob:
+        size = len(blob)
+        if not 0 <= offset <= size:
+            raise ValueError(f"offset {offset} is outside a blob of {size} bytes")
+        if length is not None and length < 0:
+            raise ValueError("length must not be negative")
+        end = size if length is None else min(size, offset + length)
+        if max_bytes is not None and end - offset > max_bytes:
+            raise BlobTooLargeError(end - offset, max_bytes)
+        blob.seek(offset)
+        data = encode_base64_chunks(blob.read, end - offset) if encode else blob.read(end - offset)
+    return BlobRange(size, offset, end - offset, data)
+
+
+# read-only connections each Database keeps open, one per worker thread
+DEFAULT_READ_CONNECTIONS = 4
+
+# per-connection tuning: memory-map up to 256 MiB of the database, cache up
+# to 32 MiB of pages, and keep prepared statements for every query issued
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KIB = 32 * 1024
+CACHED_STATEMENTS = 256
+
+# the only things an ad hoc query may do; anything else, like a PRAGMA, an
+# ATTACH or a write, is refused when the statement is prepared
+_READ_ACTIONS = frozenset({
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+})
+
+# virtual machine instructions between checks of an ad hoc query's deadline
+_PROGRESS_INTERVAL = 1000
+
+
+# pragmas that full text search reads on its own while a query runs
+_READ_PRAGMAS = frozenset({"data_version"})
+
+
+def _authorize_read(action: int, arg1: str | None, arg2: str | None, *_: str | None) -> int:
+    if action in _READ_ACTIONS:
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_PRAGMA and arg1 in _READ_PRAGMAS and arg2 is None:
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+def _value_bytes(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value)
+    return 8
+
+
+# an ad hoc query that may order its own rows, perhaps only in a window or
+# a comment, which is no harm since it is then just run as written
+_ORDER_BY = re.compile(r"\border\s+by\b", re.IGNORECASE)
+
+
+def _blob_lengths_query(query: str, width: int) -> str:
+    """
+    Wrap an ad hoc query so that a blob comes back as its length
+
+    Blobs are fetched through resources, not inline. Each column becomes a
+    flag saying whether its value is a blob, and the value or the blob's
+    length; typeof() and length() of a stored column don't read its content.
+    Nothing keeps the order of the wrapped query's rows, so it must have none.
+    """
+    names = ", ".join(f"c{index}" for index in range(width))
+    columns = ", ".join(
+        f"typeof(c{index}) = 'blob', "
+        f"CASE WHEN typeof(c{index}) = 'blob' THEN length(c{index}) ELSE c{index} END"
+        for index in range(width)
+    )
+    # the newline ends a trailing comment in the query
+    return f"WITH run_sql({names}) AS ({query}\n) SELECT {columns} FROM run_sql"
+
+
+# stands in for a result that isn't cached, since None and [] are results
+_MISSING = object()
+
+
 @dataclass(slots=True)
 class Database:
+    """
+    Read-only access to a pdf2sqlite database from async code
+
+    Queries run on a bounded pool of worker threads, each of which opens its
+    own connection on first use and keeps it, so that warm queries reuse its
+    parsed schema, page cache and prepared statements.
+
+    Results of the listing queries are cached. Before a cached result is
+    used, the worker's connection checks ``PRAGMA data_version``, which
+    changes when another connection, like an ingest, commits to the file;
+    any change empties the cache. A result is only cached if the version
+    is unchanged after its query, so a query that overlaps a commit can't
+    cache rows from before it.
+    """
     path: Path
+    read_connections: int = DEFAULT_READ_CONNECTIONS
+    result_cache_entries: int = DEFAULT_RESULT_CACHE_ENTRIES
+    result_cache_ttl: float = DEFAULT_RESULT_CACHE_TTL
+    _results: ResultCache = field(init=False, repr=False)
+    _executor: ThreadPoolExecutor | None = field(default=None, init=False, repr=False)
+    _local: threading.local = field(default_factory=threading.local, init=False, repr=False)
+    _connections: list[sqlite3.Connection] = field(default_factory=list, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _results_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._results = ResultCache(self.result_cache_entries, self.result_cache_ttl)
 
     def _connect(self) -> sqlite3.Connection:
         uri = f"file:{self.path}?mode=ro"
-        conn = sqlite3.connect(uri, uri=True)
+        # connections are closed by close(), from whichever thread calls it
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            cached_statements=CACHED_STATEMENTS,
+            check_same_thread=False,
+        )
         conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+        conn.execute("PRAGMA query_only = ON")
+        try:
+            conn.enable_load_extension(True)
+            sqlite_vec.load(conn)
+            conn.enable_load_extension(False)
+        except (AttributeError, sqlite3.OperationalError):
+            # vector search is unavailable without the extension, but
+            # everything else still works
+            pass
         return conn
 
-    async def fetch_one(self, query: str, params: Iterable[Any] = ()) -> Row | None:
-        def task() -> Row | None:
-            with closing(self._connect()) as conn, closing(conn.cursor()) as cursor:
-                cursor.execute(query, tuple(params))
+    def _connection(self) -> sqlite3.Connection:
+        """The calling worker thread's connection, opened on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    async def _submit(self, task: Callable[[], T]) -> T:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.read_connections,
+                thread_name_prefix="pdf2sqlite-read",
+            )
+        return await asyncio.get_running_loop().run_in_executor(self._executor, task)
+
+    def _check_data_version(self, conn: sqlite3.Connection) -> int:
+        """
+        Empty the result cache if the database changed since this thread's
+        connection last looked. data_version is only comparable on one
+        connection, so a new connection can't tell and empties it too.
+
+        Returns:
+            The connection's data_version
+        """
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if getattr(self._local, "data_version", None) != version:
+            self._local.data_version = version
+            with self._results_lock:
+                self._results.clear()
+        return version
+
+    def _cache_result(self, conn: sqlite3.Connection, version: int, key: tuple[Any, ...], result: Any) -> None:
+        """
+        Cache a result unless the database changed while it was read.
+        Another worker may already have seen the commit and emptied the
+        cache, and wouldn't empty it again for these rows. Checking under
+        the lock that clears the cache means that any clear for a later
+        commit comes after the result is stored.
+        """
+        with self._results_lock:
+            if conn.execute("PRAGMA data_version").fetchone()[0] == version:
+                self._results.put(key, result)
+
+    async def _submit_cached(self, key: tuple[Any, ...], task: Callable[[sqlite3.Connection], T]) -> T:
+        """Run ``task`` on a pooled connection, or reuse its cached result"""
+
+        def run() -> T:
+            conn = self._connection()
+            version = self._check_data_version(conn)
+            result = self._results.get(key, _MISSING)
+            if result is _MISSING:
+                result = task(conn)
+                self._cache_result(conn, version, key, result)
+            return cast(T, result)
+
+        return await self._submit(run)
+
+    def close(self) -> None:
+        """Stop the worker threads and close their connections"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def schema_warning(self) -> str | None:
+        """Describe how out of date the database's schema is, if it is"""
+        with closing(self._connect()) as conn:
+            try:
+                pending = pending_migrations(conn)
+            except ValueError as exc:
+                return str(exc)
+            if not pending:
+                return None
+            return (
+                f"the database has schema version {schema_version(conn)} of "
+                f"{SCHEMA_VERSION}, so some tools may be slow or unavailable; "
+                f"run `pdf2sqlite migrate -d {self.path}` to upgrade it"
+            )
+
+    async def run(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """Run ``fn`` against a pooled read-only connection in a worker thread."""
+        return await self._submit(lambda: fn(self._connection()))
+
+    async def fetch_one(
+        self,
+        query: str,
+        params: Iterable[Any] = (),
+        cached: bool = False,
+    ) -> Row | None:
+        params = tuple(params)
+
+        def task(conn: sqlite3.Connection) -> Row | None:
+            # the cursor is closed so that its statement doesn't hold a read
+            # transaction open between calls
+            with closing(conn.cursor()) as cursor:
+                cursor.execute(query, params)
                 return cursor.fetchone()
 
-        return await asyncio.to_thread(task)
+        if cached:
+            return await self._submit_cached(("one", query, params), task)
+        return await self._submit(lambda: task(self._connection()))
 
-    async def fetch_all(self, query: str, params: Iterable[Any] = ()) -> list[Row]:
-        def task() -> list[Row]:
-            with closing(self._connect()) as conn, closing(conn.cursor()) as cursor:
-                cursor.execute(query, tuple(params))
+    async def fetch_all(
+        self,
+        query: str,
+        params: Iterable[Any] = (),
+        cached: bool = False,
+    ) -> list[Row]:
+        """Run a query; with ``cached``, reuse its result until the database changes"""
+        params = tuple(params)
+
+        def task(conn: sqlite3.Connection) -> list[Row]:
+            with closing(conn.cursor()) as cursor:
+                cursor.execute(query, params)
                 return cursor.fetchall()
 
-        return await asyncio.to_thread(task)
+        if cached:
+            return await self._submit_cached(("all", query, params), task)
+        return await self._submit(lambda: task(self._connection()))
+
+    async def fetch_many(
+        self,
+        queries: Sequence[tuple[str, Iterable[Any]]],
+        cached: bool = False,
+    ) -> list[list[Row]]:
+        """
+        Run several queries in one worker thread hop, inside a single read
+        transaction, so that they all see the same snapshot of the database
+        """
+        bundle = tuple((query, tuple(params)) for query, params in queries)
+
+        def task(conn: sqlite3.Connection) -> list[list[Row]]:
+            conn.execute("BEGIN")
+            try:
+                results = []
+                for query, params in bundle:
+                    with closing(conn.cursor()) as cursor:
+                        cursor.execute(query, params)
+                        results.append(cursor.fetchall())
+                return results
+            finally:
+                conn.rollback()
+
+        if cached:
+            return await self._submit_cached(("many", bundle), task)
+        return await self._submit(lambda: task(self._connection()))
+
+    async def run_sql(
+        self,
+        query: str,
+        params: Sequence[Any] = (),
+        *,
+        timeout: float,
+        max_rows: int,
+        max_bytes: int,
+    ) -> dict[str, Any]:
+        """
+        Run one caller-supplied SELECT under a time and size budget
+
+        Only reads are authorized, the query is interrupted once it has run
+        for ``timeout`` seconds, and at most ``max_rows`` rows and about
+        ``max_bytes`` bytes of values are returned, with ``truncated`` set
+        when there were more. Blobs are returned as their lengths, read only
+        when the query orders its rows, and no string or blob larger than
+        ``max_bytes`` may be made or read.
+
+        Raises:
+            QueryError: if the statement isn't a read, fails, or times out
+        """
+        params = tuple(params)
+        # a statement's own trailing semicolon would end the wrapping query
+        query = query.strip().rstrip(";")
+
+        def task() -> dict[str, Any]:
+            conn = self._connection()
+            started = time.monotonic()
+            deadline = started + timeout
+            length_limit = conn.getlimit(sqlite3.SQLITE_LIMIT_LENGTH)
+            conn.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, max_bytes)
+            conn.set_authorizer(_authorize_read)
+            conn.set_progress_handler(
+                lambda: int(time.monotonic() > deadline), _PROGRESS_INTERVAL
+            )
+            try:
+                plan = [
+                    row[3]
+                    for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)
+                ]
+                probe = conn.execute(f"SELECT * FROM ({query}\n) LIMIT 0", params)
+                columns = [column[0] for column in probe.description or ()]
+                # an ordered query runs as written, reading its blobs, since
+                # wrapping it could lose its order
+                ordered = _ORDER_BY.search(query) is not None
+                with closing(conn.cursor()) as cursor:
+                    cursor.execute(
+                        query if ordered else _blob_lengths_query(query, len(columns)),
+                        params,
+                    )
+                    rows: list[list[Any]] = []
+                    size = 0
+                    truncated = False
+                    # one row at a time, so that no more than a row is held
+                    # beyond the budget
+                    while (row := cursor.fetchone()) is not None:
+                        if ordered:
+                            values = [
+                                f"<blob: {len(value)} bytes>" if isinstance(value, bytes) else value
+                                for value in row
+                            ]
+                        else:
+                            values = [
+                                f"<blob: {value} bytes>" if is_blob else value
+                                for is_blob, value in zip(row[::2], row[1::2])
+                            ]
+                        size += sum(_value_bytes(value) for value in values)
+                        if len(rows) >= max_rows or size > max_bytes:
+                            truncated = True
+                            break
+                        rows.append(values)
+            except sqlite3.DataError as exc:
+                if exc.sqlite_errorcode == sqlite3.SQLITE_TOOBIG:
+                    raise QueryError(
+                        f"query made or read a value larger than its budget of {max_bytes} bytes"
+                    ) from None
+                raise QueryError(str(exc)) from None
+            except sqlite3.OperationalError as exc:
+                if time.monotonic() > deadline:
+                    raise QueryError(
+                        f"query ran longer than its budget of {timeout:g} seconds"
+                    ) from None
+                raise QueryError(str(exc)) from None
+            except sqlite3.DatabaseError as exc:
+                raise QueryError(str(exc)) from None
+            finally:
+                conn.set_progress_handler(None, 0)
+                conn.set_authorizer(None)
+                conn.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, length_limit)
+            return {
+                "columns": columns,
+                "rows": rows,
+                "row_count": len(rows),
+                "truncated": truncated,
+                "elapsed_ms": round((time.monotonic() - started) * 1000, 3),
+                "plan": plan,
+            }
+
+        return await self._submit(task)
 
     async def fetch_value(self, query: str, params: Iterable[Any] = ()) -> Any:
         row = await self.fetch_one(query, params)
@@ -51,7 +623,7 @@ class Database:
         return row[0]
 
     async def ensure_pdf_exists(self, pdf_id: int) -> None:
-        row = await self.fetch_one("SELECT id FROM pdfs WHERE id = ?", (pdf_id,))
+        row = await self.fetch_one("SELECT id FROM pdfs WHERE id = ?", (pdf_id,), cached=True)
         if row is None:
             raise NotFoundError(f"PDF {pdf_id} not found")
 
@@ -59,22 +631,27 @@ class Database:
         self,
         limit: int,
         offset: int,
+        after_id: int | None = None,
     ) -> list[dict[str, Any]]:
-        rows = await self.fetch_all(
-            """
-            SELECT
-                pdfs.id,
-                pdfs.title,
-                pdfs.description,
-                COUNT(pdf_pages.id) AS page_count
-            FROM pdfs
-            LEFT JOIN pdf_pages ON pdf_pages.pdf_id = pdfs.id
-            GROUP BY pdfs.id
-            ORDER BY pdfs.id
-            LIMIT ? OFFSET ?
-            """,
-            (limit, offset),
-        )
+        """
+        PDFs in id order with the statistics counted at ingest, which are
+        None for PDFs not yet counted. Passing the last id of the
+        previous page as ``after_id`` seeks straight to the next one, where
+        an ``offset`` has to step over every row before it
+        """
+        keyset = "" if after_id is None else "WHERE pdfs.id > ?"
+        params = (*(() if after_id is None else (after_id,)), limit, offset)
+
+        def task(conn: sqlite3.Connection) -> list[Row]:
+            try:
+                return conn.execute(_PDF_LIST_SQL.format(keyset=keyset), params).fetchall()
+            except sqlite3.OperationalError:
+                # databases migrated before statistics were kept
+                return conn.execute(
+                    _UNCOUNTED_PDF_LIST_SQL.format(keyset=keyset), params
+                ).fetchall()
+
+        rows = await self._submit_cached(("pdfs", keyset, params), task)
         return [dict(row) for row in rows]
 
     async def get_pdf_pages(
@@ -82,7 +659,9 @@ class Database:
         pdf_id: int,
         limit: int,
         offset: int,
+        after_page: int | None = None,
     ) -> list[dict[str, Any]]:
+        """A PDF's pages in order, after page ``after_page`` if it is given"""
         rows = await self.fetch_all(
             """
             SELECT
@@ -93,29 +672,17 @@ class Database:
                 LENGTH(text) AS text_length,
                 LENGTH(data) AS data_bytes
             FROM pdf_pages
-            WHERE pdf_id = ?
+            WHERE pdf_id = ? AND page_number > ?
             ORDER BY page_number
             LIMIT ? OFFSET ?
             """,
-            (pdf_id, limit, offset),
+            (pdf_id, -1 if after_page is None else after_page, limit, offset),
+            cached=True,
         )
         return [dict(row) for row in rows]
 
     async def get_page_summary(self, page_id: int) -> dict[str, Any]:
-        row = await self.fetch_one(
-            """
-            SELECT
-                id,
-                pdf_id,
-                page_number,
-                gist,
-                LENGTH(text) AS text_length,
-                LENGTH(data) AS data_bytes
-            FROM pdf_pages
-            WHERE id = ?
-            """,
-            (page_id,),
-        )
+        row = await self.fetch_one(_PAGE_SUMMARY_SQL, (page_id,), cached=True)
         if row is None:
             raise NotFoundError(f"Page {page_id} not found")
         return dict(row)
@@ -131,30 +698,125 @@ class Database:
             )
         return int(row[0])
 
-    async def get_page_blob(self, pdf_id: int, page_number: int) -> bytes:
-        row = await self.fetch_one(
-            "SELECT data FROM pdf_pages WHERE pdf_id = ? AND page_number = ?",
-            (pdf_id, page_number),
-        )
-        if row is None or row[0] is None:
-            raise NotFoundError(
-                f"No PDF data for page {page_number} in PDF {pdf_id}"
-            )
-        return bytes(row[0])
+    async def get_page_blob(
+        self,
+        pdf_id: int,
+        page_number: int,
+        max_bytes: int | None = None,
+    ) -> bytes:
+        def task() -> bytes:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT id FROM pdf_pages WHERE pdf_id = ? AND page_number = ?",
+                (pdf_id, page_number),
+            ).fetchone()
+            missing = f"No PDF data for page {page_number} in PDF {pdf_id}"
+            if row is None:
+                raise NotFoundError(missing)
+            try:
+                blob = read_blob_range(conn, "pdf_page", row[0], max_bytes=max_bytes)
+            except NotFoundError:
+                raise NotFoundError(missing) from None
+            return cast(bytes, blob.data)
 
-    async def get_page_blob_by_id(self, page_id: int) -> bytes:
-        row = await self.fetch_one(
-            "SELECT data FROM pdf_pages WHERE id = ?",
-            (page_id,),
+        return await self._submit(task)
+
+    async def get_page_blob_by_id(self, page_id: int, max_bytes: int | None = None) -> bytes:
+        try:
+            blob = await self.read_blob("pdf_page", page_id, max_bytes=max_bytes)
+        except NotFoundError:
+            raise NotFoundError(f"No PDF data for page {page_id}") from None
+        return cast(bytes, blob.data)
+
+    async def read_blob(
+        self,
+        kind: str,
+        rowid: int,
+        offset: int = 0,
+        length: int | None = None,
+        *,
+        max_bytes: int | None = None,
+        encode: bool = False,
+    ) -> BlobRange:
+        """
+        Read a byte range of a page, figure or table image blob; see
+        `read_blob_range`
+        """
+        return await self._submit(
+            lambda: read_blob_range(
+                self._connection(),
+                kind,
+                rowid,
+                offset,
+                length,
+                max_bytes=max_bytes,
+                encode=encode,
+            )
         )
-        if row is None or row[0] is None:
-            raise NotFoundError(f"No PDF data for page {page_id}")
-        return bytes(row[0])
+
+    async def get_page_render(self, page_id: int, dpi: int) -> bytes | None:
+        """A stored PNG of a page at a resolution, if one was rendered"""
+
+        def task() -> bytes | None:
+            try:
+                row = self._connection().execute(
+                    "SELECT data FROM page_renders WHERE page_id = ? AND dpi = ?",
+                    (page_id, dpi),
+                ).fetchone()
+            except sqlite3.OperationalError:
+                # databases migrated before renders were stored
+                return None
+            return None if row is None else row[0]
+
+        return await self._submit(task)
+
+    async def store_page_render(
+        self,
+        page_id: int,
+        dpi: int,
+        png: bytes,
+        width: int,
+        height: int,
+    ) -> bool:
+        """
+        Keep a page render for later requests, through a short-lived
+        writable connection, since the pooled ones are read-only
+
+        Returns:
+            Whether the render was stored, which it isn't when the database
+            is read-only, busy, or has no table for renders yet
+        """
+
+        def task() -> bool:
+            try:
+                with closing(sqlite3.connect(self.path, timeout=1)) as conn:
+                    store_render(conn, page_id, dpi, png, width, height)
+                    conn.commit()
+            except sqlite3.OperationalError:
+                return False
+            return True
+
+        return await self._submit(task)
+
+    async def get_pdf_version(self, pdf_id: int) -> str:
+        """
+        A version of a PDF's stored pages, which changes whenever pages are
+        added, removed or replaced
+        """
+        row = await self.fetch_one(_PDF_VERSION_SQL, (pdf_id,))
+        return _pdf_version(row)
 
     async def get_pdf_page_rows(self, pdf_id: int) -> list[bytes]:
-        rows = await self.fetch_all(
-            "SELECT data FROM pdf_pages WHERE pdf_id = ? ORDER BY page_number",
-            (pdf_id,),
+        _, payloads = await self.get_versioned_pdf_page_rows(pdf_id)
+        return payloads
+
+    async def get_versioned_pdf_page_rows(self, pdf_id: int) -> tuple[str, list[bytes]]:
+        """A PDF's page blobs, in order, with their version from the same snapshot"""
+        (version_row,), rows = await self.fetch_many(
+            [
+                (_PDF_VERSION_SQL, (pdf_id,)),
+                ("SELECT data FROM pdf_pages WHERE pdf_id = ? ORDER BY page_number", (pdf_id,)),
+            ]
         )
         if not rows:
             raise NotFoundError(f"No pages found for PDF {pdf_id}")
@@ -166,66 +828,65 @@ class Database:
                     f"PDF {pdf_id} has a page without stored PDF data"
                 )
             payloads.append(bytes(blob))
-        return payloads
+        return _pdf_version(version_row), payloads
 
     async def get_figures_for_page(self, page_id: int) -> list[dict[str, Any]]:
-        rows = await self.fetch_all(
-            """
-            SELECT
-                pdf_figures.id,
-                pdf_figures.description,
-                pdf_figures.mime_type,
-                LENGTH(pdf_figures.data) AS data_bytes
-            FROM pdf_figures
-            JOIN page_to_figure ON page_to_figure.figure_id = pdf_figures.id
-            WHERE page_to_figure.page_id = ?
-            ORDER BY pdf_figures.id
-            """,
-            (page_id,),
-        )
+        rows = await self.fetch_all(_PAGE_FIGURES_SQL, (page_id,), cached=True)
         return [dict(row) for row in rows]
 
     async def get_tables_for_page(self, page_id: int) -> list[dict[str, Any]]:
-        rows = await self.fetch_all(
-            """
-            SELECT
-                pdf_tables.id,
-                pdf_tables.pdf_id,
-                pdf_tables.page_number,
-                pdf_tables.text,
-                pdf_tables.description,
-                pdf_tables.caption_above,
-                pdf_tables.caption_below,
-                pdf_tables.xmin,
-                pdf_tables.ymin,
-                LENGTH(pdf_tables.image) AS data_bytes,
-                LENGTH(pdf_tables.text) AS text_length
-            FROM pdf_tables
-            JOIN page_to_table ON page_to_table.table_id = pdf_tables.id
-            WHERE page_to_table.page_id = ?
-            ORDER BY pdf_tables.id
-            """,
-            (page_id,),
-        )
+        rows = await self.fetch_all(_PAGE_TABLES_SQL, (page_id,), cached=True)
         return [dict(row) for row in rows]
 
-    async def get_figure_blob(self, figure_id: int) -> tuple[bytes, str | None]:
-        row = await self.fetch_one(
-            "SELECT data, mime_type FROM pdf_figures WHERE id = ?",
-            (figure_id,),
+    async def get_page_assets(
+        self,
+        page_id: int,
+    ) -> tuple[dict[str, Any], list[dict[str, Any]], list[dict[str, Any]]]:
+        """A page's summary, figures and tables, read from one snapshot"""
+        summary, figures, tables = await self.fetch_many(
+            [
+                (_PAGE_SUMMARY_SQL, (page_id,)),
+                (_PAGE_FIGURES_SQL, (page_id,)),
+                (_PAGE_TABLES_SQL, (page_id,)),
+            ],
+            cached=True,
         )
-        if row is None or row[0] is None:
-            raise NotFoundError(f"Figure {figure_id} not found")
-        return bytes(row[0]), row[1]
-
-    async def get_table_image_blob(self, table_id: int) -> bytes:
-        row = await self.fetch_one(
-            "SELECT image FROM pdf_tables WHERE id = ?",
-            (table_id,),
+        if not summary:
+            raise NotFoundError(f"Page {page_id} not found")
+        return (
+            dict(summary[0]),
+            [dict(row) for row in figures],
+            [dict(row) for row in tables],
         )
-        if row is None or row[0] is None:
-            raise NotFoundError(f"Table image {table_id} not found")
-        return bytes(row[0])
+
+    async def get_figure_blob(
+        self,
+        figure_id: int,
+        max_bytes: int | None = None,
+    ) -> tuple[bytes, str | None]:
+        def task() -> tuple[bytes, str | None]:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT mime_type FROM pdf_figures WHERE id = ?",
+                (figure_id,),
+            ).fetchone()
+            missing = f"Figure {figure_id} not found"
+            if row is None:
+                raise NotFoundError(missing)
+            try:
+                blob = read_blob_range(conn, "figure", figure_id, max_bytes=max_bytes)
+            except NotFoundError:
+                raise NotFoundError(missing) from None
+            return cast(bytes, blob.data), row[0]
+
+        return await self._submit(task)
+
+    async def get_table_image_blob(self, table_id: int, max_bytes: int | None = None) -> bytes:
+        try:
+            blob = await self.read_blob("table_image", table_id, max_bytes=max_bytes)
+        except NotFoundError:
+            raise NotFoundError(f"Table image {table_id} not found") from None
+        return cast(bytes, blob.data)
 
     async def get_table_summary(self, table_id: int) -> dict[str, Any]:
         row = await self.fetch_one(
@@ -264,6 +925,55 @@ class Database:
             raise NotFoundError(f"Figure {figure_id} not found")
         return dict(row)
 
+    async def get_embedding_space(
+        self,
+        model: str,
+        target: str = "section",
+    ) -> EmbeddingSpace | None:
+        return await self.run(lambda conn: get_space(conn, model, target))
+
+    async def get_search_space(self, model: str) -> EmbeddingSpace | None:
+        return await self.run(lambda conn: search.search_space(conn, model))
+
+    async def semantic_search(
+        self,
+        space: EmbeddingSpace,
+        embedding: np.ndarray,
+        limit: int,
+        pdf_ids: list[int] | None = None,
+        collection: str | None = None,
+    ) -> list[dict[str, Any]]:
+        return await self.run(
+            lambda conn: search.semantic_search(
+                conn, space, embedding, limit, pdf_ids=pdf_ids, collection=collection
+            )
+        )
+
+    async def asset_search(
+        self,
+        space: EmbeddingSpace,
+        embedding: np.ndarray,
+        limit: int,
+        pdf_ids: list[int] | None = None,
+        collection: str | None = None,
+    ) -> list[dict[str, Any]]:
+        return await self.run(
+            lambda conn: search.asset_search(
+                conn, space, embedding, limit, pdf_ids, collection
+            )
+        )
+
+    async def keyword_search(
+        self,
+        query: str,
+        limit: int,
+        pdf_ids: list[int] | None = None,
+        collection: str | None = None,
+    ) -> dict[str, list[dict[str, Any]]]:
+        return await self.run(
+            lambda conn: search.keyword_search(conn, query, limit, pdf_ids, collection)
+        )
+
     async def get_schema(self, table: str | None = None) -> list[str]:
         if table:
             rows = await self.fetch_all(
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import base64
+import binascii
+from typing import Any, Mapping, Sequence
+
+# A cursor names a listing and holds the sort key of the last row it
+# returned, so that the next page is found with a keyset predicate on the
+# key rather than by counting past every earlier row with OFFSET. Clients
+# treat cursors as opaque.
+
+
+def encode_cursor(listing: str, *key: int) -> str:
+    text = ":".join([listing, *(str(value) for value in key)])
+    return base64.urlsafe_b64encode(text.encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, listing: str, size: int) -> tuple[int, ...]:
+    """
+    The key held by a cursor from `encode_cursor`
+
+    Raises:
+        ValueError: if the cursor is malformed or belongs to another listing
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        text = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii")
+        found, *values = text.split(":")
+        key = tuple(int(value) for value in values)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError(f"Invalid cursor '{cursor}'") from None
+    if found != listing or len(key) != size:
+        raise ValueError(f"Cursor '{cursor}' does not belong to this listing")
+    return key
+
+
+def next_cursor(
+        listing: str,
+        rows: Sequence[Mapping[str, Any]],
+        limit: int,
+        *columns: str,
+) -> str | None:
+    """A cursor for the page after ``rows``, keyed on ``columns`` of the last"""
+    if not rows or len(rows) < limit:
+        return None
+    return encode_cursor(listing, *(int(rows[-1][column]) for column in columns))
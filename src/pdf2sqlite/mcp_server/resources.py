@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 import base64
 import io
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from types import MethodType
 from typing import Any, Awaitable, Callable, Mapping, cast
+from urllib.parse import parse_qs
 
 from mcp.server.fastmcp import Context, FastMCP
 from mcp.server.fastmcp.resources.types import FunctionResource
@@ -13,11 +15,20 @@ from mcp.types import BlobResourceContents, EmbeddedResource
 from pydantic import AnyUrl
 from pypdf import PdfReader, PdfWriter
 
+from ..render import DEFAULT_DPI, check_dpi, render_page
+from .cache import PdfCache, database_cache_dir
 from .config import ServerConfig
-from .db import Database, NotFoundError
+from .db import (
+    BlobRange,
+    BlobTooLargeError,
+    Database,
+    NotFoundError,
+)
 from .uri import (
     FigureResource,
+    PageImageResource,
     PdfResource,
+    ResourceDescriptor,
     TableImageResource,
     build_figure_uri,
     build_pdf_page_uri,
@@ -30,57 +41,161 @@ class ResourceTooLargeError(ValueError):
     """Raised when a blob exceeds the configured size limit."""
 
 
+def merge_pages(pages: list[bytes]) -> bytes:
+    """Reassemble a document from its single-page PDFs"""
+    writer = PdfWriter()
+    for page_bytes in pages:
+        reader = PdfReader(io.BytesIO(page_bytes))
+        for page in reader.pages:
+            writer.add_page(page)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
 @dataclass(slots=True)
 class ResourceService:
     database: Database
     config: ServerConfig
+    pdf_cache: PdfCache = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        directory = self.config.pdf_cache_dir
+        if directory is not None:
+            directory = database_cache_dir(directory, self.database.path)
+        self.pdf_cache = PdfCache(self.config.pdf_cache_bytes, directory)
+
+    def _too_large(self, size: int, label: str) -> ResourceTooLargeError:
+        return ResourceTooLargeError(
+            f"{label} is {size} bytes, which exceeds the configured "
+            f"limit of {self.config.max_blob_bytes} bytes"
+        )
 
     def _check_size(self, payload: bytes, label: str) -> bytes:
         if len(payload) > self.config.max_blob_bytes:
-            raise ResourceTooLargeError(
-                f"{label} is {len(payload)} bytes, which exceeds the configured "
-                f"limit of {self.config.max_blob_bytes} bytes"
-            )
+            raise self._too_large(len(payload), label)
+        return payload
+
+    async def _load_full_pdf(self, pdf_id: int) -> bytes:
+        version = await self.database.get_pdf_version(pdf_id)
+        # a miss in memory reads the document from disk
+        payload = await asyncio.to_thread(self.pdf_cache.get, pdf_id, version)
+        if payload is None:
+            version, pages = await self.database.get_versioned_pdf_page_rows(pdf_id)
+            # rebuilding a large manual takes seconds, so it is kept off
+            # the event loop
+            payload = await asyncio.to_thread(merge_pages, pages)
+            if not payload:
+                raise NotFoundError(f"PDF {pdf_id} is empty")
+            await asyncio.to_thread(self.pdf_cache.put, pdf_id, version, payload)
         return payload
 
     async def load_pdf_blob(self, pdf: PdfResource) -> bytes:
         if pdf.page_number is None:
-            pages = await self.database.get_pdf_page_rows(pdf.pdf_id)
-            writer = PdfWriter()
-            for page_bytes in pages:
-                reader = PdfReader(io.BytesIO(page_bytes))
-                for page in reader.pages:
-                    writer.add_page(page)
-            buffer = io.BytesIO()
-            writer.write(buffer)
-            payload = buffer.getvalue()
-            if not payload:
-                raise NotFoundError(f"PDF {pdf.pdf_id} is empty")
+            payload = await self._load_full_pdf(pdf.pdf_id)
             return self._check_size(payload, f"PDF {pdf.pdf_id}")
 
-        blob = await self.database.get_page_blob(pdf.pdf_id, pdf.page_number)
-        return self._check_size(blob, f"PDF {pdf.pdf_id} page {pdf.page_number}")
+        label = f"PDF {pdf.pdf_id} page {pdf.page_number}"
+        try:
+            return await self.database.get_page_blob(
+                pdf.pdf_id, pdf.page_number, max_bytes=self.config.max_blob_bytes
+            )
+        except BlobTooLargeError as exc:
+            raise self._too_large(exc.size, label) from None
 
     async def load_figure_blob(self, figure: FigureResource) -> tuple[bytes, str | None]:
-        blob, mime = await self.database.get_figure_blob(figure.figure_id)
-        blob = self._check_size(blob, f"figure {figure.figure_id}")
-        return blob, mime
+        try:
+            return await self.database.get_figure_blob(
+                figure.figure_id, max_bytes=self.config.max_blob_bytes
+            )
+        except BlobTooLargeError as exc:
+            raise self._too_large(exc.size, f"figure {figure.figure_id}") from None
 
     async def load_table_image_blob(self, table: TableImageResource) -> bytes:
-        blob = await self.database.get_table_image_blob(table.table_id)
-        return self._check_size(blob, f"table image {table.table_id}")
+        try:
+            return await self.database.get_table_image_blob(
+                table.table_id, max_bytes=self.config.max_blob_bytes
+            )
+        except BlobTooLargeError as exc:
+            raise self._too_large(exc.size, f"table image {table.table_id}") from None
+
+    async def load_page_image(self, image: PageImageResource) -> bytes:
+        """
+        A PNG of a page, from the renders stored in the database when there
+        is one at the resolution asked for, and rendered otherwise
+        """
+        dpi = check_dpi(image.dpi or DEFAULT_DPI)
+        page_id = await self.database.get_page_id(image.pdf_id, image.page_number)
+        png = await self.database.get_page_render(page_id, dpi)
+        if png is None:
+            page = await self.database.get_page_blob(image.pdf_id, image.page_number)
+            png, width, height = await asyncio.to_thread(render_page, page, dpi)
+            if self.config.store_renders:
+                await self.database.store_page_render(page_id, dpi, png, width, height)
+        return self._check_size(
+            png, f"PDF {image.pdf_id} page {image.page_number} at {dpi} dpi"
+        )
+
+    async def load_blob_range(
+        self,
+        descriptor: ResourceDescriptor,
+        offset: int = 0,
+        length: int | None = None,
+    ) -> BlobRange:
+        """
+        Read part of a resource as base64, at most ``max_blob_bytes`` of it,
+        so that resources over the limit can still be fetched piece by piece
+        """
+        limit = self.config.max_blob_bytes
+        length = limit if length is None else min(length, limit)
+        if isinstance(descriptor, PdfResource) and descriptor.page_number is None:
+            # a full document only exists once it is rebuilt from its pages
+            payload = memoryview(await self._load_full_pdf(descriptor.pdf_id))
+            if not 0 <= offset <= len(payload):
+                raise ValueError(f"offset {offset} is outside a blob of {len(payload)} bytes")
+            if length < 0:
+                raise ValueError("length must not be negative")
+            part = payload[offset:offset + length]
+            encoded = base64.b64encode(part).decode("ascii")
+            return BlobRange(len(payload), offset, len(part), encoded)
+
+        if isinstance(descriptor, PageImageResource):
+            raise ValueError("page images are read whole, with get_image")
+        if isinstance(descriptor, PdfResource):
+            page_number = cast(int, descriptor.page_number)
+            rowid = await self.database.get_page_id(descriptor.pdf_id, page_number)
+            kind = "pdf_page"
+        elif isinstance(descriptor, FigureResource):
+            rowid, kind = descriptor.figure_id, "figure"
+        else:
+            rowid, kind = descriptor.table_id, "table_image"
+        return await self.database.read_blob(kind, rowid, offset, length, encode=True)
+
+    async def embed_pdf(self, pdf: PdfResource, uri: str) -> tuple[int, EmbeddedResource]:
+        """
+        A PDF resource embedded in a tool result, with its size in bytes
+
+        Single pages are encoded straight from the database a chunk at a
+        time, without first loading the whole page.
+        """
+        if pdf.page_number is None:
+            data = await self.load_pdf_blob(pdf)
+            return len(data), await self.make_embedded_pdf(uri, data)
+
+        page_id = await self.database.get_page_id(pdf.pdf_id, pdf.page_number)
+        try:
+            blob = await self.database.read_blob(
+                "pdf_page", page_id, max_bytes=self.config.max_blob_bytes, encode=True
+            )
+        except BlobTooLargeError as exc:
+            raise self._too_large(
+                exc.size, f"PDF {pdf.pdf_id} page {pdf.page_number}"
+            ) from None
+        return blob.size, _embedded_pdf(uri, cast(str, blob.data), blob.size)
 
     async def make_embedded_pdf(self, uri: str, data: bytes) -> EmbeddedResource:
         encoded = base64.b64encode(data).decode("ascii")
-        return EmbeddedResource(
-            type="resource",
-            resource=BlobResourceContents(
-                uri=cast(AnyUrl, uri),
-                mimeType="application/pdf",
-                blob=encoded,
-                _meta={"size": len(data)},
-            ),
-        )
+        return _embedded_pdf(uri, encoded, len(data))
 
     def as_image(self, data: bytes, mime_type: str | None) -> Image:
         subtype: str | None = None
@@ -89,6 +204,18 @@ class ResourceService:
         return Image(data=data, format=subtype)
 
 
+def _embedded_pdf(uri: str, encoded: str, size: int) -> EmbeddedResource:
+    return EmbeddedResource(
+        type="resource",
+        resource=BlobResourceContents(
+            uri=cast(AnyUrl, uri),
+            mimeType="application/pdf",
+            blob=encoded,
+            _meta={"size": size},
+        ),
+    )
+
+
 def _patch_dynamic_blob_template(
     server: FastMCP,
     uri_template: str,
@@ -127,6 +254,31 @@ def _patch_dynamic_blob_template(
     object.__setattr__(template, "create_resource", MethodType(create_resource, template))
 
 
+def _accept_query_parameters(server: FastMCP, uri_template: str, names: set[str]) -> None:
+    """
+    Let a resource template match URIs with a query string, passing the
+    named query parameters to its loader along with the path parameters
+    """
+    template = server._resource_manager._templates.get(uri_template)
+    if template is None:
+        raise RuntimeError(
+            f"Resource template {uri_template} is not registered"
+        )
+    match_path = template.matches
+
+    def matches(self: Any, uri: str) -> dict[str, Any] | None:
+        path, _, query = uri.partition("?")
+        params = match_path(path)
+        if params is None:
+            return None
+        for name, values in parse_qs(query).items():
+            if name in names:
+                params[name] = values[-1]
+        return params
+
+    object.__setattr__(template, "matches", MethodType(matches, template))
+
+
 def register_resources(server: FastMCP, service: ResourceService) -> None:
     @server.resource(
         "pdf2sqlite://pdf/{pdf_id}",
@@ -150,6 +302,16 @@ def register_resources(server: FastMCP, service: ResourceService) -> None:
         pdf = PdfResource(pdf_id=pdf_id, page_number=page_number)
         return await service.load_pdf_blob(pdf)
 
+    @server.resource(
+        "pdf2sqlite://pdf/{pdf_id}/page/{page_number}/image",
+        name="pdf2sqlite.pdf_page_image",
+        title="Rendered page image",
+        description=f"A PNG of a single page, at ?dpi= ({DEFAULT_DPI} by default)",
+        mime_type="image/png",
+    )
+    async def read_page_image(pdf_id: int, page_number: int, ctx: Context | None = None) -> bytes:  # noqa: ARG001
+        return await service.load_page_image(PageImageResource(pdf_id, page_number))
+
     @server.resource(
         "pdf2sqlite://figure/{figure_id}",
         name="pdf2sqlite.figure",
@@ -186,6 +348,28 @@ def register_resources(server: FastMCP, service: ResourceService) -> None:
         )
         return data, "image/jpeg"
 
+    async def _page_image_loader(
+        params: Mapping[str, object],
+        ctx: Context | None,
+    ) -> tuple[bytes, str | None]:  # noqa: ARG001
+        image = PageImageResource(
+            pdf_id=_require_int(params.get("pdf_id"), "image.pdf_id"),
+            page_number=_require_int(params.get("page_number"), "image.page_number"),
+            dpi=_optional_int(params.get("dpi"), "image.dpi"),
+        )
+        return await service.load_page_image(image), "image/png"
+
+    _patch_dynamic_blob_template(
+        server,
+        "pdf2sqlite://pdf/{pdf_id}/page/{page_number}/image",
+        default_mime="image/png",
+        loader=_page_image_loader,
+    )
+    _accept_query_parameters(
+        server,
+        "pdf2sqlite://pdf/{pdf_id}/page/{page_number}/image",
+        {"dpi"},
+    )
     _patch_dynamic_blob_template(
         server,
         "pdf2sqlite://figure/{figure_id}",
@@ -242,13 +426,97 @@ def build_page_payload(page: Mapping[str, object]) -> dict[str, object]:
 
 def build_pdf_payload(pdf: Mapping[str, object]) -> dict[str, object]:
     pdf_id = _require_int(pdf.get("id"), "pdf.id")
-    return {
+    payload: dict[str, object] = {
         "pdf_id": pdf_id,
         "title": pdf.get("title"),
         "description": pdf.get("description"),
         "page_count": _optional_int(pdf.get("page_count"), "pdf.page_count"),
         "resource": build_pdf_uri(pdf_id),
     }
+    # the statistics counted at ingest, for PDFs that have them
+    for key in ("section_count", "figure_count", "table_count", "total_bytes"):
+        value = _optional_int(pdf.get(key), f"pdf.{key}")
+        if value is not None:
+            payload[key] = value
+    if pdf.get("gists_complete") is not None:
+        payload["enrichments"] = {
+            "abstract": bool(pdf.get("has_abstract")),
+            "page_gists": bool(pdf.get("gists_complete")),
+            "figure_descriptions": bool(pdf.get("figure_descriptions_complete")),
+            "table_descriptions": bool(pdf.get("table_descriptions_complete")),
+        }
+    return payload
+
+
+def build_section_payload(section: Mapping[str, object]) -> dict[str, object]:
+    pdf_id = _require_int(section.get("pdf_id"), "section.pdf_id")
+    # sections record zero-based pages, pages are numbered from one; a
+    # semantic match points at the page of its best matching chunk
+    start_page = _require_int(section.get("start_page"), "section.start_page")
+    match_page = _optional_int(section.get("match_page"), "section.match_page")
+    page_number = (start_page if match_page is None else match_page) + 1
+    payload: dict[str, object] = {
+        "section_id": _require_int(section.get("id"), "section.id"),
+        "pdf_id": pdf_id,
+        "pdf_title": section.get("pdf_title"),
+        "title": section.get("title"),
+        "gist": section.get("gist"),
+        "page_number": page_number,
+        "resource": build_pdf_page_uri(pdf_id, page_number),
+        "pdf_resource": build_pdf_uri(pdf_id),
+    }
+    distance = section.get("distance")
+    if distance is not None:
+        payload["distance"] = float(distance)  # type: ignore[arg-type]
+    return payload
+
+
+def build_section_hit_payload(hit: Mapping[str, object]) -> dict[str, object]:
+    payload = build_section_payload(hit)
+    payload["score"] = float(hit["score"])  # type: ignore[arg-type]
+    payload["keyword_rank"] = _optional_int(hit.get("keyword_rank"), "hit.keyword_rank")
+    payload["vector_rank"] = _optional_int(hit.get("vector_rank"), "hit.vector_rank")
+    return payload
+
+
+def build_page_hit_payload(hit: Mapping[str, object]) -> dict[str, object]:
+    pdf_id = _require_int(hit.get("pdf_id"), "hit.pdf_id")
+    page_number = _require_int(hit.get("page_number"), "hit.page_number")
+    return {
+        "page_id": _optional_int(hit.get("id"), "hit.id"),
+        "pdf_id": pdf_id,
+        "page_number": page_number,
+        "gist": hit.get("gist"),
+        "snippet": hit.get("snippet"),
+        "score": float(hit["score"]),  # type: ignore[arg-type]
+        "resource": build_pdf_page_uri(pdf_id, page_number),
+    }
+
+
+def build_asset_hit_payload(target: str, hit: Mapping[str, object]) -> dict[str, object]:
+    item_id = _require_int(hit.get("id"), "hit.id")
+    pdf_id = _optional_int(hit.get("pdf_id"), "hit.pdf_id")
+    page_number = _optional_int(hit.get("page_number"), "hit.page_number")
+    page_resource = (
+        build_pdf_page_uri(pdf_id, page_number)
+        if pdf_id is not None and page_number is not None
+        else None
+    )
+    if target == "figure":
+        resource = build_figure_uri(item_id)
+    elif target == "table":
+        resource = build_table_image_uri(item_id)
+    else:
+        resource = page_resource
+    return {
+        f"{target}_id": item_id,
+        "pdf_id": pdf_id,
+        "page_number": page_number,
+        "text": hit.get("text"),
+        "distance": float(hit["distance"]),  # type: ignore[arg-type]
+        "resource": resource,
+        "page_resource": page_resource,
+    }
 
 
 def build_figure_payload(figure: Mapping[str, object]) -> dict[str, object]:
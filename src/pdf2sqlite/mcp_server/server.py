@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import sys
+
 from mcp.server.fastmcp import FastMCP
 from mcp.types import Icon
 
+from ..search import QueryEmbedder
 from .config import ServerConfig
 from .db import Database
 from .resources import ResourceService, register_resources
@@ -11,7 +14,9 @@ from .tools import ToolSuite
 _SERVER_NAME = "pdf2sqlite-mcp"
 _INSTRUCTIONS = (
     "Use list_pdfs to discover documents, list_pdf_pages to enumerate pages, "
-    "and list_page_assets to locate figures and tables. Fetch binaries via the "
+    "and list_page_assets to locate figures and tables. Use hybrid_search to "
+    "find pages and sections by keyword and meaning, or semantic_search when it "
+    "is available to search by meaning alone. Fetch binaries via the "
     "pdf2sqlite:// resource URIs, using get_image or get_pdf when inline "
     "delivery is required."
 )
@@ -26,7 +31,15 @@ def build_server(config: ServerConfig, **fastmcp_kwargs) -> FastMCP:
         **fastmcp_kwargs,
     )
 
-    database = Database(config.database_path)
+    database = Database(
+        config.database_path,
+        result_cache_entries=config.result_cache_entries,
+        result_cache_ttl=config.result_cache_ttl,
+    )
+    warning = database.schema_warning()
+    if warning:
+        # stdout carries the protocol on the stdio transport
+        print(f"warning: {warning}", file=sys.stderr)
     resources = ResourceService(database=database, config=config)
 
     register_resources(server, resources)
@@ -36,6 +49,7 @@ def build_server(config: ServerConfig, **fastmcp_kwargs) -> FastMCP:
         database=database,
         resources=resources,
         config=config,
+        embedder=QueryEmbedder(config.embedder) if config.embedder else None,
     )
     tools.register()
 
@@ -1,34 +1,56 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
+from typing import Literal
 
 from mcp.server.fastmcp import FastMCP
 from mcp.server.fastmcp.utilities.types import Image
 from mcp.types import EmbeddedResource, TextContent, ToolAnnotations
 
+from ..search import QueryEmbedder, fuse_results
 from .config import ServerConfig
 from .db import Database, NotFoundError
+from .pagination import decode_cursor, next_cursor
 from .resources import (
     ResourceService,
+    build_asset_hit_payload,
     build_figure_payload,
     build_page_payload,
+    build_page_hit_payload,
     build_pdf_payload,
+    build_section_hit_payload,
+    build_section_payload,
     build_table_payload,
 )
 from .uri import (
     FigureResource,
+    PageImageResource,
     PdfResource,
     TableImageResource,
     parse_resource_uri,
 )
 
 
+# how many candidates each ranking contributes to hybrid search
+_HYBRID_CANDIDATES = 50
+
+# the embedding target searched for each semantic_search scope
+_SEARCH_SCOPES = {
+    "sections": "section",
+    "pages": "page",
+    "figures": "figure",
+    "tables": "table",
+}
+
+
 @dataclass(slots=True)
 class ToolSuite:
     server: FastMCP
     database: Database
     resources: ResourceService
     config: ServerConfig
+    embedder: QueryEmbedder | None = None
 
     def register(self) -> None:
         annotations = ToolAnnotations(readOnlyHint=True)
@@ -37,38 +59,57 @@ class ToolSuite:
             name="list_pdfs",
             description=
             "List the PDFs stored in the database along with metadata and "
-            "resource URIs",
+            "resource URIs. Pass the returned next_cursor to get the next page",
             annotations=annotations,
         )
         async def list_pdfs(
             limit: int | None = None,
             offset: int = 0,
+            cursor: str | None = None,
         ) -> dict[str, object]:
             capped_limit = self.config.clamp_limit(limit)
-            rows = await self.database.get_pdf_counts(capped_limit, offset)
+            after_id = None if cursor is None else decode_cursor(cursor, "pdfs", 1)[0]
+            rows = await self.database.get_pdf_counts(capped_limit, offset, after_id)
             items = [build_pdf_payload(row) for row in rows]
-            return {"pdfs": items, "limit": capped_limit, "offset": offset}
+            return {
+                "pdfs": items,
+                "limit": capped_limit,
+                "offset": offset,
+                "next_cursor": next_cursor("pdfs", rows, capped_limit, "id"),
+            }
 
         @self.server.tool(
             name="list_pdf_pages",
             description=
-            "List pages for a PDF with summaries and resource identifiers",
+            "List pages for a PDF with summaries and resource identifiers. "
+            "Pass the returned next_cursor to get the next page",
             annotations=annotations,
         )
         async def list_pdf_pages(
             pdf_id: int,
             limit: int | None = None,
             offset: int = 0,
+            cursor: str | None = None,
         ) -> dict[str, object]:
+            after_page = None
+            if cursor is not None:
+                cursor_pdf_id, after_page = decode_cursor(cursor, "pages", 2)
+                if cursor_pdf_id != pdf_id:
+                    raise ValueError(f"Cursor '{cursor}' is for another PDF")
             await self.database.ensure_pdf_exists(pdf_id)
             capped_limit = self.config.clamp_limit(limit)
-            rows = await self.database.get_pdf_pages(pdf_id, capped_limit, offset)
+            rows = await self.database.get_pdf_pages(
+                pdf_id, capped_limit, offset, after_page
+            )
             pages = [build_page_payload(row) for row in rows]
             return {
                 "pdf_id": pdf_id,
                 "pages": pages,
                 "limit": capped_limit,
                 "offset": offset,
+                "next_cursor": next_cursor(
+                    "pages", rows, capped_limit, "pdf_id", "page_number"
+                ),
             }
 
         @self.server.tool(
@@ -78,15 +119,113 @@ class ToolSuite:
             annotations=annotations,
         )
         async def list_page_assets(page_id: int) -> dict[str, object]:
-            summary = await self.database.get_page_summary(page_id)
-            figures = await self.database.get_figures_for_page(page_id)
-            tables = await self.database.get_tables_for_page(page_id)
+            summary, figures, tables = await self.database.get_page_assets(page_id)
             return {
                 "page": build_page_payload(summary),
                 "figures": [build_figure_payload(row) for row in figures],
                 "tables": [build_table_payload(row) for row in tables],
             }
 
+        if self.embedder is not None:
+            embedder = self.embedder
+
+            @self.server.tool(
+                name="semantic_search",
+                description=
+                "Find the PDF sections, page summaries, figures or tables most "
+                "similar in meaning to a query, ranked by vector distance, with "
+                "resource URIs. Optionally restricted to some PDFs or to a collection",
+                annotations=annotations,
+            )
+            async def semantic_search(
+                query: str,
+                limit: int | None = None,
+                scope: Literal["sections", "pages", "figures", "tables"] = "sections",
+                pdf_ids: list[int] | None = None,
+                collection: str | None = None,
+            ) -> dict[str, object]:
+                capped_limit = self.config.clamp_limit(limit)
+                target = _SEARCH_SCOPES[scope]
+                if target == "section":
+                    space = await self.database.get_search_space(embedder.model_name)
+                else:
+                    space = await self.database.get_embedding_space(
+                        embedder.model_name, target
+                    )
+                if space is None:
+                    raise NotFoundError(
+                        f"The database has no {target} embeddings from {embedder.model_name}"
+                    )
+                embedding = await asyncio.to_thread(embedder.embed, query)
+                if target == "section":
+                    rows = await self.database.semantic_search(
+                        space, embedding, capped_limit, pdf_ids, collection
+                    )
+                    items = [build_section_payload(row) for row in rows]
+                else:
+                    rows = await self.database.asset_search(
+                        space, embedding, capped_limit, pdf_ids, collection
+                    )
+                    items = [build_asset_hit_payload(target, row) for row in rows]
+                result: dict[str, object] = {
+                    "query": query,
+                    "scope": scope,
+                    scope: items,
+                    "limit": capped_limit,
+                }
+                if pdf_ids is not None:
+                    result["pdf_ids"] = pdf_ids
+                if collection is not None:
+                    result["collection"] = collection
+                return result
+
+        @self.server.tool(
+            name="hybrid_search",
+            description=
+            "Search page text, section titles, figure descriptions and tables "
+            "by keyword, combined with semantic similarity when available. "
+            "Returns ranked sections and pages with resource URIs. Optionally "
+            "restricted to some PDFs or to a collection",
+            annotations=annotations,
+        )
+        async def hybrid_search(
+            query: str,
+            limit: int | None = None,
+            pdf_ids: list[int] | None = None,
+            collection: str | None = None,
+        ) -> dict[str, object]:
+            capped_limit = self.config.clamp_limit(limit)
+            candidates = max(capped_limit, _HYBRID_CANDIDATES)
+
+            async def vector() -> list[dict[str, object]] | None:
+                if self.embedder is None:
+                    return None
+                space = await self.database.get_search_space(self.embedder.model_name)
+                if space is None:
+                    return None
+                embedding = await asyncio.to_thread(self.embedder.embed, query)
+                return await self.database.semantic_search(
+                    space, embedding, candidates, pdf_ids, collection
+                )
+
+            keyword_hits, vector_hits = await asyncio.gather(
+                self.database.keyword_search(query, candidates, pdf_ids, collection),
+                vector(),
+            )
+            fused = fuse_results(keyword_hits, vector_hits or [], capped_limit)
+            result: dict[str, object] = {
+                "query": query,
+                "semantic": vector_hits is not None,
+                "sections": [build_section_hit_payload(hit) for hit in fused["sections"]],
+                "pages": [build_page_hit_payload(hit) for hit in fused["pages"]],
+                "limit": capped_limit,
+            }
+            if pdf_ids is not None:
+                result["pdf_ids"] = pdf_ids
+            if collection is not None:
+                result["collection"] = collection
+            return result
+
         @self.server.tool(
             name="get_schema",
             description="Return CREATE statements for tables or views",
@@ -96,6 +235,33 @@ class ToolSuite:
             statements = await self.database.get_schema(table)
             return {"table": table, "sql": statements}
 
+        @self.server.tool(
+            name="run_sql",
+            description=
+            "Run a read-only SELECT against the database, with ? placeholders "
+            "bound to params. Queries are interrupted after a time budget, and "
+            "long results are truncated; returns the rows, the time taken and "
+            "the query plan. Use get_schema to see the tables",
+            annotations=annotations,
+        )
+        async def run_sql(
+            sql: str,
+            params: list[str | int | float | None] | None = None,
+            max_rows: int | None = None,
+        ) -> dict[str, object]:
+            row_limit = self.config.sql_max_rows
+            if max_rows is not None:
+                if max_rows <= 0:
+                    raise ValueError("max_rows must be positive")
+                row_limit = min(max_rows, row_limit)
+            return await self.database.run_sql(
+                sql,
+                params or (),
+                timeout=self.config.sql_timeout,
+                max_rows=row_limit,
+                max_bytes=self.config.sql_max_bytes,
+            )
+
         @self.server.tool(
             name="get_image",
             description="Return an image resource as inline tool output",
@@ -109,8 +275,11 @@ class ToolSuite:
             if isinstance(descriptor, TableImageResource):
                 data = await self.resources.load_table_image_blob(descriptor)
                 return self.resources.as_image(data, "image/jpeg")
+            if isinstance(descriptor, PageImageResource):
+                data = await self.resources.load_page_image(descriptor)
+                return self.resources.as_image(data, "image/png")
             raise ValueError(
-                "get_image expects a figure or table-image resource URI"
+                "get_image expects a figure, table-image or page image resource URI"
             )
 
         @self.server.tool(
@@ -125,11 +294,34 @@ class ToolSuite:
                     "get_pdf expects a pdf resource URI, optionally targeting "
                     "a single page"
                 )
-            data = await self.resources.load_pdf_blob(descriptor)
-            embed = await self.resources.make_embedded_pdf(resource, data)
-            summary = _pdf_summary_block(resource, len(data), descriptor)
+            size, embed = await self.resources.embed_pdf(descriptor, resource)
+            summary = _pdf_summary_block(resource, size, descriptor)
             return [summary, embed]
 
+        @self.server.tool(
+            name="read_resource_range",
+            description=
+            "Return part of a PDF, page, figure or table-image resource as "
+            "base64, for fetching resources too large to return whole; "
+            "repeat from next_offset until it is null",
+            annotations=annotations,
+        )
+        async def read_resource_range(
+            resource: str,
+            offset: int = 0,
+            length: int | None = None,
+        ) -> dict[str, object]:
+            descriptor = parse_resource_uri(resource)
+            blob = await self.resources.load_blob_range(descriptor, offset, length)
+            return {
+                "resource": resource,
+                "size": blob.size,
+                "offset": blob.offset,
+                "length": blob.length,
+                "next_offset": blob.next_offset,
+                "data_base64": blob.data,
+            }
+
 
 def _pdf_summary_block(
     resource: str,
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from enum import Enum
-from urllib.parse import urlparse
+from urllib.parse import parse_qs, urlparse
 
 
 class ResourceKind(str, Enum):
@@ -10,6 +10,7 @@ class ResourceKind(str, Enum):
     PDF_PAGE = "pdf_page"
     FIGURE = "figure"
     TABLE_IMAGE = "table_image"
+    PAGE_IMAGE = "page_image"
 
 
 @dataclass(slots=True)
@@ -28,7 +29,14 @@ class TableImageResource:
     table_id: int
 
 
-ResourceDescriptor = PdfResource | FigureResource | TableImageResource
+@dataclass(slots=True)
+class PageImageResource:
+    pdf_id: int
+    page_number: int
+    dpi: int | None = None
+
+
+ResourceDescriptor = PdfResource | FigureResource | TableImageResource | PageImageResource
 
 
 def parse_resource_uri(uri: str) -> ResourceDescriptor:
@@ -51,6 +59,14 @@ def parse_resource_uri(uri: str) -> ResourceDescriptor:
         if len(segments) == 3 and segments[1] == "page":
             page_number = _require_int(segments[2], "page number")
             return PdfResource(pdf_id=pdf_id, page_number=page_number)
+        if len(segments) == 4 and segments[1] == "page" and segments[3] == "image":
+            page_number = _require_int(segments[2], "page number")
+            dpi = parse_qs(parsed.query).get("dpi")
+            return PageImageResource(
+                pdf_id=pdf_id,
+                page_number=page_number,
+                dpi=_require_int(dpi[-1], "dpi") if dpi else None,
+            )
         raise ValueError("Unsupported PDF resource path")
 
     if netloc == "figure":
@@ -74,6 +90,11 @@ def build_pdf_page_uri(pdf_id: int, page_number: int) -> str:
     return f"pdf2sqlite://pdf/{pdf_id}/page/{page_number}"
 
 
+def build_page_image_uri(pdf_id: int, page_number: int, dpi: int | None = None) -> str:
+    uri = f"pdf2sqlite://pdf/{pdf_id}/page/{page_number}/image"
+    return uri if dpi is None else f"{uri}?dpi={dpi}"
+
+
 def build_figure_uri(figure_id: int) -> str:
     return f"pdf2sqlite://figure/{figure_id}"
 
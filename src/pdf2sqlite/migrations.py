@@ -0,0 +1,156 @@
+from dataclasses import dataclass
+from importlib import resources
+from sqlite3 import Connection, Cursor
+from typing import Callable
+
+from .fts import backfill_fts, ensure_fts
+from .indexes import ensure_indexes
+from .ivf import restore_posting_vectors
+from .keywords import ensure_counted_sections
+from .render import ensure_render_table
+from .stats import backfill_stats, ensure_stats_table
+from .topics import ensure_topic_terms
+from .vector_store import backfill_partitions, ensure_vector_store, table_exists
+
+create_statement = resources.read_text("pdf2sqlite.sql", "create_db.sql")
+
+# a backfill is called with a cursor, a batch size and a progress callback
+# taking (name, rows done, rows to do), and returns the number of rows it did
+Backfill = Callable[[Cursor, int, Callable[[str, int, int], None] | None], int]
+
+
+def create_tables(cursor: Cursor) -> None:
+    cursor.executescript(create_statement)
+    # the secondary indexes, next, include one on the collection column
+    ensure_collections(cursor)
+
+
+def ensure_collections(cursor: Cursor) -> None:
+    """Add the collection column to a pdfs table made before it existed"""
+    if not any(row[1] == "collection" for row in cursor.execute("PRAGMA table_info(pdfs)")):
+        cursor.execute("ALTER TABLE pdfs ADD COLUMN collection STRING")
+
+
+def superseded(cursor: Cursor) -> None:
+    """A migration undone by a later one, kept so that versions stay in order"""
+
+
+def ensure_partition_columns(cursor: Cursor) -> None:
+    """
+    Add the collection column, and its index, to a database whose base
+    tables were recorded before create_tables added the column
+    """
+    ensure_collections(cursor)
+    ensure_indexes(cursor)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    One step in the evolution of the schema. Migrations must be idempotent:
+    one interrupted before it was recorded is simply run again. Work that
+    grows with the size of the database belongs in its backfill, which must
+    commit as it goes and pick up where it left off when run again.
+    """
+    version: int
+    name: str
+    apply: Callable[[Cursor], None]
+    backfill: Backfill | None = None
+
+
+# Append new migrations at the end, with the next version number. Databases
+# created before versioning have none recorded, and every migration is run on
+# them, which is why the early ones only create what is missing.
+MIGRATIONS = (
+    Migration(1, "base tables", create_tables),
+    Migration(2, "embedding spaces", ensure_vector_store),
+    Migration(3, "full-text indexes", ensure_fts, backfill_fts),
+    Migration(4, "secondary indexes", ensure_indexes),
+    Migration(5, "page renders", ensure_render_table),
+    Migration(6, "pdf statistics", ensure_stats_table, backfill_stats),
+    # postings lost their vectors in 7, and got them back in 10
+    Migration(7, "ivf postings without vectors", superseded),
+    Migration(8, "embedding partitions", ensure_partition_columns, backfill_partitions),
+    Migration(9, "keyword corpus size", ensure_counted_sections),
+    Migration(10, "ivf postings with vectors", restore_posting_vectors),
+    Migration(11, "topic term counts", ensure_topic_terms),
+)
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def schema_version(conn: Cursor | Connection) -> int:
+    """The version of the last migration applied to a database, 0 if none"""
+    if not table_exists(conn, "schema_version"):
+        return 0
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def pending_migrations(conn: Cursor | Connection) -> list[Migration]:
+    """
+    The migrations a database still needs
+
+    Raises:
+        ValueError: if the database was migrated by a newer pdf2sqlite
+    """
+    version = schema_version(conn)
+    if version > SCHEMA_VERSION:
+        raise ValueError(
+            f"the database has schema version {version}, but this version of "
+            f"pdf2sqlite only knows up to {SCHEMA_VERSION}; please upgrade pdf2sqlite"
+        )
+    return [migration for migration in MIGRATIONS if migration.version > version]
+
+
+def migrate(
+        cursor: Cursor,
+        on_migration: Callable[[Migration], None] | None = None,
+) -> list[Migration]:
+    """
+    Bring a database's schema up to date, committing after each migration
+
+    Backfills are left to `run_backfills`, so that opening an old database
+    stays quick.
+
+    Returns:
+        The migrations that were applied
+    """
+    pending = pending_migrations(cursor)
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version(
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    for migration in pending:
+        if on_migration is not None:
+            on_migration(migration)
+        migration.apply(cursor)
+        cursor.execute(
+            "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+            [migration.version, migration.name],
+        )
+        cursor.connection.commit()
+    return pending
+
+
+def run_backfills(
+        cursor: Cursor,
+        batch_size: int = 1000,
+        on_progress: Callable[[str, int, int], None] | None = None,
+) -> int:
+    """
+    Run every migration's backfill to completion. Each one is resumable, so
+    an interrupted run loses at most a batch.
+
+    Returns:
+        The number of rows backfilled
+    """
+    return sum(
+        migration.backfill(cursor, batch_size, on_progress)
+        for migration in MIGRATIONS
+        if migration.backfill is not None
+    )
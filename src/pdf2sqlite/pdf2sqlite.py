@@ -1,27 +1,53 @@
 import os
 import io
+import sys
 import argparse
 import sqlite3
 from dataclasses import dataclass, field
 from argparse import Namespace
 from sqlite3 import Connection, Cursor
 
+import sqlite_vec
 from PIL import Image
 from pypdf import PdfReader, PdfWriter, PageObject
 import pypdf.filters
+from rich.console import Console
 from rich.live import Live
 from rich_argparse import RichHelpFormatter
 from gmft.formatters.base import FormattedTable
 
-from .validation import validate_args
+from .validation import validate_args, validate_database
 from .summarize import summarize
 from .abstract import abstract
 from .extract_sections import extract_toc_and_sections
 from .init_db import init_db
+from .migrations import (
+    SCHEMA_VERSION,
+    migrate,
+    pending_migrations,
+    run_backfills,
+    schema_version,
+)
+from .vector_store import (
+    QUANTIZATIONS,
+    adopt_legacy_embeddings,
+    has_legacy_embeddings,
+    list_spaces,
+    partition_space,
+    unpartitioned_spaces,
+    set_collection,
+    table_exists,
+)
+from .ivf import build_ivf
+from .maintenance import maintain
+from .fts import pending_backfill, backfill_fts, merge_fts, optimize_fts
+from .stats import pending_stats, refresh_pdf_stats
 from .pdf_to_table import get_rich_tables
-from .embeddings import process_pdf_for_semantic_search
+from .embeddings import process_pdf_for_semantic_search, embed_pdf_assets, cache_stats
 from .describe_figure import describe
+from .render import THUMBNAIL_DPI, has_render, render_page, store_render
 from .view import fresh_view
+from .benchmark import benchmark_main
 from .task_stack import TaskStack
 
 def nerd_icon(glyph: str) -> str:
@@ -71,14 +97,17 @@ def generate_description(reader: PdfReader, context: PdfContext) -> str:
         )
 
 
-def insert_pdf_by_name(title: str, description: str | None, cursor: Cursor) -> int:
-    cursor.execute("SELECT id FROM pdfs WHERE title = ?", [title])
-    row: tuple[int] | None = cursor.fetchone()
+def insert_pdf_by_name(title: str,
+                       description: str | None,
+                       cursor: Cursor,
+                       collection: str | None = None) -> int:
+    cursor.execute("SELECT id, collection FROM pdfs WHERE title = ?", [title])
+    row: tuple[int, str | None] | None = cursor.fetchone()
 
     if row is None:
         cursor.execute(
-            "INSERT INTO pdfs (title, description) VALUES (?,?)",
-            [title, description],
+            "INSERT INTO pdfs (title, description, collection) VALUES (?,?,?)",
+            [title, description, collection],
         )
         if cursor.lastrowid is None:
             raise Exception(
@@ -86,6 +115,8 @@ def insert_pdf_by_name(title: str, description: str | None, cursor: Cursor) -> i
                 f"'{title} in the database"
             )
         return cursor.lastrowid
+    if collection is not None and row[1] != collection:
+        set_collection(cursor, row[0], collection)
     return row[0]
 
 
@@ -231,6 +262,23 @@ def summarize_pages(page_ctx: PageContext) -> None:
             )
 
 
+def render_thumbnail(page_ctx: PageContext) -> None:
+    context = page_ctx.pdf
+    if not context.args.thumbnails:
+        return
+    if has_render(context.cursor, page_ctx.page_id, THUMBNAIL_DPI):
+        return
+    with context.tasks.step("rendering thumbnail"):
+        try:
+            png, width, height = render_page(page_ctx.page_bytes, THUMBNAIL_DPI)
+        except Exception as exc:
+            context.live.console.print(
+                f"[red]rendering p{page_ctx.page_number} failed: {exc}"
+            )
+            return
+        store_render(context.cursor, page_ctx.page_id, THUMBNAIL_DPI, png, width, height)
+
+
 def insert_tables(page_ctx: PageContext) -> None:
     context = page_ctx.pdf
     args = context.args
@@ -346,6 +394,7 @@ def process_page(page: PageObject, context: PdfContext) -> None:
         extract_figures(page_ctx)
         summarize_pages(page_ctx)
         insert_tables(page_ctx)
+        render_thumbnail(page_ctx)
 
 
 def insert_pdf(args: Namespace,
@@ -365,7 +414,7 @@ def insert_pdf(args: Namespace,
     if args.abstracter:
         context.description = generate_description(reader, context)
 
-    context.pdf_id = insert_pdf_by_name(title, context.description, cursor)
+    context.pdf_id = insert_pdf_by_name(title, context.description, cursor, args.collection)
     db.commit()
 
     toc_and_sections = extract_toc_and_sections(reader, live)
@@ -381,6 +430,7 @@ def insert_pdf(args: Namespace,
             cursor,
             context.pdf_id,
             args.embedder,
+            quantization=args.quantize,
         )
 
     db.commit()
@@ -395,24 +445,60 @@ def insert_pdf(args: Namespace,
         process_page(page, context)
         db.commit()
 
+    refresh_pdf_stats(cursor, context.pdf_id)
+    db.commit()
+
+    asset_targets = [
+        target
+        for target, enabled in (
+            ("page", args.embed_pages),
+            ("figure", args.embed_figures),
+            ("table", args.embed_tables),
+        )
+        if enabled
+    ]
+    if args.embedder and asset_targets:
+        with context.tasks.step(f"embedding {', '.join(asset_targets)}s"):
+            embed_pdf_assets(
+                cursor, context.pdf_id, asset_targets, args.embedder, args.quantize
+            )
+        db.commit()
+
+
+
+def nonnegative_int(value: str) -> int:
+    ival = int(value)
+    if ival < 0:
+        raise argparse.ArgumentTypeError(
+            "the supplied bound must be a non-negative integer, got "
+            f"'{value}'"
+        )
+    return ival
+
+
+def positive_int(value: str) -> int:
+    ival = int(value)
+    if ival <= 0:
+        raise argparse.ArgumentTypeError(
+            f"the supplied value must be a positive integer, got '{value}'"
+        )
+    return ival
 
 
 def main() -> None:
+    argv = sys.argv[1:]
+    if argv and argv[0] in COMMANDS:
+        COMMANDS[argv[0]](argv[1:])
+        return
+
     parser = argparse.ArgumentParser(
         prog="pdf2sqlite",
         description="Convert PDFs into an easy-to-query SQLite DB",
+        epilog=f"Maintenance commands: {', '.join(COMMANDS)}. "
+        "Run `pdf2sqlite COMMAND -h` for details.",
         formatter_class=RichHelpFormatter,
     )
 
-    def nonnegative_int(value: str) -> int:
-        ival = int(value)
-        if ival < 0:
-            raise argparse.ArgumentTypeError(
-                "the supplied bound must be a non-negative integer, got "
-                f"'{value}'"
-            )
-        return ival
-
     parser.add_argument("-p", "--pdfs",
                         help = "PDFs to add to DB", nargs="+", required= True)
     parser.add_argument("-d", "--database",
@@ -423,10 +509,23 @@ def main() -> None:
                         help = "An LLM to produce an abstract (litellm naming conventions)")
     parser.add_argument("-e", "--embedder",
                         help = "An embedding model to generate vector embeddings (litellm naming conventions)")
+    parser.add_argument("--embed_pages", action = "store_true",
+                        help = "Also embed page summaries (needs --embedder)")
+    parser.add_argument("--embed_figures", action = "store_true",
+                        help = "Also embed figure descriptions (needs --embedder)")
+    parser.add_argument("--embed_tables", action = "store_true",
+                        help = "Also embed table text and descriptions (needs --embedder)")
+    parser.add_argument("--quantize", choices = QUANTIZATIONS,
+                        help = "Store new embedding spaces as int8 or binary vectors, "
+                        "re-scored against full-precision copies (default none)")
+    parser.add_argument("-c", "--collection",
+                        help = "A collection to file the PDFs under, which searches can be restricted to")
     parser.add_argument("-v", "--vision_model",
                         help = "A vision model to describe images (litellm naming conventions)")
     parser.add_argument("-t", "--tables", action = "store_true",
                         help = "Use gmft to analyze tables (will also use a vision model if available)")
+    parser.add_argument("--thumbnails", action = "store_true",
+                        help = f"Pre-render a {THUMBNAIL_DPI} dpi PNG of each page for the MCP server")
     parser.add_argument("-o", "--offline", action = "store_true",
                         help = "Offline mode for gmft (blocks hugging face telemetry, solves VPN issues)")
     parser.add_argument("-l", "--lower_pixel_bound", type=nonnegative_int, default=100,
@@ -452,6 +551,8 @@ def main() -> None:
 
 def update_db(args: Namespace, live: Live) -> None:
     db = sqlite3.connect(args.database)
+    db.enable_load_extension(True)
+    sqlite_vec.load(db)
 
     # check if pdf_pages table exists
     cursor = db.execute(
@@ -463,6 +564,260 @@ def update_db(args: Namespace, live: Live) -> None:
     if len(rows) < 1:
         live.console.print(f"[blue]{"󰪩 " if os.getenv("NERD_FONT") else ""}Initializing new database")
         init_db(cursor)
+    else:
+        migrate_schema(cursor, live.console)
+
+    pending = sum(pending_backfill(cursor).values())
+    if pending:
+        live.console.print(
+            f"[yellow]Up to {pending} existing rows are not yet full-text indexed. "
+            f"Run `pdf2sqlite migrate -d {args.database}` to index them."
+        )
+    unpartitioned = len(unpartitioned_spaces(cursor))
+    if unpartitioned:
+        live.console.print(
+            f"[yellow]{unpartitioned} embedding spaces are not yet partitioned by PDF, so "
+            "their searches can't be filtered by PDF or collection. "
+            f"Run `pdf2sqlite migrate -d {args.database}` to partition them."
+        )
+    if has_legacy_embeddings(cursor):
+        live.console.print(
+            "[yellow]This database has section embeddings from before embedding models "
+            "were recorded, which searches ignore. If they came from MODEL, run "
+            f"`pdf2sqlite migrate -d {args.database} --legacy_embedder MODEL` to keep "
+            "them. Otherwise, re-embed its PDFs."
+        )
 
     for pdf in args.pdfs:
         insert_pdf(args, pdf, live, cursor, db)
+
+    if cache_stats.lookups:
+        live.console.print(f"Embedding cache: {cache_stats.describe()} this run")
+
+    merge_fts(cursor)
+    db.commit()
+
+
+def migrate_schema(cursor: Cursor, console: Console) -> None:
+    try:
+        migrate(
+            cursor,
+            lambda migration: console.print(
+                f"Upgrading database schema: {migration.version}. {migration.name}"
+            ),
+        )
+    except ValueError as exc:
+        sys.exit(f"Aborting. {exc}")
+    except sqlite3.Error as exc:
+        # migrations already applied were committed, and this one is undone
+        cursor.connection.rollback()
+        sys.exit(f"Aborting. Upgrading the database schema failed: {exc}")
+
+
+def migrate_main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="pdf2sqlite migrate",
+        description="Bring the schema of a database made by an older pdf2sqlite up to date, "
+        "and fill in the tables and indexes it gains",
+        formatter_class=RichHelpFormatter,
+    )
+    parser.add_argument("-d", "--database",
+                        help = "Database to migrate", required= True)
+    parser.add_argument("-b", "--batch_size", type=positive_int, default=1000,
+                        help = "Number of rows to backfill per transaction")
+    parser.add_argument("--status", action = "store_true",
+                        help = "Only report the schema version and pending migrations")
+    parser.add_argument("--legacy_embedder",
+                        help = "Embedding model that made the section embeddings of a database "
+                        "from before embedding models were recorded, to search them with")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.database):
+        sys.exit(f"Aborting. The database {args.database} doesn't exist!")
+    validate_database(args.database)
+
+    console = Console()
+    db = sqlite3.connect(args.database)
+    db.enable_load_extension(True)
+    sqlite_vec.load(db)
+    cursor = db.cursor()
+
+    try:
+        if args.status:
+            try:
+                pending = pending_migrations(cursor)
+            except ValueError as exc:
+                sys.exit(f"Aborting. {exc}")
+            console.print(f"Schema version {schema_version(cursor)} of {SCHEMA_VERSION}")
+            for migration in pending:
+                console.print(f"Pending: {migration.version}. {migration.name}")
+            if table_exists(cursor, "fts_backfill"):
+                backfills = sum(pending_backfill(cursor).values())
+            else:
+                backfills = 0
+            if backfills:
+                console.print(f"Up to {backfills} rows still to be full-text indexed")
+            if table_exists(cursor, "pdf_stats") and (uncounted := pending_stats(cursor)):
+                console.print(f"{uncounted} PDFs still to have their statistics counted")
+            if unpartitioned := len(unpartitioned_spaces(cursor)):
+                console.print(f"{unpartitioned} embedding spaces still to be partitioned by PDF")
+            if has_legacy_embeddings(cursor):
+                console.print("Section embeddings from an unrecorded model, see --legacy_embedder")
+            return
+
+        migrate_schema(cursor, console)
+        if args.legacy_embedder:
+            try:
+                space = adopt_legacy_embeddings(cursor, args.legacy_embedder)
+            except ValueError as exc:
+                sys.exit(f"Aborting. {exc}")
+            cursor.connection.commit()
+            console.print(f"Recorded the legacy section embeddings as {space.model}'s")
+
+        def report(name: str, last_rowid: int, target_rowid: int) -> None:
+            console.print(f"{name}: backfilled through row {last_rowid}/{target_rowid}")
+
+        backfilled = run_backfills(cursor, args.batch_size, report)
+        console.print(f"[green]Schema version {SCHEMA_VERSION}, backfilled {backfilled} rows")
+    except KeyboardInterrupt:
+        console.print("Cancelled, progress has been saved")
+    finally:
+        db.close()
+
+
+def index_main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="pdf2sqlite index",
+        description="Build or finish the full-text indexes of an existing database, "
+        "partition its embeddings by PDF, and optionally build approximate vector indexes",
+        formatter_class=RichHelpFormatter,
+    )
+    parser.add_argument("-d", "--database",
+                        help = "Database to index", required= True)
+    parser.add_argument("-b", "--batch_size", type=positive_int, default=1000,
+                        help = "Number of rows to index per transaction")
+    parser.add_argument("--optimize", action = "store_true",
+                        help = "Merge each index into a single b-tree once indexing is done")
+    parser.add_argument("--ivf", action = "store_true",
+                        help = "(Re)build the IVF index of every embedding space, for approximate vector search")
+    parser.add_argument("--lists", type=positive_int,
+                        help = "IVF posting lists per space (default about the square root of its vectors)")
+    parser.add_argument("--probes", type=positive_int,
+                        help = "IVF lists searched per query (default about the square root of the lists)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.database):
+        sys.exit(f"Aborting. The database {args.database} doesn't exist!")
+    validate_database(args.database)
+
+    console = Console()
+    db = sqlite3.connect(args.database)
+    db.enable_load_extension(True)
+    sqlite_vec.load(db)
+    cursor = db.cursor()
+
+    migrate_schema(cursor, console)
+
+    def report(name: str, last_rowid: int, target_rowid: int) -> None:
+        console.print(f"{name}: indexed through row {last_rowid}/{target_rowid}")
+
+    try:
+        indexed = backfill_fts(cursor, args.batch_size, report)
+        console.print(f"[green]Indexed {indexed} rows")
+        if args.optimize:
+            console.print("Optimizing full-text indexes")
+            optimize_fts(cursor)
+        else:
+            merge_fts(cursor)
+        db.commit()
+        partition_spaces(cursor, console)
+        if args.ivf:
+            build_ivf_indexes(cursor, args, console)
+    except KeyboardInterrupt:
+        console.print("Cancelled, progress has been saved")
+    finally:
+        db.close()
+
+
+def partition_spaces(cursor: Cursor, console: Console) -> None:
+    for space in list_spaces(cursor):
+        if space.partitioned:
+            continue
+        console.print(f"Partitioning {space.model} {space.target} embeddings by PDF")
+        partition_space(cursor, space)
+        cursor.connection.commit()
+
+
+def build_ivf_indexes(cursor: Cursor, args: Namespace, console: Console) -> None:
+    for space in list_spaces(cursor):
+        label = f"{space.model} {space.target} embeddings"
+        try:
+            space = build_ivf(
+                cursor,
+                space,
+                args.lists,
+                args.probes,
+                on_progress=lambda done, total: console.print(
+                    f"{label}: assigned {done}/{total} vectors"
+                ),
+            )
+        except ValueError as exc:
+            console.print(f"[yellow]Skipping {label}: {exc}")
+            cursor.connection.rollback()
+            continue
+        cursor.connection.commit()
+        console.print(
+            f"[green]Indexed {label} in {space.ivf_lists} lists, "
+            f"searching {space.ivf_probes} per query"
+        )
+
+
+def maintain_main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="pdf2sqlite maintain",
+        description="Remove rows and embeddings left behind by deleted or re-ingested PDFs, "
+        "rebuild the vector tables and compact the database",
+        formatter_class=RichHelpFormatter,
+    )
+    parser.add_argument("-d", "--database",
+                        help = "Database to maintain", required= True)
+    parser.add_argument("--no_rebuild", action = "store_true",
+                        help = "Skip rebuilding the vector tables, which is slow on large databases")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.database):
+        sys.exit(f"Aborting. The database {args.database} doesn't exist!")
+    validate_database(args.database)
+
+    console = Console()
+    db = sqlite3.connect(args.database)
+    db.enable_load_extension(True)
+    sqlite_vec.load(db)
+    cursor = db.cursor()
+
+    migrate_schema(cursor, console)
+
+    try:
+        report = maintain(db, rebuild=not args.no_rebuild, on_step=console.print)
+    except KeyboardInterrupt:
+        console.print("Cancelled, progress has been saved")
+        return
+    finally:
+        db.close()
+
+    for table, count in {**report.rows, **report.vectors}.items():
+        console.print(f"{table}: removed {count} orphaned rows")
+    if not report.rows and not report.vectors:
+        console.print("No orphaned rows found")
+    console.print(
+        f"[green]Reclaimed {report.bytes_reclaimed:,} bytes "
+        f"({report.bytes_before:,} -> {report.bytes_after:,})"
+    )
+
+
+COMMANDS = {
+    "migrate": migrate_main,
+    "index": index_main,
+    "maintain": maintain_main,
+    "benchmark": benchmark_main,
+}
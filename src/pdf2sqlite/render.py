@@ -0,0 +1,91 @@
+import io
+import threading
+from sqlite3 import Connection, Cursor
+
+# PDF user space has 72 points to the inch, so a page rendered at 72 dpi has
+# one pixel per point
+POINTS_PER_INCH = 72
+
+# the resolution of page images unless one is asked for, and of the
+# thumbnails pre-rendered by `pdf2sqlite --thumbnails`; at 36 dpi a letter
+# page is 306 by 396 pixels
+DEFAULT_DPI = 96
+THUMBNAIL_DPI = 36
+MAX_DPI = 300
+
+# pdfium isn't thread-safe, so renders are serialized
+_pdfium_lock = threading.Lock()
+
+
+def check_dpi(dpi: int) -> int:
+    if not 1 <= dpi <= MAX_DPI:
+        raise ValueError(f"dpi must be between 1 and {MAX_DPI}, got {dpi}")
+    return dpi
+
+
+def render_page(pdf_bytes: bytes, dpi: int = DEFAULT_DPI) -> tuple[bytes, int, int]:
+    """
+    Render the first page of a PDF as a PNG
+
+    Returns:
+        The PNG, and its width and height in pixels
+    """
+    # imported here so that migrations and the MCP server's reads don't need
+    # pdfium
+    import pypdfium2 as pdfium
+
+    check_dpi(dpi)
+    with _pdfium_lock:
+        document = pdfium.PdfDocument(pdf_bytes)
+        try:
+            page = document[0]
+            try:
+                image = page.render(scale=dpi / POINTS_PER_INCH).to_pil()
+            finally:
+                page.close()
+        finally:
+            document.close()
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue(), image.width, image.height
+
+
+def ensure_render_table(cursor: Cursor) -> None:
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS page_renders(
+            page_id INTEGER NOT NULL,
+            dpi INTEGER NOT NULL,
+            width INTEGER NOT NULL,
+            height INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (page_id, dpi),
+            FOREIGN KEY(page_id) REFERENCES pdf_pages(id)
+        )
+        """
+    )
+
+
+def store_render(
+        conn: Cursor | Connection,
+        page_id: int,
+        dpi: int,
+        png: bytes,
+        width: int,
+        height: int,
+) -> None:
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO page_renders (page_id, dpi, width, height, data)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        [page_id, dpi, width, height, png],
+    )
+
+
+def has_render(conn: Cursor | Connection, page_id: int, dpi: int) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM page_renders WHERE page_id = ? AND dpi = ?",
+        [page_id, dpi],
+    ).fetchone()
+    return row is not None
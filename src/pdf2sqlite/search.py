@@ -0,0 +1,717 @@
+from __future__ import annotations
+
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from sqlite3 import Connection
+from typing import Any, Hashable, Iterable
+
+import litellm
+import numpy as np
+import sqlite_vec
+
+from .vector_store import EmbeddingSpace, get_space
+
+# the constant from Cormack et al., which damps the influence of the very top
+# ranks so that agreement between rankings matters more than any single list
+RRF_K = 60
+
+# chunks drawn per requested section in a chunk space, and sqlite-vec's limit
+# on k
+CHUNK_FANOUT = 4
+MAX_KNN = 4096
+
+# first-pass candidates drawn from a quantized space for each result, before
+# re-scoring against the full-precision vectors
+RESCORE_FACTOR = 8
+
+
+class QueryEmbedder:
+    """
+    Embeds search queries with LiteLLM, caching the vector for each query
+    string so that repeated searches don't pay for another API call.
+    """
+
+    def __init__(self, model_name: str, max_entries: int = 256):
+        if max_entries <= 0:
+            raise ValueError("the query embedding cache must hold at least one entry")
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed(self, query: str) -> np.ndarray:
+        key = query.strip()
+        if not key:
+            raise ValueError("query must not be empty")
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        response = litellm.embedding(model=self.model_name, input=[key])
+        embedding = np.array(response.data[0].embedding, dtype=np.float32)
+
+        with self._lock:
+            self._cache[key] = embedding
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return embedding
+
+    def cache_size(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+
+def knn_cte(
+        space: EmbeddingSpace,
+        embedding: np.ndarray,
+        k: int,
+        probes: int | None = None,
+        pdf_ids: list[int] | None = None,
+        collection: str | None = None,
+) -> tuple[str, list[Any]]:
+    """
+    A "knn" common table expression of the k nearest (rowid, distance) pairs
+    in a space, and its parameters
+
+    Candidates come from an exhaustive vec0 KNN query or, when the space has
+    an IVF index, from the posting lists of the `probes` centroids nearest the
+    query (the space's default number if not given). Quantized spaces draw
+    RESCORE_FACTOR times as many candidates, which are re-ranked by their
+    exact distance from the full-precision vectors.
+
+    Searches restricted to some PDFs or to a collection scan only those
+    partitions of the vec0 table, exhaustively, and bypass any IVF index.
+
+    Raises:
+        ValueError: if the search is filtered but the space isn't partitioned
+    """
+    vector = np.asarray(embedding, dtype=np.float32)
+    first_pass = min(k * RESCORE_FACTOR, MAX_KNN) if space.quantized else k
+    filtered = pdf_ids is not None or collection is not None
+    if filtered and not space.partitioned:
+        raise ValueError(
+            f"the {space.target} embeddings for {space.model} can't be filtered "
+            "by PDF or collection until `pdf2sqlite migrate` has partitioned them"
+        )
+
+    if filtered:
+        conditions = []
+        parameters: list[Any] = [vector, first_pass]
+        if pdf_ids is not None:
+            conditions.append(f"AND pdf_id IN ({', '.join('?' * len(pdf_ids))})")
+            parameters.extend(pdf_ids)
+        if collection is not None:
+            conditions.append("AND collection = ?")
+            parameters.append(collection)
+        # vec0 returns k rows from each partition matched by IN, and
+        # materializing them stops SQLite from pushing the LIMIT below into
+        # vec0, which rejects it alongside k
+        cte = f"""partitions AS MATERIALIZED (
+            SELECT rowid, distance
+            FROM {space.vec_table}
+            WHERE embedding MATCH {space.vector_sql()} AND k = ?
+            {" ".join(conditions)}
+        ),
+        candidates AS (
+            SELECT rowid, distance
+            FROM partitions
+            ORDER BY distance
+            LIMIT ?
+        )"""
+        parameters.append(first_pass)
+    elif space.ivf_lists:
+        probes = max(1, min(probes or space.ivf_probes, space.ivf_lists))
+        postings = space.postings_table
+        cte = f"""probe AS (
+            SELECT rowid AS centroid_id
+            FROM {space.centroid_table}
+            WHERE embedding MATCH ? AND k = ?
+        ),
+        candidates AS (
+            SELECT {postings}.vec_rowid AS rowid,
+                   {space.stored_distance_sql(f"{postings}.embedding")} AS distance
+            FROM probe
+            JOIN {postings} ON {postings}.centroid_id = probe.centroid_id
+            ORDER BY distance
+            LIMIT ?
+        )"""
+        parameters = [vector, probes, vector, first_pass]
+    else:
+        cte = f"""candidates AS (
+            SELECT rowid, distance
+            FROM {space.vec_table}
+            WHERE embedding MATCH {space.vector_sql()} AND k = ?
+        )"""
+        parameters = [vector, first_pass]
+
+    if not space.quantized:
+        return cte + ",\n        knn AS (SELECT rowid, distance FROM candidates)", parameters
+
+    cte += f""",
+        knn AS (
+            SELECT candidates.rowid, {space.distance_sql(f"{space.full_table}.embedding")} AS distance
+            FROM candidates
+            JOIN {space.full_table} ON {space.full_table}.vec_rowid = candidates.rowid
+            ORDER BY distance
+            LIMIT ?
+        )"""
+    return cte, [*parameters, vector, k]
+
+
+def search_space(conn: Connection, model: str) -> EmbeddingSpace | None:
+    """
+    The space to search for a model's sections: its chunk embeddings if the
+    database has them, otherwise its whole-section embeddings
+    """
+    return get_space(conn, model, "chunk") or get_space(conn, model, "section")
+
+
+def semantic_search(
+        conn: Connection,
+        space: EmbeddingSpace,
+        embedding: np.ndarray,
+        limit: int,
+        probes: int | None = None,
+        pdf_ids: list[int] | None = None,
+        collection: str | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Find the sections nearest to an embedding with a sqlite-vec KNN query
+
+    In a chunk space, each section is ranked by its nearest chunk, and
+    "match_page" is the page where that chunk starts. Otherwise it is the
+    section's start page.
+
+    Args:
+        conn: SQLite connection with the sqlite-vec extension loaded
+        space: The section or chunk embedding space to search
+        embedding: Query embedding, from the space's model
+        limit: Number of sections to return
+        probes: IVF lists to search, if the space has an IVF index
+        pdf_ids: Only search sections of these PDFs
+        collection: Only search sections of PDFs in this collection
+
+    Returns:
+        Sections ordered by increasing distance
+    """
+    if space.target == "chunk":
+        knn, knn_parameters = knn_cte(
+            space,
+            embedding,
+            min(limit * CHUNK_FANOUT, MAX_KNN),
+            probes,
+            pdf_ids,
+            collection,
+        )
+        rows = conn.execute(
+            f"""
+            WITH {knn},
+            matches AS (
+                SELECT
+                    section_chunks.section_id,
+                    section_chunks.start_page,
+                    knn.distance,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY section_chunks.section_id ORDER BY knn.distance
+                    ) AS position
+                FROM knn
+                JOIN {space.mapping_table} ON {space.mapping_table}.vec_rowid = knn.rowid
+                JOIN section_chunks ON section_chunks.id = {space.mapping_table}.{space.mapping_key}
+            )
+            SELECT
+                pdf_sections.id,
+                pdf_sections.pdf_id,
+                pdf_sections.title,
+                pdf_sections.gist,
+                pdf_sections.start_page,
+                pdfs.title,
+                matches.distance,
+                matches.start_page
+            FROM matches
+            JOIN pdf_sections ON pdf_sections.id = matches.section_id
+            JOIN pdfs ON pdfs.id = pdf_sections.pdf_id
+            WHERE matches.position = 1
+            ORDER BY matches.distance
+            LIMIT ?
+            """,
+            # several chunks of a section may be among the nearest
+            [*knn_parameters, limit],
+        ).fetchall()
+    else:
+        knn, knn_parameters = knn_cte(space, embedding, limit, probes, pdf_ids, collection)
+        rows = conn.execute(
+            f"""
+            WITH {knn}
+            SELECT
+                pdf_sections.id,
+                pdf_sections.pdf_id,
+                pdf_sections.title,
+                pdf_sections.gist,
+                pdf_sections.start_page,
+                pdfs.title,
+                knn.distance,
+                pdf_sections.start_page
+            FROM knn
+            JOIN {space.mapping_table} ON {space.mapping_table}.vec_rowid = knn.rowid
+            JOIN pdf_sections ON pdf_sections.id = {space.mapping_table}.{space.mapping_key}
+            JOIN pdfs ON pdfs.id = pdf_sections.pdf_id
+            ORDER BY knn.distance
+            """,
+            knn_parameters,
+        ).fetchall()
+    return [
+        {
+            "id": row[0],
+            "pdf_id": row[1],
+            "title": row[2],
+            "gist": row[3],
+            "start_page": row[4],
+            "pdf_title": row[5],
+            "distance": row[6],
+            "match_page": row[7],
+        }
+        for row in rows
+    ]
+
+
+# how each kind of asset embedding resolves to its page and text, as a join
+# on the "hits" CTE and the columns pdf_id, page_number and text
+ASSET_JOINS = {
+    "page": (
+        "JOIN pdf_pages ON pdf_pages.id = hits.item_id",
+        "pdf_pages.pdf_id, pdf_pages.page_number, pdf_pages.gist",
+    ),
+    "figure": (
+        "JOIN pdf_figures ON pdf_figures.id = hits.item_id "
+        "LEFT JOIN pdf_pages ON pdf_pages.id = ("
+        "SELECT MIN(page_id) FROM page_to_figure WHERE figure_id = hits.item_id)",
+        "pdf_pages.pdf_id, pdf_pages.page_number, pdf_figures.description",
+    ),
+    "table": (
+        "JOIN pdf_tables ON pdf_tables.id = hits.item_id",
+        "pdf_tables.pdf_id, pdf_tables.page_number, "
+        "COALESCE(pdf_tables.description, pdf_tables.text)",
+    ),
+}
+
+
+def asset_search(
+        conn: Connection,
+        space: EmbeddingSpace,
+        embedding: np.ndarray,
+        limit: int,
+        pdf_ids: list[int] | None = None,
+        collection: str | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Find the pages, figures or tables nearest to an embedding
+
+    Args:
+        conn: SQLite connection with the sqlite-vec extension loaded
+        space: A page, figure or table embedding space
+        embedding: Query embedding, from the space's model
+        limit: Number of items to return
+        pdf_ids: Only search items of these PDFs
+        collection: Only search items of PDFs in this collection
+
+    Returns:
+        Items ordered by increasing distance, with the page they're on
+    """
+    if space.target not in ASSET_JOINS:
+        raise ValueError(f"can't search {space.target} embeddings as assets")
+    join, columns = ASSET_JOINS[space.target]
+    knn, knn_parameters = knn_cte(
+        space, embedding, limit, pdf_ids=pdf_ids, collection=collection
+    )
+    rows = conn.execute(
+        f"""
+        WITH {knn},
+        hits AS (
+            SELECT {space.mapping_table}.{space.mapping_key} AS item_id, knn.distance
+            FROM knn
+            JOIN {space.mapping_table} ON {space.mapping_table}.vec_rowid = knn.rowid
+        )
+        SELECT hits.item_id, {columns}, hits.distance
+        FROM hits
+        {join}
+        ORDER BY hits.distance
+        """,
+        knn_parameters,
+    ).fetchall()
+    return [
+        {
+            "id": row[0],
+            "pdf_id": row[1],
+            "page_number": row[2],
+            "text": row[3],
+            "distance": row[4],
+        }
+        for row in rows
+    ]
+
+
+def connect(database: str | Path) -> Connection:
+    """Open a read-only connection with sqlite-vec loaded"""
+    conn = sqlite3.connect(f"file:{Path(database)}?mode=ro", uri=True)
+    conn.enable_load_extension(True)
+    sqlite_vec.load(conn)
+    conn.enable_load_extension(False)
+    return conn
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn free text into an FTS5 query that matches any of its terms
+
+    Each whitespace-separated term becomes a quoted phrase, so that FTS5
+    operators and punctuation in the query can't cause syntax errors, and so
+    that part numbers like "P/N-4471" still match as a sequence of tokens.
+    """
+    terms = [term for term in text.split() if re.search(r"\w", term)]
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def has_fts(conn: Connection) -> bool:
+    row = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE name IN "
+        "('pdf_pages_fts', 'pdf_sections_fts', 'pdf_figures_fts', 'pdf_tables_fts')"
+    ).fetchone()
+    return row[0] == 4
+
+
+def pdf_condition(
+        column: str,
+        pdf_ids: list[int] | None,
+        collection: str | None,
+) -> tuple[str, list[Any]]:
+    """An SQL condition that a PDF id column is among some PDFs or in a collection"""
+    conditions = []
+    parameters: list[Any] = []
+    if pdf_ids is not None:
+        conditions.append(f"{column} IN ({', '.join('?' * len(pdf_ids))})")
+        parameters.extend(pdf_ids)
+    if collection is not None:
+        conditions.append(f"{column} IN (SELECT id FROM pdfs WHERE collection = ?)")
+        parameters.append(collection)
+    return " AND ".join(conditions), parameters
+
+
+def keyword_search(
+        conn: Connection,
+        query: str,
+        limit: int,
+        pdf_ids: list[int] | None = None,
+        collection: str | None = None,
+) -> dict[str, list[dict[str, Any]]]:
+    """
+    BM25-ranked full-text candidates for a query
+
+    Searches restricted to some PDFs or to a collection only rank the rows
+    that belong to them, before the limit is applied.
+
+    Returns:
+        Dictionary with "sections", "pages", "tables" and "figures" candidate
+        lists, each in rank order. Empty if the database has no FTS indexes.
+    """
+    empty: dict[str, list[dict[str, Any]]] = {
+        "sections": [], "pages": [], "tables": [], "figures": [],
+    }
+    match = fts_query(query)
+    if not match or not has_fts(conn):
+        return empty
+    filtered = pdf_ids is not None or collection is not None
+
+    def restrict(rows: str, column: str) -> tuple[str, list[Any]]:
+        """A condition that a hit's rowid is among ``rows`` of the PDFs searched"""
+        if not filtered:
+            return "", []
+        condition, parameters = pdf_condition(column, pdf_ids, collection)
+        return f"AND rowid IN ({rows} WHERE {condition})", parameters
+
+    page_filter, page_parameters = restrict("SELECT id FROM pdf_pages", "pdf_id")
+    section_filter, section_parameters = restrict("SELECT id FROM pdf_sections", "pdf_id")
+    table_filter, table_parameters = restrict("SELECT id FROM pdf_tables", "pdf_id")
+    figure_filter, figure_parameters = restrict(
+        "SELECT page_to_figure.figure_id FROM page_to_figure "
+        "JOIN pdf_pages ON pdf_pages.id = page_to_figure.page_id",
+        "pdf_pages.pdf_id",
+    )
+    # a figure on pages of several PDFs is only placed on those searched
+    figure_pages, figure_page_parameters = (
+        pdf_condition("pdf_pages.pdf_id", pdf_ids, collection) if filtered else ("1", [])
+    )
+
+    pages = conn.execute(
+        f"""
+        WITH hits AS (
+            SELECT rowid, rank, snippet(pdf_pages_fts, 0, '[', ']', '…', 12) AS snippet
+            FROM pdf_pages_fts
+            WHERE pdf_pages_fts MATCH ?
+            {page_filter}
+            ORDER BY rank
+            LIMIT ?
+        )
+        SELECT pdf_pages.id, pdf_pages.pdf_id, pdf_pages.page_number,
+               pdf_pages.gist, hits.snippet, hits.rank
+        FROM hits
+        JOIN pdf_pages ON pdf_pages.id = hits.rowid
+        ORDER BY hits.rank
+        """,
+        [match, *page_parameters, limit],
+    ).fetchall()
+
+    sections = conn.execute(
+        f"""
+        WITH hits AS (
+            SELECT rowid, rank
+            FROM pdf_sections_fts
+            WHERE pdf_sections_fts MATCH ?
+            {section_filter}
+            ORDER BY rank
+            LIMIT ?
+        )
+        SELECT pdf_sections.id, pdf_sections.pdf_id, pdf_sections.title,
+               pdf_sections.gist, pdf_sections.start_page, pdfs.title, hits.rank
+        FROM hits
+        JOIN pdf_sections ON pdf_sections.id = hits.rowid
+        JOIN pdfs ON pdfs.id = pdf_sections.pdf_id
+        ORDER BY hits.rank
+        """,
+        [match, *section_parameters, limit],
+    ).fetchall()
+
+    tables = conn.execute(
+        f"""
+        WITH hits AS (
+            SELECT rowid, rank
+            FROM pdf_tables_fts
+            WHERE pdf_tables_fts MATCH ?
+            {table_filter}
+            ORDER BY rank
+            LIMIT ?
+        )
+        SELECT pdf_tables.id, pdf_tables.pdf_id, pdf_tables.page_number, hits.rank
+        FROM hits
+        JOIN pdf_tables ON pdf_tables.id = hits.rowid
+        ORDER BY hits.rank
+        """,
+        [match, *table_parameters, limit],
+    ).fetchall()
+
+    figures = conn.execute(
+        f"""
+        WITH hits AS (
+            SELECT rowid, rank
+            FROM pdf_figures_fts
+            WHERE pdf_figures_fts MATCH ?
+            {figure_filter}
+            ORDER BY rank
+            LIMIT ?
+        )
+        SELECT hits.rowid, pdf_pages.pdf_id, pdf_pages.page_number, hits.rank
+        FROM hits
+        JOIN page_to_figure ON page_to_figure.figure_id = hits.rowid
+        JOIN pdf_pages ON pdf_pages.id = page_to_figure.page_id
+        WHERE {figure_pages}
+        ORDER BY hits.rank
+        """,
+        [match, *figure_parameters, limit, *figure_page_parameters],
+    ).fetchall()
+
+    return {
+        "pages": [
+            {
+                "id": row[0],
+                "pdf_id": row[1],
+                "page_number": row[2],
+                "gist": row[3],
+                "snippet": row[4],
+                "bm25": row[5],
+            }
+            for row in pages
+        ],
+        "sections": [
+            {
+                "id": row[0],
+                "pdf_id": row[1],
+                "title": row[2],
+                "gist": row[3],
+                "start_page": row[4],
+                "pdf_title": row[5],
+                "bm25": row[6],
+            }
+            for row in sections
+        ],
+        "tables": [
+            {"id": row[0], "pdf_id": row[1], "page_number": row[2], "bm25": row[3]}
+            for row in tables
+        ],
+        "figures": [
+            {"id": row[0], "pdf_id": row[1], "page_number": row[2], "bm25": row[3]}
+            for row in figures
+        ],
+    }
+
+
+def reciprocal_rank_fusion(
+        rankings: Iterable[Iterable[Hashable]],
+        k: int = RRF_K,
+) -> list[tuple[Hashable, float]]:
+    """
+    Fuse several rankings by summing 1 / (k + rank) for every item
+
+    Items repeated within a ranking only count at their best rank.
+
+    Returns:
+        (item, score) pairs, best first
+    """
+    scores: dict[Hashable, float] = {}
+    for ranking in rankings:
+        seen: set[Hashable] = set()
+        rank = 0
+        for item in ranking:
+            if item in seen:
+                continue
+            seen.add(item)
+            rank += 1
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
+
+
+def fuse_results(
+        keyword: dict[str, list[dict[str, Any]]],
+        vector: list[dict[str, Any]],
+        limit: int,
+        k: int = RRF_K,
+) -> dict[str, list[dict[str, Any]]]:
+    """
+    Combine keyword and vector candidates into section- and page-level hits
+
+    Sections are ranked by fusing the section-title matches with the vector
+    matches. Pages are ranked by fusing page text, table and figure matches
+    with the pages where the vector-matched sections start.
+    """
+    section_info: dict[int, dict[str, Any]] = {}
+    keyword_ranks: dict[int, int] = {}
+    vector_ranks: dict[int, int] = {}
+    for rank, row in enumerate(keyword["sections"], start=1):
+        section_info.setdefault(row["id"], dict(row))
+        keyword_ranks.setdefault(row["id"], rank)
+    for rank, row in enumerate(vector, start=1):
+        section_info.setdefault(row["id"], {}).update(row)
+        vector_ranks.setdefault(row["id"], rank)
+
+    sections = []
+    fused = reciprocal_rank_fusion(
+        [[row["id"] for row in keyword["sections"]], [row["id"] for row in vector]],
+        k,
+    )
+    for section_id, score in fused[:limit]:
+        hit = dict(section_info[section_id])
+        hit.pop("bm25", None)
+        hit["score"] = score
+        hit["keyword_rank"] = keyword_ranks.get(section_id)
+        hit["vector_rank"] = vector_ranks.get(section_id)
+        sections.append(hit)
+
+    page_info: dict[tuple[int, int], dict[str, Any]] = {}
+    for row in keyword["pages"]:
+        page_info.setdefault((row["pdf_id"], row["page_number"]), {
+            "id": row["id"],
+            "pdf_id": row["pdf_id"],
+            "page_number": row["page_number"],
+            "gist": row["gist"],
+            "snippet": row["snippet"],
+        })
+
+    def page_key(row: dict[str, Any]) -> tuple[int, int]:
+        key = (row["pdf_id"], row["page_number"])
+        page_info.setdefault(key, {"pdf_id": key[0], "page_number": key[1]})
+        return key
+
+    def section_page_key(row: dict[str, Any]) -> tuple[int, int]:
+        # sections record zero-based pages, pages are numbered from one
+        return page_key({"pdf_id": row["pdf_id"], "page_number": row["match_page"] + 1})
+
+    page_rankings = [
+        [page_key(row) for row in keyword["pages"]],
+        [page_key(row) for row in keyword["tables"]],
+        [page_key(row) for row in keyword["figures"]],
+        [section_page_key(row) for row in vector if row["match_page"] is not None],
+    ]
+    pages = []
+    for key, score in reciprocal_rank_fusion(page_rankings, k)[:limit]:
+        hit = dict(page_info[key])
+        hit["score"] = score
+        pages.append(hit)
+
+    return {"sections": sections, "pages": pages}
+
+
+def hybrid_search(
+        database: str | Path,
+        query: str,
+        embedder: QueryEmbedder | None = None,
+        limit: int = 10,
+        candidates: int = 50,
+        pdf_ids: list[int] | None = None,
+        collection: str | None = None,
+) -> dict[str, list[dict[str, Any]]]:
+    """
+    Search a pdf2sqlite database with BM25 and vector similarity together
+
+    The full-text query runs while the query is being embedded and matched
+    against the embedder's chunk or section embeddings, each on its own
+    connection, and the two candidate lists are fused with reciprocal-rank
+    fusion.
+
+    Args:
+        database: Path to the database
+        query: Free-text query
+        embedder: Embeds the query; without it, or if the database has no
+            embeddings from its model, only keyword search is used
+        limit: Number of sections and of pages to return
+        candidates: Number of candidates to draw from each ranking
+        pdf_ids: Only search these PDFs
+        collection: Only search PDFs in this collection
+
+    Returns:
+        Dictionary with ranked "sections" and "pages" hits
+    """
+    if limit <= 0 or candidates <= 0:
+        raise ValueError("limit and candidates must be positive")
+
+    def run_keyword() -> dict[str, list[dict[str, Any]]]:
+        conn = connect(database)
+        try:
+            return keyword_search(conn, query, candidates, pdf_ids, collection)
+        finally:
+            conn.close()
+
+    def run_vector() -> list[dict[str, Any]]:
+        if embedder is None:
+            return []
+        conn = connect(database)
+        try:
+            space = search_space(conn, embedder.model_name)
+            if space is None:
+                return []
+            embedding = embedder.embed(query)
+            return semantic_search(
+                conn, space, embedding, candidates, pdf_ids=pdf_ids, collection=collection
+            )
+        finally:
+            conn.close()
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        keyword = pool.submit(run_keyword)
+        vector = pool.submit(run_vector)
+        return fuse_results(keyword.result(), vector.result(), limit)
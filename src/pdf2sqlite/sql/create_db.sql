@@ -1,10 +1,11 @@
-CREATE TABLE pdfs(
+CREATE TABLE IF NOT EXISTS pdfs(
     id INTEGER PRIMARY KEY,
     description STRING,
-    title STRING NOT NULL UNIQUE
+    title STRING NOT NULL UNIQUE,
+    collection STRING --optional grouping that searches can be filtered by
 );
 
-CREATE TABLE pdf_to_page(
+CREATE TABLE IF NOT EXISTS pdf_to_page(
     pdf_id INTEGER NOT NULL,
     page_id INTEGER NOT NULL,
     FOREIGN KEY (pdf_id) REFERENCES pdfs(id) ON DELETE CASCADE,
@@ -12,7 +13,7 @@ CREATE TABLE pdf_to_page(
     PRIMARY KEY (pdf_id, page_id)
 );
 
-CREATE TABLE pdf_pages(
+CREATE TABLE IF NOT EXISTS pdf_pages(
     id INTEGER PRIMARY KEY,
     page_number INT,
     gist STRING,
@@ -23,7 +24,7 @@ CREATE TABLE pdf_pages(
     UNIQUE (pdf_id, page_number)
 );
 
-CREATE TABLE pdf_to_section(
+CREATE TABLE IF NOT EXISTS pdf_to_section(
     pdf_id INTEGER NOT NULL,
     section_id INTEGER NOT NULL,
     FOREIGN KEY (pdf_id) REFERENCES pdfs(id) ON DELETE CASCADE,
@@ -31,7 +32,7 @@ CREATE TABLE pdf_to_section(
     PRIMARY KEY (pdf_id, section_id)
 );
 
-CREATE TABLE pdf_sections(
+CREATE TABLE IF NOT EXISTS pdf_sections(
     id INTEGER PRIMARY KEY,
     start_page INT,
     title STRING,
@@ -41,7 +42,7 @@ CREATE TABLE pdf_sections(
     UNIQUE (title, pdf_id)
 );
 
-CREATE TABLE pdf_tables(
+CREATE TABLE IF NOT EXISTS pdf_tables(
     id INTEGER PRIMARY KEY,
     text STRING, --extracted markdown text
     image BLOB, --This is binary data for an image of the table
@@ -55,14 +56,14 @@ CREATE TABLE pdf_tables(
     UNIQUE (pdf_id, page_number, ymin, xmin)
 );
 
-CREATE TABLE pdf_figures(
+CREATE TABLE IF NOT EXISTS pdf_figures(
     id INTEGER PRIMARY KEY,
     mime_type STRING NOT NULL, --the mime type of the image
     description STRING, --a description of the image contents
     data BLOB --this is binary data for an image of the figure
 );
 
-CREATE TABLE page_to_table(
+CREATE TABLE IF NOT EXISTS page_to_table(
     -- This table holds the relation between pages and tables, and can be used to look up the tables on a given page using a JOIN
     page_id INTEGER NOT NULL,
     table_id INTEGER NOT NULL,
@@ -71,7 +72,7 @@ CREATE TABLE page_to_table(
     PRIMARY KEY (page_id, table_id)
 );
 
-CREATE TABLE page_to_figure(
+CREATE TABLE IF NOT EXISTS page_to_figure(
     -- This table holds the relation between pages and figures, and can be used to look up the figures on a given page using a JOIN
     page_id INTEGER NOT NULL,
     figure_id INTEGER NOT NULL,
@@ -80,18 +81,6 @@ CREATE TABLE page_to_figure(
     PRIMARY KEY (page_id, figure_id)
 );
 
--- Create vec0 virtual table for efficient vector storage
--- Adjust dimension based on the embedding model being used (default to 1024 for Mistral)
-CREATE VIRTUAL TABLE IF NOT EXISTS section_embeddings_vec USING vec0(
-    embedding float[1024]
-);
-
-CREATE TABLE IF NOT EXISTS section_vec_mapping(
-    section_id INTEGER PRIMARY KEY,
-    vec_rowid INTEGER NOT NULL,
-    FOREIGN KEY (section_id) REFERENCES pdf_sections(id) ON DELETE CASCADE
-);
-
 -- Table for section topics/clusters
 CREATE TABLE IF NOT EXISTS section_topics(
     id INTEGER PRIMARY KEY,
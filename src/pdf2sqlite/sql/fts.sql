@@ -0,0 +1,194 @@
+-- Full-text indexes over the text pdf2sqlite extracts or generates. The FTS5
+-- tables are external-content tables, so the text itself is only stored once,
+-- in the source tables, and triggers keep the indexes in sync.
+--
+-- When the indexes are added to a database that already holds data, the
+-- existing rows are indexed incrementally by `pdf2sqlite index`. Until then,
+-- fts_backfill records the range of rowids that is still pending, and the
+-- triggers leave those rows to the backfill.
+
+CREATE TABLE IF NOT EXISTS fts_backfill(
+    name TEXT PRIMARY KEY, --the FTS table being backfilled
+    last_rowid INTEGER NOT NULL, --the last source rowid that has been indexed
+    target_rowid INTEGER NOT NULL --the largest source rowid that predates the index
+);
+
+INSERT INTO fts_backfill (name, last_rowid, target_rowid)
+SELECT 'pdf_pages_fts', 0, MAX(id) FROM pdf_pages
+WHERE NOT EXISTS (SELECT 1 FROM sqlite_master WHERE name = 'pdf_pages_fts')
+HAVING MAX(id) IS NOT NULL;
+
+INSERT INTO fts_backfill (name, last_rowid, target_rowid)
+SELECT 'pdf_sections_fts', 0, MAX(id) FROM pdf_sections
+WHERE NOT EXISTS (SELECT 1 FROM sqlite_master WHERE name = 'pdf_sections_fts')
+HAVING MAX(id) IS NOT NULL;
+
+INSERT INTO fts_backfill (name, last_rowid, target_rowid)
+SELECT 'pdf_figures_fts', 0, MAX(id) FROM pdf_figures
+WHERE NOT EXISTS (SELECT 1 FROM sqlite_master WHERE name = 'pdf_figures_fts')
+HAVING MAX(id) IS NOT NULL;
+
+INSERT INTO fts_backfill (name, last_rowid, target_rowid)
+SELECT 'pdf_tables_fts', 0, MAX(id) FROM pdf_tables
+WHERE NOT EXISTS (SELECT 1 FROM sqlite_master WHERE name = 'pdf_tables_fts')
+HAVING MAX(id) IS NOT NULL;
+
+-- Page text and page gists
+CREATE VIRTUAL TABLE IF NOT EXISTS pdf_pages_fts USING fts5(
+    text,
+    gist,
+    content = 'pdf_pages',
+    content_rowid = 'id',
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS pdf_pages_fts_insert AFTER INSERT ON pdf_pages
+WHEN NOT EXISTS (
+    SELECT 1 FROM fts_backfill
+    WHERE name = 'pdf_pages_fts' AND new.id > last_rowid AND new.id <= target_rowid
+)
+BEGIN
+    INSERT INTO pdf_pages_fts (rowid, text, gist) VALUES (new.id, new.text, new.gist);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pdf_pages_fts_delete AFTER DELETE ON pdf_pages
+WHEN NOT EXISTS (
+    SELECT 1 FROM fts_backfill
+    WHERE name = 'pdf_pages_fts' AND old.id > last_rowid AND old.id <= target_rowid
+)
+BEGIN
+    INSERT INTO pdf_pages_fts (pdf_pages_fts, rowid, text, gist)
+    VALUES ('delete', old.id, old.text, old.gist);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pdf_pages_fts_update AFTER UPDATE OF text, gist ON pdf_pages
+WHEN NOT EXISTS (
+    SELECT 1 FROM fts_backfill
+    WHERE name = 'pdf_pages_fts' AND old.id > last_rowid AND old.id <= target_rowid
+)
+BEGIN
+    INSERT INTO pdf_pages_fts (pdf_pages_fts, rowid, text, gist)
+    VALUES ('delete', old.id, old.text, old.gist);
+    INSERT INTO pdf_pages_fts (rowid, text, gist) VALUES (new.id, new.text, new.gist);
+END;
+
+-- Section titles and section gists
+CREATE VIRTUAL TABLE IF NOT EXISTS pdf_sections_fts USING fts5(
+    title,
+    gist,
+    content = 'pdf_sections',
+    content_rowid = 'id',
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS pdf_sections_fts_insert AFTER INSERT ON pdf_sections
+WHEN NOT EXISTS (
+    SELECT 1 FROM fts_backfill
+    WHERE name = 'pdf_sections_fts' AND new.id > last_rowid AND new.id <= target_rowid
+)
+BEGIN
+    INSERT INTO pdf_sections_fts (rowid, title, gist) VALUES (new.id, new.title, new.gist);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pdf_sections_fts_delete AFTER DELETE ON pdf_sections
+WHEN NOT EXISTS (
+    SELECT 1 FROM fts_backfill
+    WHERE name = 'pdf_sections_fts' AND old.id > last_rowid AND old.id <= target_rowid
+)
+BEGIN
+    INSERT INTO pdf_sections_fts (pdf_sections_fts, rowid, title, gist)
+    VALUES ('delete', old.id, old.title, old.gist);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pdf_sections_fts_update AFTER UPDATE OF title, gist ON pdf_sections
+WHEN NOT EXISTS (
+    SELECT 1 FROM fts_backfill
+    WHERE name = 'pdf_sections_fts' AND old.id > last_rowid AND old.id <= target_rowid
+)
+BEGIN
+    INSERT INTO pdf_sections_fts (pdf_sections_fts, rowid, title, gist)
+    VALUES ('delete', old.id, old.title, old.gist);
+    INSERT INTO pdf_sections_fts (rowid, title, gist) VALUES (new.id, new.title, new.gist);
+END;
+
+-- Figure descriptions
+CREATE VIRTUAL TABLE IF NOT EXISTS pdf_figures_fts USING fts5(
+    description,
+    content = 'pdf_figures',
+    content_rowid = 'id',
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS pdf_figures_fts_insert AFTER INSERT ON pdf_figures
+WHEN NOT EXISTS (
+    SELECT 1 FROM fts_backfill
+    WHERE name = 'pdf_figures_fts' AND new.id > last_rowid AND new.id <= target_rowid
+)
+BEGIN
+    INSERT INTO pdf_figures_fts (rowid, description) VALUES (new.id, new.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pdf_figures_fts_delete AFTER DELETE ON pdf_figures
+WHEN NOT EXISTS (
+    SELECT 1 FROM fts_backfill
+    WHERE name = 'pdf_figures_fts' AND old.id > last_rowid AND old.id <= target_rowid
+)
+BEGIN
+    INSERT INTO pdf_figures_fts (pdf_figures_fts, rowid, description)
+    VALUES ('delete', old.id, old.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pdf_figures_fts_update AFTER UPDATE OF description ON pdf_figures
+WHEN NOT EXISTS (
+    SELECT 1 FROM fts_backfill
+    WHERE name = 'pdf_figures_fts' AND old.id > last_rowid AND old.id <= target_rowid
+)
+BEGIN
+    INSERT INTO pdf_figures_fts (pdf_figures_fts, rowid, description)
+    VALUES ('delete', old.id, old.description);
+    INSERT INTO pdf_figures_fts (rowid, description) VALUES (new.id, new.description);
+END;
+
+-- Table markdown, table descriptions and captions
+CREATE VIRTUAL TABLE IF NOT EXISTS pdf_tables_fts USING fts5(
+    text,
+    description,
+    caption_above,
+    caption_below,
+    content = 'pdf_tables',
+    content_rowid = 'id',
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS pdf_tables_fts_insert AFTER INSERT ON pdf_tables
+WHEN NOT EXISTS (
+    SELECT 1 FROM fts_backfill
+    WHERE name = 'pdf_tables_fts' AND new.id > last_rowid AND new.id <= target_rowid
+)
+BEGIN
+    INSERT INTO pdf_tables_fts (rowid, text, description, caption_above, caption_below)
+    VALUES (new.id, new.text, new.description, new.caption_above, new.caption_below);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pdf_tables_fts_delete AFTER DELETE ON pdf_tables
+WHEN NOT EXISTS (
+    SELECT 1 FROM fts_backfill
+    WHERE name = 'pdf_tables_fts' AND old.id > last_rowid AND old.id <= target_rowid
+)
+BEGIN
+    INSERT INTO pdf_tables_fts (pdf_tables_fts, rowid, text, description, caption_above, caption_below)
+    VALUES ('delete', old.id, old.text, old.description, old.caption_above, old.caption_below);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pdf_tables_fts_update
+AFTER UPDATE OF text, description, caption_above, caption_below ON pdf_tables
+WHEN NOT EXISTS (
+    SELECT 1 FROM fts_backfill
+    WHERE name = 'pdf_tables_fts' AND old.id > last_rowid AND old.id <= target_rowid
+)
+BEGIN
+    INSERT INTO pdf_tables_fts (pdf_tables_fts, rowid, text, description, caption_above, caption_below)
+    VALUES ('delete', old.id, old.text, old.description, old.caption_above, old.caption_below);
+    INSERT INTO pdf_tables_fts (rowid, text, description, caption_above, caption_below)
+    VALUES (new.id, new.text, new.description, new.caption_above, new.caption_below);
+END;
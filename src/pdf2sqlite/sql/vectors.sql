@@ -0,0 +1,81 @@
+-- Registry of embedding spaces. Every embedding model (and kind of content it
+-- embeds) gets its own space, with a vec0 table sized to the model's dimension
+-- and a table mapping the embedded items to rows of the vec0 table:
+--
+--     embedding_vec_<id>  vec0(embedding float[<dimension>])
+--     embedding_map_<id>  (item_id, vec_rowid)
+--
+-- so embeddings from several models can be stored, and compared, side by side.
+-- Partitioned spaces also store the pdf_id of each vector as a vec0 partition
+-- key, and the PDF's collection as a metadata column, so that a search within
+-- a few PDFs or a collection only scans their vectors.
+-- Quantized spaces hold int8[] or bit[] vectors in their vec0 table for a fast
+-- first pass, and keep the float vectors for re-scoring in
+--
+--     embedding_full_<id> (vec_rowid, embedding)
+--
+-- A space can also have an approximate (IVF) index, built by `pdf2sqlite index
+-- --ivf`: centroids of its vectors, and a posting list of the vectors nearest
+-- each centroid, so a search only compares the query against a few lists.
+-- Postings keep a copy of each vector in the vec0 storage format, clustered by
+-- list, so that a probed list is read in one scan
+--
+--     ivf_centroids_<id>  vec0(embedding float[<dimension>])
+--     ivf_postings_<id>   (centroid_id, vec_rowid, embedding)
+CREATE TABLE IF NOT EXISTS embedding_spaces(
+    id INTEGER PRIMARY KEY,
+    model TEXT NOT NULL, --the embedding model (litellm naming conventions)
+    target TEXT NOT NULL DEFAULT 'section', --the kind of content embedded
+    dimension INTEGER NOT NULL,
+    distance_metric TEXT NOT NULL DEFAULT 'cosine', --l2, l1 or cosine
+    quantization TEXT NOT NULL DEFAULT 'none', --none, int8 or bit
+    ivf_lists INTEGER NOT NULL DEFAULT 0, --IVF posting lists, 0 without an index
+    ivf_probes INTEGER NOT NULL DEFAULT 0, --lists searched per query
+    partitioned INTEGER NOT NULL DEFAULT 0, --1 if vectors carry pdf_id and collection
+    UNIQUE (model, target)
+);
+
+-- Embeddings already computed, keyed by model and the SHA-256 of the cleaned
+-- text that was embedded, so unchanged or duplicated text is never re-embedded
+CREATE TABLE IF NOT EXISTS embedding_cache(
+    model TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    embedding BLOB NOT NULL, --float32 vector
+    PRIMARY KEY (model, text_hash)
+) WITHOUT ROWID;
+
+-- Overlapping pieces of section text, embedded individually so that long
+-- sections are searchable throughout. Pages are zero-based, as in
+-- pdf_sections, and character offsets are into the extracted section text
+CREATE TABLE IF NOT EXISTS section_chunks(
+    id INTEGER PRIMARY KEY,
+    section_id INTEGER NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    start_page INTEGER NOT NULL,
+    end_page INTEGER NOT NULL,
+    char_start INTEGER NOT NULL,
+    char_end INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    UNIQUE(section_id, chunk_index),
+    FOREIGN KEY(section_id) REFERENCES pdf_sections(id) ON DELETE CASCADE
+);
+
+-- Corpus-wide topic model of each embedding model: the centroid of every
+-- topic, updated by mini-batch k-means as PDFs are added, the number of
+-- sections it has absorbed, and that number when it was last labelled
+CREATE TABLE IF NOT EXISTS topic_centroids(
+    topic_id INTEGER PRIMARY KEY,
+    model TEXT NOT NULL,
+    centroid BLOB NOT NULL, --float32 unit vector
+    count INTEGER NOT NULL DEFAULT 0,
+    labelled_count INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY(topic_id) REFERENCES topics(id) ON DELETE CASCADE
+);
+
+-- The number of sections each keyword term occurs in, updated as sections are
+-- added, for weighting section keywords and topic labels by TF-IDF. The
+-- sections counted are those with a row in term_document_sections
+CREATE TABLE IF NOT EXISTS term_document_frequency(
+    term TEXT PRIMARY KEY,
+    sections INTEGER NOT NULL
+) WITHOUT ROWID;
@@ -0,0 +1,123 @@
+from sqlite3 import Cursor
+from typing import Callable
+
+# Per-PDF totals kept up to date at ingest, so that listing PDFs reads one row
+# per PDF instead of counting their pages. The *_complete columns flag the
+# enrichments that have been done for everything they apply to.
+STATS_TABLE = """
+CREATE TABLE IF NOT EXISTS pdf_stats(
+    pdf_id INTEGER PRIMARY KEY,
+    page_count INTEGER NOT NULL,
+    section_count INTEGER NOT NULL,
+    figure_count INTEGER NOT NULL,
+    table_count INTEGER NOT NULL,
+    total_bytes INTEGER NOT NULL, --stored page, figure and table image data
+    gist_count INTEGER NOT NULL,
+    described_figure_count INTEGER NOT NULL,
+    described_table_count INTEGER NOT NULL,
+    has_abstract INTEGER NOT NULL,
+    gists_complete INTEGER GENERATED ALWAYS AS
+        (page_count > 0 AND gist_count = page_count) VIRTUAL,
+    figure_descriptions_complete INTEGER GENERATED ALWAYS AS
+        (described_figure_count = figure_count) VIRTUAL,
+    table_descriptions_complete INTEGER GENERATED ALWAYS AS
+        (described_table_count = table_count) VIRTUAL,
+    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (pdf_id) REFERENCES pdfs(id) ON DELETE CASCADE
+)
+"""
+
+_REFRESH_SQL = """
+WITH
+    pages AS (
+        SELECT COUNT(*) AS count, COUNT(gist) AS gists, COALESCE(SUM(LENGTH(data)), 0) AS bytes
+        FROM pdf_pages WHERE pdf_id = :pdf_id
+    ),
+    figures AS (
+        SELECT COUNT(*) AS count, COUNT(description) AS described,
+            COALESCE(SUM(LENGTH(data)), 0) AS bytes
+        FROM pdf_figures
+        WHERE id IN (
+            SELECT page_to_figure.figure_id
+            FROM pdf_pages
+            JOIN page_to_figure ON page_to_figure.page_id = pdf_pages.id
+            WHERE pdf_pages.pdf_id = :pdf_id
+        )
+    ),
+    tables AS (
+        SELECT COUNT(*) AS count, COUNT(description) AS described,
+            COALESCE(SUM(LENGTH(image)), 0) AS bytes
+        FROM pdf_tables WHERE pdf_id = :pdf_id
+    )
+INSERT OR REPLACE INTO pdf_stats (
+    pdf_id, page_count, section_count, figure_count, table_count, total_bytes,
+    gist_count, described_figure_count, described_table_count, has_abstract
+)
+SELECT
+    pdfs.id,
+    pages.count,
+    (SELECT COUNT(*) FROM pdf_sections WHERE pdf_id = :pdf_id),
+    figures.count,
+    tables.count,
+    pages.bytes + figures.bytes + tables.bytes,
+    pages.gists,
+    figures.described,
+    tables.described,
+    pdfs.description IS NOT NULL
+FROM pdfs, pages, figures, tables
+WHERE pdfs.id = :pdf_id
+"""
+
+
+def ensure_stats_table(cursor: Cursor) -> None:
+    cursor.execute(STATS_TABLE)
+
+
+def refresh_pdf_stats(cursor: Cursor, pdf_id: int) -> None:
+    """Recount a PDF's statistics from its stored rows"""
+    cursor.execute(_REFRESH_SQL, {"pdf_id": pdf_id})
+
+
+def pending_stats(cursor: Cursor) -> int:
+    """The number of PDFs without statistics"""
+    return cursor.execute(
+        "SELECT COUNT(*) FROM pdfs WHERE NOT EXISTS (SELECT 1 FROM pdf_stats WHERE pdf_id = pdfs.id)"
+    ).fetchone()[0]
+
+
+def backfill_stats(
+        cursor: Cursor,
+        batch_size: int = 1000,
+        on_progress: Callable[[str, int, int], None] | None = None,
+) -> int:
+    """
+    Count the statistics of PDFs that have none, one batch per transaction
+
+    Returns:
+        Number of PDFs counted
+    """
+    if batch_size <= 0:
+        raise ValueError("batch size must be positive")
+
+    target = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM pdfs").fetchone()[0]
+    counted = 0
+    while True:
+        pdf_ids = [
+            pdf_id
+            for (pdf_id,) in cursor.execute(
+                """
+                SELECT id FROM pdfs
+                WHERE NOT EXISTS (SELECT 1 FROM pdf_stats WHERE pdf_id = pdfs.id)
+                ORDER BY id LIMIT ?
+                """,
+                [batch_size],
+            ).fetchall()
+        ]
+        if not pdf_ids:
+            return counted
+        for pdf_id in pdf_ids:
+            refresh_pdf_stats(cursor, pdf_id)
+        cursor.connection.commit()
+        counted += len(pdf_ids)
+        if on_progress:
+            on_progress("pdf_stats", pdf_ids[-1], target)
@@ -0,0 +1,266 @@
+from sqlite3 import Cursor
+from typing import List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .keywords import (
+    LOOKUP_BATCH,
+    class_keywords,
+    counted_sections,
+    inverse_document_frequencies,
+    keywords_name,
+)
+
+# topics in the corpus-wide topic model of each embedding model
+TOPIC_COUNT = 20
+
+# softmax temperature over cosine distances to the topic centroids; smaller
+# values make confidences more decisive
+TOPIC_TEMPERATURE = 0.05
+
+# besides its nearest topic, a section is assigned every topic it belongs to
+# with at least this confidence
+MIN_TOPIC_CONFIDENCE = 0.25
+
+# a topic is relabelled once it has absorbed this fraction more sections than
+# it had when it was last labelled
+LABEL_REFRESH_GROWTH = 0.5
+
+# The term counts of the sections each topic has absorbed, pooled as they are
+# absorbed, from which its class-based TF-IDF label is drawn
+TOPIC_TERMS_TABLE = """
+CREATE TABLE IF NOT EXISTS topic_terms(
+    topic_id INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (topic_id, term),
+    FOREIGN KEY(topic_id) REFERENCES topics(id) ON DELETE CASCADE
+) WITHOUT ROWID
+"""
+
+
+def ensure_topic_terms(cursor: Cursor) -> None:
+    cursor.execute(TOPIC_TERMS_TABLE)
+
+
+def unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1)
+
+
+def load_topics(cursor: Cursor, model: str) -> tuple[List[int], np.ndarray, np.ndarray]:
+    """The topic ids, centroids and section counts of a model's topic model"""
+    rows = cursor.execute(
+        "SELECT topic_id, centroid, count FROM topic_centroids WHERE model = ? ORDER BY topic_id",
+        [model],
+    ).fetchall()
+    ids = [row[0] for row in rows]
+    centroids = np.array([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+    counts = np.array([row[2] for row in rows], dtype=np.int64)
+    return ids, centroids, counts
+
+
+def absorbed_sections(cursor: Cursor, model: str, section_ids: List[int]) -> set[int]:
+    """The sections that a model's topic model has absorbed already"""
+    absorbed = set()
+    for start in range(0, len(section_ids), LOOKUP_BATCH):
+        batch = section_ids[start:start + LOOKUP_BATCH]
+        absorbed.update(row[0] for row in cursor.execute(
+            f"""
+            SELECT DISTINCT section_topics.section_id
+            FROM section_topics
+            JOIN topic_centroids ON topic_centroids.topic_id = section_topics.topic_id
+            WHERE topic_centroids.model = ?
+              AND section_topics.section_id IN ({', '.join('?' * len(batch))})
+            """,
+            [model, *batch],
+        ))
+    return absorbed
+
+
+def farthest_points(vectors: np.ndarray, centroids: np.ndarray, count: int) -> List[int]:
+    """
+    Greedily pick up to count vectors, each the farthest from the centroids
+    and the vectors already picked, to seed new topics
+    """
+    picked: List[int] = []
+    if len(centroids):
+        nearest = (vectors @ centroids.T).max(axis=1)
+    else:
+        nearest = np.full(len(vectors), -np.inf)
+    while len(picked) < min(count, len(vectors)):
+        index = int(np.argmin(nearest))
+        if picked and nearest[index] >= 1.0 - 1e-6:
+            break  # only duplicates of existing centroids are left
+        picked.append(index)
+        nearest = np.maximum(nearest, vectors @ vectors[index])
+    return picked
+
+
+def topic_confidences(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    The confidence that each vector belongs to each topic: a softmax over
+    the negated cosine distances to the centroids
+    """
+    logits = (vectors @ centroids.T - 1.0) / TOPIC_TEMPERATURE
+    logits -= logits.max(axis=1, keepdims=True)
+    weights = np.exp(logits)
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+def update_topics(
+        cursor: Cursor,
+        model: str,
+        section_ids: List[int],
+        embeddings: List[np.ndarray],
+        n_topics: int = TOPIC_COUNT,
+        term_counts: Tuple[sparse.csr_matrix, List[str]] | None = None,
+) -> None:
+    """
+    Fold a batch of sections into a model's corpus-wide topic model, and
+    assign them to topics
+
+    Until the model has n_topics topics, new ones are seeded from the
+    sections farthest from the existing centroids. Each section then moves
+    its nearest centroid towards it by one mini-batch k-means step, with a
+    learning rate of one over the number of sections the topic has absorbed,
+    so topics settle as the corpus grows instead of being refit per PDF.
+    The sections' term counts, from `count_terms`, are pooled into the
+    topics they are absorbed by, for their labels.
+
+    Sections are assigned their nearest topic, and any other topic they
+    belong to with at least MIN_TOPIC_CONFIDENCE, replacing earlier
+    assignments. Sections already assigned to the model's topics, because
+    their PDF is being re-ingested, are reassigned without being absorbed
+    into the centroids again.
+    """
+    if not section_ids:
+        return
+    vectors = unit_rows(np.stack(embeddings).astype(np.float32))
+    ids, centroids, counts = load_topics(cursor, model)
+    absorbed = absorbed_sections(cursor, model, section_ids)
+    fresh = [index for index, section_id in enumerate(section_ids) if section_id not in absorbed]
+    new = vectors[fresh]
+
+    if len(ids) < n_topics and len(new):
+        if not len(ids):
+            centroids = np.empty((0, vectors.shape[1]), dtype=np.float32)
+        seeds = farthest_points(new, centroids, n_topics - len(ids))
+        for index in seeds:
+            cursor.execute("INSERT INTO topics (name, description) VALUES (NULL, '')")
+            ids.append(cursor.lastrowid)
+        centroids = np.concatenate([centroids, new[seeds]])
+        counts = np.concatenate([counts, np.zeros(len(seeds), dtype=np.int64)])
+
+    absorbed_by = []
+    for vector in new:
+        nearest = int(np.argmax(centroids @ vector))
+        absorbed_by.append(nearest)
+        counts[nearest] += 1
+        centroid = centroids[nearest] + (vector - centroids[nearest]) / counts[nearest]
+        centroids[nearest] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+    cursor.executemany(
+        """
+        INSERT INTO topic_centroids (topic_id, model, centroid, count) VALUES (?,?,?,?)
+        ON CONFLICT(topic_id) DO UPDATE SET centroid = excluded.centroid, count = excluded.count
+        """,
+        [
+            (topic_id, model, centroid.astype(np.float32).tobytes(), int(count))
+            for topic_id, centroid, count in zip(ids, centroids, counts)
+        ],
+    )
+
+    if term_counts is not None and fresh:
+        matrix, terms = term_counts
+        membership = sparse.csr_matrix(
+            (np.ones(len(fresh)), (absorbed_by, range(len(fresh)))),
+            shape=(len(ids), len(fresh)),
+        )
+        pooled = sparse.coo_matrix(membership @ matrix[fresh])
+        cursor.executemany(
+            """
+            INSERT INTO topic_terms (topic_id, term, count) VALUES (?, ?, ?)
+            ON CONFLICT(topic_id, term) DO UPDATE SET count = count + excluded.count
+            """,
+            [
+                (ids[row], terms[column], int(count))
+                for row, column, count in zip(pooled.row, pooled.col, pooled.data)
+                if count
+            ],
+        )
+
+    confidences = topic_confidences(vectors, centroids)
+    for section_id, row in zip(section_ids, confidences):
+        cursor.execute("DELETE FROM section_topics WHERE section_id = ?", [section_id])
+        nearest = int(np.argmax(row))
+        cursor.executemany(
+            "INSERT INTO section_topics (section_id, topic_id, confidence) VALUES (?, ?, ?)",
+            [
+                (section_id, ids[index], float(confidence))
+                for index, confidence in enumerate(row)
+                if index == nearest or confidence >= MIN_TOPIC_CONFIDENCE
+            ],
+        )
+
+
+def refresh_topic_labels(cursor: Cursor, model: str, force: bool = False) -> int:
+    """
+    Relabel the topics of a model that have grown by LABEL_REFRESH_GROWTH
+    since they were last labelled, so labels are recomputed in batches
+    rather than for every PDF
+
+    Each topic is named after the class-based TF-IDF keywords of the term
+    counts pooled from the sections it has absorbed, so no text is read
+    again. Topics with no pooled counts keep the name they have.
+
+    Returns:
+        The number of topics relabelled
+    """
+    stale = cursor.execute(
+        """
+        SELECT topic_id, count FROM topic_centroids
+        WHERE model = ? AND count > 0
+          AND (? OR (count >= labelled_count * ? AND count > labelled_count))
+        """,
+        [model, force, 1.0 + LABEL_REFRESH_GROWTH],
+    ).fetchall()
+    pooled = cursor.execute(
+        f"""
+        SELECT topic_id, term, count FROM topic_terms
+        WHERE topic_id IN ({', '.join('?' * len(stale))})
+        ORDER BY topic_id
+        """,
+        [topic_id for topic_id, _ in stale],
+    ).fetchall()
+    classes = list(dict.fromkeys(topic_id for topic_id, _, _ in pooled))
+    terms = sorted({term for _, term, _ in pooled})
+    row = {topic_id: index for index, topic_id in enumerate(classes)}
+    column = {term: index for index, term in enumerate(terms)}
+    matrix = sparse.csr_matrix(
+        (
+            [count for _, _, count in pooled],
+            ([row[topic_id] for topic_id, _, _ in pooled], [column[term] for _, term, _ in pooled]),
+        ),
+        shape=(len(classes), len(terms)),
+    )
+    idf = inverse_document_frequencies(cursor, terms, counted_sections(cursor))
+    labels = class_keywords(matrix, classes, terms, idf) if classes else {}
+    for topic_id, count in stale:
+        keywords = labels.get(topic_id)
+        if keywords:
+            cursor.execute(
+                "UPDATE topics SET name = ?, description = ? WHERE id = ?",
+                [keywords_name(keywords), ", ".join(keywords), topic_id],
+            )
+        else:
+            cursor.execute(
+                "UPDATE topics SET name = COALESCE(name, ?) WHERE id = ?",
+                [keywords_name([]), topic_id],
+            )
+        cursor.execute(
+            "UPDATE topic_centroids SET labelled_count = ? WHERE topic_id = ?",
+            [count, topic_id],
+        )
+    return len(stale)
@@ -11,6 +11,7 @@ def validate_args(args: Namespace):
         validate_database(args.database)
 
     validate_llms(args)
+    validate_embedding_passes(args)
 
 def validate_pdf(the_pdf : str):
     with open(the_pdf, "rb") as pdf:
@@ -38,3 +39,8 @@ def validate_llms(args : Namespace):
     if (args.abstracter):
         if not litellm.utils.supports_pdf_input(args.abstracter):
             sys.exit(f"Aborting. The abstracter model supplied, `{args.abstracter}` doesn't support PDF input!")
+
+def validate_embedding_passes(args : Namespace):
+    for flag in ("embed_pages", "embed_figures", "embed_tables"):
+        if getattr(args, flag, False) and not args.embedder:
+            sys.exit(f"Aborting. --{flag} needs an embedding model, supplied with --embedder")
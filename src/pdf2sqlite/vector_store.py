@@ -0,0 +1,607 @@
+import re
+from dataclasses import dataclass, replace
+from importlib import resources
+from sqlite3 import Connection, Cursor
+from typing import Callable
+
+import numpy as np
+
+vectors_statement = resources.read_text("pdf2sqlite.sql", "vectors.sql")
+
+DISTANCE_METRICS = ("l2", "l1", "cosine")
+
+# how the vectors of a space's vec0 table are stored: as float32, as int8 or
+# as one bit per dimension
+QUANTIZATIONS = ("none", "int8", "bit")
+
+# the tables whose rows each kind of embedding space embeds
+TARGET_TABLES = {
+    "section": "pdf_sections",
+    "chunk": "section_chunks",
+    "page": "pdf_pages",
+    "figure": "pdf_figures",
+    "table": "pdf_tables",
+}
+
+# vectors per vec0 storage chunk in partitioned spaces. vec0 allocates whole
+# chunks per partition, so its default of 1024 would reserve megabytes for
+# every PDF however few items it has
+PARTITION_CHUNK_SIZE = 64
+
+# the PDF that an item of each target belongs to, as a scalar subquery on an
+# item id expression
+ITEM_PDF_SQL = {
+    "section": "(SELECT pdf_id FROM pdf_sections WHERE id = {item})",
+    "chunk": (
+        "(SELECT pdf_sections.pdf_id FROM section_chunks "
+        "JOIN pdf_sections ON pdf_sections.id = section_chunks.section_id "
+        "WHERE section_chunks.id = {item})"
+    ),
+    "page": "(SELECT pdf_id FROM pdf_pages WHERE id = {item})",
+    "figure": (
+        "(SELECT MIN(pdf_pages.pdf_id) FROM page_to_figure "
+        "JOIN pdf_pages ON pdf_pages.id = page_to_figure.page_id "
+        "WHERE page_to_figure.figure_id = {item})"
+    ),
+    "table": "(SELECT pdf_id FROM pdf_tables WHERE id = {item})",
+}
+
+# databases created before embedding spaces existed keep their section
+# embeddings in a single 1024-dimensional table
+LEGACY_VEC_TABLE = "section_embeddings_vec"
+LEGACY_MAPPING_TABLE = "section_vec_mapping"
+
+
+@dataclass(frozen=True)
+class EmbeddingSpace:
+    id: int
+    model: str
+    target: str
+    dimension: int
+    distance_metric: str
+    vec_table: str
+    mapping_table: str
+    mapping_key: str = "item_id"
+    quantization: str = "none"
+    ivf_lists: int = 0
+    ivf_probes: int = 0
+    partitioned: bool = False
+
+    @classmethod
+    def from_row(cls, row) -> "EmbeddingSpace":
+        space_id = row[0]
+        return cls(
+            id=space_id,
+            model=row[1],
+            target=row[2],
+            dimension=row[3],
+            distance_metric=row[4],
+            vec_table=f"embedding_vec_{space_id}",
+            mapping_table=f"embedding_map_{space_id}",
+            quantization=row[5],
+            ivf_lists=row[6],
+            ivf_probes=row[7],
+            partitioned=bool(row[8]),
+        )
+
+    @property
+    def quantized(self) -> bool:
+        return self.quantization != "none"
+
+    @property
+    def centroid_table(self) -> str:
+        return f"ivf_centroids_{self.id}"
+
+    @property
+    def postings_table(self) -> str:
+        return f"ivf_postings_{self.id}"
+
+    @property
+    def full_table(self) -> str:
+        """The table of float vectors that quantized matches are re-scored against"""
+        return f"embedding_full_{self.id}"
+
+    def vector_sql(self, parameter: str = "?") -> str:
+        """An SQL expression for a float32 vector in this space's vec0 storage format"""
+        if self.quantization == "int8":
+            return f"vec_quantize_int8({parameter}, 'unit')"
+        if self.quantization == "bit":
+            return f"vec_quantize_binary({parameter})"
+        return parameter
+
+    def stored_distance_sql(self, column: str, parameter: str = "?") -> str:
+        """
+        An SQL expression for the distance between a vector in this space's
+        vec0 storage format and a float32 vector
+        """
+        if self.quantization == "int8":
+            return (
+                f"vec_distance_{self.distance_metric}"
+                f"(vec_int8({column}), {self.vector_sql(parameter)})"
+            )
+        if self.quantization == "bit":
+            return f"vec_distance_hamming(vec_bit({column}), {self.vector_sql(parameter)})"
+        return self.distance_sql(column, parameter)
+
+    def distance_sql(self, column: str, parameter: str = "?") -> str:
+        """An SQL expression for the exact distance between two float32 vectors"""
+        return f"vec_distance_{self.distance_metric}({column}, {parameter})"
+
+
+# registry columns added after it was introduced, with their definitions
+ADDED_SPACE_COLUMNS = {
+    "quantization": "TEXT NOT NULL DEFAULT 'none'",
+    "ivf_lists": "INTEGER NOT NULL DEFAULT 0",
+    "ivf_probes": "INTEGER NOT NULL DEFAULT 0",
+    "partitioned": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def ensure_vector_store(cursor: Cursor) -> None:
+    """Create the embedding space registry if it is missing"""
+    cursor.executescript(vectors_statement)
+    columns = registry_columns(cursor)
+    for name, definition in ADDED_SPACE_COLUMNS.items():
+        if name not in columns:
+            cursor.execute(f"ALTER TABLE embedding_spaces ADD COLUMN {name} {definition}")
+
+
+def registry_columns(cursor: Cursor | Connection) -> set[str]:
+    return {row[1] for row in cursor.execute("PRAGMA table_info(embedding_spaces)")}
+
+
+def space_columns(cursor: Cursor | Connection) -> str:
+    """
+    The registry columns to select for EmbeddingSpace.from_row, with default
+    values for columns that a database opened read-only may not have yet
+    """
+    columns = registry_columns(cursor)
+    selected = ["id", "model", "target", "dimension", "distance_metric"]
+    for name, definition in ADDED_SPACE_COLUMNS.items():
+        default = definition.rsplit("DEFAULT ", 1)[1]
+        selected.append(name if name in columns else f"{default} AS {name}")
+    return ", ".join(selected)
+
+
+def table_exists(cursor: Cursor | Connection, name: str) -> bool:
+    row = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", [name]
+    ).fetchone()
+    return row is not None
+
+
+def list_spaces(cursor: Cursor | Connection) -> list[EmbeddingSpace]:
+    if not table_exists(cursor, "embedding_spaces"):
+        return []
+    rows = cursor.execute(
+        f"SELECT {space_columns(cursor)} FROM embedding_spaces ORDER BY id"
+    ).fetchall()
+    return [EmbeddingSpace.from_row(row) for row in rows]
+
+
+def get_space(
+        cursor: Cursor | Connection,
+        model: str,
+        target: str = "section",
+) -> EmbeddingSpace | None:
+    """
+    Look up the registered embedding space for a model
+
+    The legacy section embeddings of databases that predate the registry
+    aren't returned for any model, since nothing records which model made
+    them; `adopt_legacy_embeddings` registers them once that is known.
+    """
+    if not table_exists(cursor, "embedding_spaces"):
+        return None
+    row = cursor.execute(
+        f"SELECT {space_columns(cursor)} FROM embedding_spaces "
+        "WHERE model = ? AND target = ?",
+        [model, target],
+    ).fetchone()
+    return EmbeddingSpace.from_row(row) if row is not None else None
+
+
+def has_legacy_embeddings(cursor: Cursor | Connection) -> bool:
+    return table_exists(cursor, LEGACY_VEC_TABLE)
+
+
+def legacy_dimension(cursor: Cursor | Connection) -> int | None:
+    row = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE name = ?", [LEGACY_VEC_TABLE]
+    ).fetchone()
+    if row is None:
+        return None
+    match = re.search(r"float\[(\d+)\]", row[0])
+    return int(match.group(1)) if match else None
+
+
+def get_or_create_space(
+        cursor: Cursor,
+        model: str,
+        dimension: int,
+        target: str = "section",
+        distance_metric: str = "cosine",
+        quantization: str | None = None,
+) -> EmbeddingSpace:
+    """
+    Find or register the embedding space for a model and target
+
+    Args:
+        quantization: How a new space stores its vectors; "none" if not given.
+            An existing space keeps its own unless this asks for another.
+
+    Raises:
+        ValueError: if the model's dimension or the requested quantization
+            doesn't match its existing space
+    """
+    if target not in TARGET_TABLES:
+        raise ValueError(f"unknown embedding target '{target}'")
+    if distance_metric not in DISTANCE_METRICS:
+        raise ValueError(f"unknown distance metric '{distance_metric}'")
+    if quantization is not None and quantization not in QUANTIZATIONS:
+        raise ValueError(f"unknown quantization '{quantization}'")
+    if dimension <= 0:
+        raise ValueError("embedding dimension must be positive")
+
+    if not table_exists(cursor, "embedding_spaces"):
+        ensure_vector_store(cursor)
+    existing = get_space(cursor, model, target)
+    if existing is not None:
+        if existing.dimension != dimension:
+            raise ValueError(
+                f"{model} produced {dimension}-dimensional embeddings, but this "
+                f"database stores {existing.dimension}-dimensional embeddings for it"
+            )
+        if quantization is not None and existing.quantization != quantization:
+            raise ValueError(
+                f"this database stores {existing.quantization} quantized {target} "
+                f"embeddings for {model}, not {quantization}"
+            )
+        return existing
+
+    quantization = quantization or "none"
+    if quantization == "bit" and dimension % 8:
+        raise ValueError("bit quantization needs a dimension divisible by 8")
+
+    cursor.execute(
+        "INSERT INTO embedding_spaces "
+        "(model, target, dimension, distance_metric, quantization, partitioned) "
+        "VALUES (?,?,?,?,?,1)",
+        [model, target, dimension, distance_metric, quantization],
+    )
+    space = EmbeddingSpace.from_row(
+        (cursor.lastrowid, model, target, dimension, distance_metric, quantization, 0, 0, 1)
+    )
+    create_vec_table(cursor, space)
+    cursor.execute(
+        f"""
+        CREATE TABLE {space.mapping_table}(
+            item_id INTEGER PRIMARY KEY,
+            vec_rowid INTEGER NOT NULL UNIQUE,
+            FOREIGN KEY (item_id) REFERENCES {TARGET_TABLES[target]}(id) ON DELETE CASCADE
+        )
+        """
+    )
+    if space.quantized:
+        cursor.execute(
+            f"""
+            CREATE TABLE {space.full_table}(
+                vec_rowid INTEGER PRIMARY KEY,
+                embedding BLOB NOT NULL --float32 vector
+            )
+            """
+        )
+    return space
+
+
+def create_vec_table(cursor: Cursor, space: EmbeddingSpace) -> None:
+    """
+    Create a space's vec0 table. Partitioned spaces store each vector with
+    the PDF it came from as a partition key, and that PDF's collection as
+    metadata, so that searches filtered by them only scan matching vectors.
+    """
+    if space.quantization == "bit":
+        # binary vectors are always compared by hamming distance
+        column = f"embedding bit[{space.dimension}]"
+    elif space.quantization == "int8":
+        column = f"embedding int8[{space.dimension}] distance_metric={space.distance_metric}"
+    else:
+        column = f"embedding float[{space.dimension}] distance_metric={space.distance_metric}"
+    if space.partitioned:
+        column = (
+            f"pdf_id integer partition key, collection text, {column}, "
+            f"chunk_size={PARTITION_CHUNK_SIZE}"
+        )
+    cursor.execute(f"CREATE VIRTUAL TABLE {space.vec_table} USING vec0({column})")
+
+
+def partition_sql(space: EmbeddingSpace, item: str) -> str:
+    """The pdf_id and collection columns of an item, as SQL expressions"""
+    pdf_id = ITEM_PDF_SQL[space.target].format(item=item)
+    return f"{pdf_id}, COALESCE((SELECT collection FROM pdfs WHERE id = {pdf_id}), '')"
+
+
+def item_pdf(cursor: Cursor | Connection, space: EmbeddingSpace, item_id: int) -> int | None:
+    """The PDF an item belongs to, or None for a figure on no page"""
+    return cursor.execute(
+        f"SELECT {ITEM_PDF_SQL[space.target].format(item='?')}", [item_id]
+    ).fetchone()[0]
+
+
+def adopt_legacy_embeddings(
+        cursor: Cursor,
+        model: str,
+        quantization: str | None = None,
+) -> EmbeddingSpace:
+    """
+    Move the legacy section embeddings into a new section space for the
+    model that made them, which only the user can say
+
+    Raises:
+        ValueError: if the database has no legacy embeddings, or already
+            has section embeddings for the model
+    """
+    dimension = legacy_dimension(cursor)
+    if dimension is None:
+        raise ValueError("the database has no legacy section embeddings")
+    if get_space(cursor, model) is not None:
+        raise ValueError(
+            f"the database already has section embeddings for {model}, so the "
+            "legacy embeddings can't be added to them"
+        )
+    space = get_or_create_space(cursor, model, dimension, quantization=quantization)
+    # only mapped vectors are copied: re-ingests used to leave the previous
+    # vector behind whenever a section was embedded again
+    cursor.execute(
+        f"""
+        INSERT INTO {space.vec_table} (rowid, embedding, pdf_id, collection)
+        SELECT {LEGACY_VEC_TABLE}.rowid,
+               {space.vector_sql(f"{LEGACY_VEC_TABLE}.embedding")},
+               {partition_sql(space, f"{LEGACY_MAPPING_TABLE}.section_id")}
+        FROM {LEGACY_MAPPING_TABLE}
+        JOIN {LEGACY_VEC_TABLE} ON {LEGACY_VEC_TABLE}.rowid = {LEGACY_MAPPING_TABLE}.vec_rowid
+        """
+    )
+    if space.quantized:
+        cursor.execute(
+            f"""
+            INSERT INTO {space.full_table} (vec_rowid, embedding)
+            SELECT {LEGACY_VEC_TABLE}.rowid, {LEGACY_VEC_TABLE}.embedding
+            FROM {LEGACY_MAPPING_TABLE}
+            JOIN {LEGACY_VEC_TABLE} ON {LEGACY_VEC_TABLE}.rowid = {LEGACY_MAPPING_TABLE}.vec_rowid
+            """
+        )
+    cursor.execute(
+        f"INSERT INTO {space.mapping_table} (item_id, vec_rowid) "
+        f"SELECT section_id, vec_rowid FROM {LEGACY_MAPPING_TABLE}"
+    )
+    cursor.execute(f"DROP TABLE {LEGACY_MAPPING_TABLE}")
+    cursor.execute(f"DROP TABLE {LEGACY_VEC_TABLE}")
+    return space
+
+
+def store_embedding(
+        cursor: Cursor,
+        space: EmbeddingSpace,
+        item_id: int,
+        embedding: np.ndarray,
+) -> int:
+    """
+    Store or replace the embedding of one item in a space
+
+    Returns:
+        The rowid of the vector in the space's vec0 table
+    """
+    vector = np.asarray(embedding, dtype=np.float32)
+    if vector.shape != (space.dimension,):
+        raise ValueError(
+            f"expected a {space.dimension}-dimensional embedding, got shape {vector.shape}"
+        )
+
+    if space.partitioned:
+        if item_pdf(cursor, space, item_id) is None:
+            raise ValueError(
+                f"{space.target} {item_id} belongs to no PDF, so its embedding "
+                "couldn't be found by PDF or collection"
+            )
+        columns, values = ", pdf_id, collection", f", {partition_sql(space, '?')}"
+        # the item is looked up once for each column
+        parameters = [item_id, item_id]
+    else:
+        columns, values, parameters = "", "", []
+
+    row = cursor.execute(
+        f"SELECT vec_rowid FROM {space.mapping_table} WHERE {space.mapping_key} = ?",
+        [item_id],
+    ).fetchone()
+    if row is not None:
+        vec_rowid = row[0]
+        if space.quantized:
+            # vec0 can't update int8 or bit columns in place, so the row is
+            # replaced under the same rowid
+            cursor.execute(f"DELETE FROM {space.vec_table} WHERE rowid = ?", [vec_rowid])
+            cursor.execute(
+                f"INSERT INTO {space.vec_table} (rowid, embedding{columns}) "
+                f"VALUES (?, {space.vector_sql()}{values})",
+                [vec_rowid, vector, *parameters],
+            )
+        elif space.partitioned:
+            # an item never moves to another PDF, and vec0 can't update
+            # partition keys, so only the collection is refreshed
+            cursor.execute(
+                f"UPDATE {space.vec_table} SET embedding = ?, collection = "
+                f"COALESCE((SELECT collection FROM pdfs WHERE id = "
+                f"{ITEM_PDF_SQL[space.target].format(item='?')}), '') WHERE rowid = ?",
+                [vector, item_id, vec_rowid],
+            )
+        else:
+            cursor.execute(
+                f"UPDATE {space.vec_table} SET embedding = ? WHERE rowid = ?",
+                [vector, vec_rowid],
+            )
+    else:
+        cursor.execute(
+            f"INSERT INTO {space.vec_table} (embedding{columns}) "
+            f"VALUES ({space.vector_sql()}{values})",
+            [vector, *parameters],
+        )
+        vec_rowid = cursor.lastrowid
+        cursor.execute(
+            f"INSERT INTO {space.mapping_table} ({space.mapping_key}, vec_rowid) VALUES (?, ?)",
+            [item_id, vec_rowid],
+        )
+    if space.quantized:
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {space.full_table} (vec_rowid, embedding) VALUES (?, ?)",
+            [vec_rowid, vector.tobytes()],
+        )
+    if space.ivf_lists:
+        add_posting(cursor, space, vec_rowid, vector)
+    return vec_rowid
+
+
+def add_posting(cursor: Cursor, space: EmbeddingSpace, vec_rowid: int, vector: np.ndarray) -> None:
+    """File a vector under its nearest centroid in the space's IVF index"""
+    centroid = cursor.execute(
+        f"SELECT rowid FROM {space.centroid_table} WHERE embedding MATCH ? AND k = 1",
+        [vector],
+    ).fetchone()
+    # postings hold vectors in the vec0 table's storage format
+    cursor.execute(
+        f"INSERT OR REPLACE INTO {space.postings_table} (centroid_id, vec_rowid, embedding) "
+        f"VALUES (?, ?, {space.vector_sql()})",
+        [centroid[0], vec_rowid, vector],
+    )
+
+
+def delete_embeddings(cursor: Cursor, space: EmbeddingSpace, item_ids: list[int]) -> None:
+    """Remove the embeddings of items from a space"""
+    for item_id in item_ids:
+        row = cursor.execute(
+            f"SELECT vec_rowid FROM {space.mapping_table} WHERE {space.mapping_key} = ?",
+            [item_id],
+        ).fetchone()
+        if row is None:
+            continue
+        cursor.execute(f"DELETE FROM {space.vec_table} WHERE rowid = ?", [row[0]])
+        if space.quantized:
+            cursor.execute(f"DELETE FROM {space.full_table} WHERE vec_rowid = ?", [row[0]])
+        if space.ivf_lists:
+            cursor.execute(f"DELETE FROM {space.postings_table} WHERE vec_rowid = ?", [row[0]])
+        cursor.execute(
+            f"DELETE FROM {space.mapping_table} WHERE {space.mapping_key} = ?",
+            [item_id],
+        )
+
+
+def rebuild_vec_table(cursor: Cursor, space: EmbeddingSpace) -> None:
+    """
+    Recreate the vec0 table of a space from its mapped vectors
+
+    vec0 never gives back the storage of deleted rows, so this reclaims it,
+    and drops any vector that no item maps to. Vectors keep their rowids, so
+    the mapping table and any IVF index stay valid. Quantized vectors are
+    re-derived from their full-precision copies.
+    """
+    if space.quantized:
+        source, key = space.full_table, "vec_rowid"
+    else:
+        source, key = space.vec_table, "rowid"
+    cursor.execute("DROP TABLE IF EXISTS temp.rebuilt_vectors")
+    cursor.execute(
+        f"""
+        CREATE TEMP TABLE rebuilt_vectors AS
+        SELECT {space.mapping_table}.{space.mapping_key} AS item_id,
+               {space.mapping_table}.vec_rowid,
+               {source}.embedding
+        FROM {space.mapping_table}
+        JOIN {source} ON {source}.{key} = {space.mapping_table}.vec_rowid
+        """
+    )
+    cursor.execute(f"DROP TABLE {space.vec_table}")
+    create_vec_table(cursor, space)
+    if space.partitioned:
+        # only orphans, like figures on no page, belong to no PDF, and a
+        # NULL partition key would hide them from filtered searches
+        unowned = [
+            item_id
+            for (item_id,) in cursor.execute(
+                "SELECT item_id FROM temp.rebuilt_vectors WHERE "
+                f"{ITEM_PDF_SQL[space.target].format(item='item_id')} IS NULL"
+            ).fetchall()
+        ]
+        delete_embeddings(cursor, space, unowned)
+        cursor.execute(
+            "DELETE FROM temp.rebuilt_vectors WHERE item_id NOT IN "
+            f"(SELECT {space.mapping_key} FROM {space.mapping_table})"
+        )
+        columns, values = ", pdf_id, collection", f", {partition_sql(space, 'item_id')}"
+    else:
+        columns, values = "", ""
+    cursor.execute(
+        f"""
+        INSERT INTO {space.vec_table} (rowid, embedding{columns})
+        SELECT vec_rowid, {space.vector_sql("embedding")}{values}
+        FROM temp.rebuilt_vectors
+        """
+    )
+    cursor.execute("DROP TABLE temp.rebuilt_vectors")
+
+
+def partition_space(cursor: Cursor, space: EmbeddingSpace) -> EmbeddingSpace:
+    """
+    Rebuild the vec0 table of a space created before spaces were partitioned,
+    so that its vectors can be searched by PDF and collection
+    """
+    if space.partitioned:
+        return space
+    space = replace(space, partitioned=True)
+    rebuild_vec_table(cursor, space)
+    cursor.execute("UPDATE embedding_spaces SET partitioned = 1 WHERE id = ?", [space.id])
+    return space
+
+
+def unpartitioned_spaces(cursor: Cursor | Connection) -> list[EmbeddingSpace]:
+    return [space for space in list_spaces(cursor) if not space.partitioned]
+
+
+def backfill_partitions(
+        cursor: Cursor,
+        batch_size: int = 1000,
+        on_progress: Callable[[str, int, int], None] | None = None,
+) -> int:
+    """
+    Partition the spaces created before spaces were partitioned, one space
+    per transaction, since a vec0 table is rebuilt whole
+
+    Returns:
+        Number of vectors partitioned
+    """
+    spaces = unpartitioned_spaces(cursor)
+    partitioned = 0
+    for index, space in enumerate(spaces, start=1):
+        partition_space(cursor, space)
+        partitioned += cursor.execute(f"SELECT COUNT(*) FROM {space.mapping_table}").fetchone()[0]
+        cursor.connection.commit()
+        if on_progress:
+            on_progress("embedding partitions", index, len(spaces))
+    return partitioned
+
+
+def set_collection(cursor: Cursor, pdf_id: int, collection: str | None) -> None:
+    """Move a PDF to another collection, or to none"""
+    cursor.execute("UPDATE pdfs SET collection = ? WHERE id = ?", [collection, pdf_id])
+    for space in list_spaces(cursor):
+        if not space.partitioned:
+            continue
+        cursor.executemany(
+            f"UPDATE {space.vec_table} SET collection = ? WHERE rowid = ?",
+            [
+                (collection or "", vec_rowid)
+                for (vec_rowid,) in cursor.execute(
+                    f"SELECT vec_rowid FROM {space.mapping_table} WHERE "
+                    f"{ITEM_PDF_SQL[space.target].format(item=space.mapping_key)} = ?",
+                    [pdf_id],
+                ).fetchall()
+            ],
+        )
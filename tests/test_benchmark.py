@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import argparse
+
+from rich.console import Console
+
+from pdf2sqlite.benchmark import bench_ivf, bench_quantization, bench_search
+
+
+def test_search_benchmark_runs_at_small_scale():
+    console = Console(record=True, width=120)
+    args = argparse.Namespace(sections=60, queries=5, seed=0)
+
+    met = bench_search(args, console)
+
+    output = console.export_text()
+    assert isinstance(met, bool)
+    for path in ("keyword", "vector", "hybrid"):
+        assert path in output
+
+
+def test_quantization_benchmark_reports_recall():
+    console = Console(record=True, width=120)
+    args = argparse.Namespace(sections=60, queries=5, seed=0)
+
+    bench_quantization(args, console)
+
+    output = console.export_text()
+    for storage in ("none", "int8", "bit"):
+        assert storage in output
+    assert "recall@10" in output
+
+
+def test_ivf_benchmark_compares_probes_with_exhaustive_search():
+    console = Console(record=True, width=120)
+    args = argparse.Namespace(sections=60, queries=5, seed=0)
+
+    bench_ivf(args, console)
+
+    output = console.export_text()
+    assert "exhaustive" in output
+    assert "default" in output
+
+
+def test_ivf_beats_exhaustive_search_at_default_probes():
+    console = Console(record=True, width=120)
+    args = argparse.Namespace(sections=10_000, queries=20, seed=0)
+
+    assert bench_ivf(args, console), console.export_text()
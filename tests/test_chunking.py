@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import sqlite3
+import types
+
+import numpy as np
+import pytest
+
+from pdf2sqlite import embeddings, search
+from pdf2sqlite.chunking import chunk_section, chunk_spans
+from pdf2sqlite.init_db import init_db
+
+FILLER_PAGE = "alpha beta gamma delta " * 250
+PUMP_PAGE = "pump pressure relief " * 150
+
+
+def test_chunk_spans_overlap_and_break_at_words():
+    text = "one two three four five six seven eight nine ten"
+
+    spans = chunk_spans(text, 20, 8)
+    pieces = [text[start:end] for start, end in spans]
+
+    assert pieces[0] == "one two three four"
+    assert pieces[-1].endswith("ten")
+    assert all(len(piece) <= 20 for piece in pieces)
+    # every chunk after the first repeats the end of the previous one
+    for previous, current in zip(pieces, pieces[1:]):
+        assert current.split()[0] in previous.split()
+    assert chunk_spans("   ", 20, 8) == []
+    with pytest.raises(ValueError):
+        chunk_spans(text, 0, 0)
+
+
+def test_chunk_section_records_pages():
+    section = {
+        "start_page": 3,
+        "text": "first page words\n\nsecond page words\n\n",
+        "page_offsets": [(3, 0), (4, 18)],
+    }
+
+    chunks = chunk_section(section, 16, 0)
+
+    assert [(chunk.text, chunk.start_page, chunk.end_page) for chunk in chunks] == [
+        ("first page words", 3, 3),
+        ("second page", 4, 4),
+        ("words", 4, 4),
+    ]
+
+
+def fake_embedding(model, input):
+    vectors = [
+        [text.count("pump"), text.count("alpha"), text.count("wire"), 0.01]
+        for text in input
+    ]
+    return types.SimpleNamespace(
+        data=[types.SimpleNamespace(embedding=vector) for vector in vectors]
+    )
+
+
+def ingest(cursor, hydraulics_text):
+    sections = {
+        "1_Hydraulics_3": {
+            "title": "Hydraulics",
+            "start_page": 3,
+            "text": hydraulics_text,
+            "page_offsets": [(3, 0), (4, len(FILLER_PAGE))],
+        },
+        "1_Electrical_5": {
+            "title": "Electrical",
+            "start_page": 5,
+            "text": "wire harness",
+            "page_offsets": [(5, 0)],
+        },
+    }
+    embeddings.process_pdf_for_semantic_search(
+        {"sections": sections}, cursor, 1, model_name="chunk-model", n_clusters=2
+    )
+
+
+def test_long_sections_are_searchable_by_chunk(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings.litellm, "embedding", fake_embedding)
+    monkeypatch.setattr(embeddings, "count_tokens", lambda text, model: len(text) // 4 + 1)
+    path = tmp_path / "chunks.db"
+    db = sqlite3.connect(path)
+    cursor = db.cursor()
+    init_db(cursor)
+    cursor.execute("INSERT INTO pdfs (id, title) VALUES (1, 'Manual')")
+    cursor.execute("INSERT INTO pdf_sections (id, start_page, title, pdf_id) VALUES (1, 3, 'Hydraulics', 1)")
+    cursor.execute("INSERT INTO pdf_sections (id, start_page, title, pdf_id) VALUES (2, 5, 'Electrical', 1)")
+
+    ingest(cursor, FILLER_PAGE + PUMP_PAGE)
+    db.commit()
+
+    chunks = cursor.execute(
+        "SELECT section_id, chunk_index, start_page, end_page FROM section_chunks ORDER BY id"
+    ).fetchall()
+    hydraulics = [chunk for chunk in chunks if chunk[0] == 1]
+    assert len(hydraulics) > 3
+    assert [chunk[1] for chunk in hydraulics] == list(range(len(hydraulics)))
+    assert hydraulics[0][2:] == (3, 3)
+    assert hydraulics[-1][2:] == (4, 4)
+    # short sections are no longer dropped
+    assert [chunk[1:] for chunk in chunks if chunk[0] == 2] == [(0, 5, 5)]
+
+    conn = search.connect(path)
+    space = search.search_space(conn, "chunk-model")
+    assert space.target == "chunk"
+    rows = search.semantic_search(conn, space, np.array([1.0, 0, 0, 0]), 2)
+    assert [row["title"] for row in rows] == ["Hydraulics", "Electrical"]
+    assert rows[0]["match_page"] == 4
+    assert rows[0]["start_page"] == 3
+    conn.close()
+
+    # re-ingesting shorter text drops the surplus chunks and their vectors
+    ingest(cursor, PUMP_PAGE)
+    counts = cursor.execute(
+        f"SELECT (SELECT COUNT(*) FROM section_chunks), "
+        f"(SELECT COUNT(*) FROM {space.vec_table}), "
+        f"(SELECT COUNT(*) FROM {space.mapping_table})"
+    ).fetchone()
+    assert counts[0] < len(chunks)
+    assert counts == (counts[0],) * 3
@@ -1,13 +1,12 @@
 from __future__ import annotations
 
+import time
+import types
+
 import numpy as np
 
-from pdf2sqlite.embeddings import (
-    clean_text,
-    extract_keywords,
-    generate_topic_name,
-    cluster_texts,
-)
+from pdf2sqlite import embeddings
+from pdf2sqlite.embeddings import clean_text
 
 
 def test_clean_text_normalizes_whitespace_and_punctuation():
@@ -22,47 +21,32 @@ def test_clean_text_normalizes_whitespace_and_punctuation():
     assert "$" not in result
 
 
-def test_extract_keywords_filters_stop_words():
-    text = "alpha alpha beta gamma gamma gamma the and to"
-
-    keywords = extract_keywords(text, max_keywords=3)
-
-    assert keywords == ["gamma", "alpha", "beta"]
-
-
-def test_generate_topic_name_prefers_frequent_keywords():
-    texts = [
-        "engine turbine airflow cooling system efficiency",
-        "engine turbine airflow metrics",
-    ]
-
-    topic_name = generate_topic_name(texts)
-
-    assert topic_name == "Engine & Turbine - Airflow"
+def test_pack_batches_fills_requests_up_to_limits():
+    limits = embeddings.EmbeddingLimits(max_item_tokens=10, max_batch_tokens=10, max_batch_items=3)
 
+    batches = embeddings.pack_batches([4, 4, 4, 1, 1, 1, 1, 10], limits)
 
-def test_cluster_texts_handles_single_sample():
-    embeddings = [np.array([0.0, 0.0], dtype=np.float32)]
-    texts = ["lorem ipsum"]
+    assert batches == [[0, 1], [2, 3, 4], [5, 6], [7]]
 
-    labels, info = cluster_texts(embeddings, texts, n_clusters=3)
 
-    assert labels == [0]
-    assert info == {0: {"size": 1, "name": "All Content"}}
+def test_request_embeddings_truncates_and_keeps_order(monkeypatch):
+    requests: list[list[str]] = []
 
+    def embedding(model, input):
+        requests.append(list(input))
+        # answer later batches first to exercise reassembly
+        time.sleep(0.02 if input[0].startswith("a") else 0)
+        return types.SimpleNamespace(
+            data=[types.SimpleNamespace(embedding=[float(len(text))]) for text in input]
+        )
 
-def test_cluster_texts_limits_clusters_to_sample_count():
-    embeddings = [
-        np.array([0.0, 0.0], dtype=np.float32),
-        np.array([10.0, 10.0], dtype=np.float32),
-    ]
-    texts = [
-        "alpha beta gamma",
-        "delta epsilon zeta",
-    ]
+    monkeypatch.setattr(embeddings.litellm, "embedding", embedding, raising=False)
+    monkeypatch.setattr(embeddings, "count_tokens", lambda text, model: len(text) // 4 + 1)
+    limits = embeddings.EmbeddingLimits(max_item_tokens=5, max_batch_tokens=8, max_batch_items=4)
+    texts = ["a" * 12, "b" * 40, "c" * 4, "d" * 4]
 
-    labels, info = cluster_texts(embeddings, texts, n_clusters=5)
+    vectors = embeddings.request_embeddings(texts, "model-a", limits, concurrency=3)
 
-    assert sorted(set(labels)) == [0, 1]
-    assert set(info.keys()) == {0, 1}
-    assert all(details["size"] == 1 for details in info.values())
+    # the 40 character text is cut to fit five estimated tokens
+    assert [vector[0] for vector in vectors] == [12.0, 17.0, 4.0, 4.0]
+    assert sorted(requests) == [["a" * 12], ["b" * 17, "c" * 4], ["d" * 4]]
@@ -48,6 +48,7 @@ def test_extract_sections_uses_page_fallback_when_outline_missing():
     assert (
         result["sections"]["page_3"]["text"].strip() == "Third page contents"
     )
+    assert result["sections"]["page_3"]["page_offsets"] == [(2, 0)]
     assert any(
         "Using page-based sections" in message
         for message in live.console.messages
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from pdf2sqlite.fts import backfill_fts, ensure_fts, optimize_fts, pending_backfill
+from pdf2sqlite.init_db import create_statement, init_db
+
+
+def make_db(tmp_path, with_fts: bool = True) -> sqlite3.Connection:
+    db = sqlite3.connect(tmp_path / "fts.db")
+    if with_fts:
+        init_db(db.cursor())
+    else:
+        db.enable_load_extension(True)
+        import sqlite_vec
+
+        sqlite_vec.load(db)
+        db.executescript(create_statement)
+    return db
+
+
+def insert_page(db: sqlite3.Connection, page_number: int, text: str) -> int:
+    cursor = db.execute(
+        "INSERT INTO pdf_pages (page_number, text, pdf_id) VALUES (?,?,1)",
+        [page_number, text],
+    )
+    return cursor.lastrowid
+
+
+def match_pages(db: sqlite3.Connection, query: str) -> list[int]:
+    rows = db.execute(
+        "SELECT rowid FROM pdf_pages_fts WHERE pdf_pages_fts MATCH ? ORDER BY rowid",
+        [query],
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def test_triggers_keep_page_index_in_sync(tmp_path):
+    db = make_db(tmp_path)
+    db.execute("INSERT INTO pdfs (id, title) VALUES (1, 'doc')")
+    first = insert_page(db, 1, "hydraulic pump assembly")
+    second = insert_page(db, 2, "electrical wiring harness")
+
+    assert match_pages(db, "pump") == [first]
+    assert match_pages(db, "wiring") == [second]
+
+    db.execute("UPDATE pdf_pages SET gist = 'pumps and valves' WHERE id = ?", [second])
+    assert match_pages(db, "pump") == [first, second]
+
+    db.execute("DELETE FROM pdf_pages WHERE id = ?", [first])
+    assert match_pages(db, "pump") == [second]
+    assert match_pages(db, "hydraulic") == []
+
+
+def test_asset_indexes_cover_descriptions_and_tables(tmp_path):
+    db = make_db(tmp_path)
+    db.execute(
+        "INSERT INTO pdf_figures (id, mime_type, description) "
+        "VALUES (1, 'image/png', 'wiring diagram for the starter')"
+    )
+    db.execute(
+        "INSERT INTO pdf_tables (id, text, caption_above, pdf_id, page_number, ymin, xmin) "
+        "VALUES (1, '| part | P/N-4471 |', 'Torque values', 1, 1, 0, 0)"
+    )
+
+    figures = db.execute(
+        "SELECT rowid FROM pdf_figures_fts WHERE pdf_figures_fts MATCH 'diagram'"
+    ).fetchall()
+    tables = db.execute(
+        "SELECT rowid FROM pdf_tables_fts WHERE pdf_tables_fts MATCH 'torque'"
+    ).fetchall()
+
+    assert figures == [(1,)]
+    assert tables == [(1,)]
+
+
+def test_backfill_indexes_existing_rows_in_batches(tmp_path):
+    db = make_db(tmp_path, with_fts=False)
+    db.execute("INSERT INTO pdfs (id, title) VALUES (1, 'doc')")
+    ids = [insert_page(db, n, f"legacy page {n} gearbox") for n in range(1, 6)]
+    db.commit()
+
+    cursor = db.cursor()
+    ensure_fts(cursor)
+    assert pending_backfill(cursor) == {"pdf_pages_fts": ids[-1]}
+
+    # writes during the backfill window must not corrupt the index
+    db.execute("UPDATE pdf_pages SET gist = 'updated gearbox' WHERE id = ?", [ids[0]])
+    db.execute("DELETE FROM pdf_pages WHERE id = ?", [ids[1]])
+    fresh = insert_page(db, 6, "new page gearbox")
+    db.commit()
+
+    progress: list[int] = []
+    indexed = backfill_fts(cursor, 2, lambda name, last, target: progress.append(last))
+
+    assert indexed == 4
+    assert progress[-1] == ids[-1]
+    assert len(progress) == 2
+    assert pending_backfill(cursor) == {}
+    assert match_pages(db, "gearbox") == [ids[0], *ids[2:], fresh]
+    assert match_pages(db, "updated") == [ids[0]]
+
+    optimize_fts(cursor)
+    db.execute("INSERT INTO pdf_pages_fts (pdf_pages_fts) VALUES ('integrity-check')")
+
+
+def test_backfill_rejects_bad_batch_size(tmp_path):
+    db = make_db(tmp_path)
+
+    with pytest.raises(ValueError):
+        backfill_fts(db.cursor(), 0)
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import sqlite3
+
+import numpy as np
+import pytest
+import sqlite_vec
+
+from pdf2sqlite import ivf, search
+from pdf2sqlite.benchmark import build_synthetic_db
+from pdf2sqlite.ivf import build_ivf, drop_ivf, has_vec0_chunks, restore_posting_vectors, scan_vectors
+from pdf2sqlite.vector_store import (
+    delete_embeddings,
+    get_or_create_space,
+    get_space,
+    store_embedding,
+)
+
+
+@pytest.fixture
+def synthetic(tmp_path):
+    path = tmp_path / "ivf.db"
+    vectors = build_synthetic_db(path, 300, dimension=16, topics=10)
+    db = sqlite3.connect(path)
+    db.enable_load_extension(True)
+    sqlite_vec.load(db)
+    return db.cursor(), vectors
+
+
+def nearest_ids(cursor, space, query, probes=None):
+    rows = search.semantic_search(cursor.connection, space, query, 10, probes)
+    return [row["id"] for row in rows]
+
+
+def test_ivf_search_with_every_list_matches_exhaustive_search(synthetic):
+    cursor, vectors = synthetic
+    space = get_space(cursor, "synthetic")
+
+    indexed = build_ivf(cursor, space, lists=10, probes=2)
+
+    assert get_space(cursor, "synthetic") == indexed
+    postings = cursor.execute(f"SELECT COUNT(*) FROM {indexed.postings_table}").fetchone()
+    assert postings == (300,)
+    columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({indexed.postings_table})")]
+    assert columns == ["centroid_id", "vec_rowid", "embedding"]
+    for query in vectors[:5]:
+        assert nearest_ids(cursor, indexed, query, probes=10) == nearest_ids(cursor, space, query)
+        # the nearest section is in the list nearest the query
+        assert nearest_ids(cursor, indexed, query)[0] == nearest_ids(cursor, space, query)[0]
+
+    assert drop_ivf(cursor, indexed) == space
+    assert get_space(cursor, "synthetic") == space
+
+
+def test_ivf_postings_follow_stores_and_deletes(synthetic):
+    cursor, vectors = synthetic
+    indexed = build_ivf(cursor, get_space(cursor, "synthetic"), lists=5)
+
+    store_embedding(cursor, indexed, 1, vectors[7])
+    assert nearest_ids(cursor, indexed, vectors[7], probes=5)[:2] in ([1, 8], [8, 1])
+    delete_embeddings(cursor, indexed, [8])
+    assert 8 not in nearest_ids(cursor, indexed, vectors[7], probes=5)
+    postings = cursor.execute(f"SELECT COUNT(*) FROM {indexed.postings_table}").fetchone()
+    assert postings == (299,)
+
+
+@pytest.mark.parametrize("layout", ["known", "changed"])
+def test_chunk_scan_matches_vec0(synthetic, monkeypatch, layout):
+    cursor, _ = synthetic
+    space = get_space(cursor, "synthetic")
+    delete_embeddings(cursor, space, [3, 150])
+    if layout == "changed":
+        # a sqlite-vec that stores its chunks differently is scanned through vec0
+        monkeypatch.setitem(ivf.VEC0_CHUNK_COLUMNS, "chunks", {"chunk_id", "offsets"})
+    assert has_vec0_chunks(cursor, space) == (layout == "known")
+
+    scanned = {
+        rowid: vector
+        for rowids, matrix in scan_vectors(cursor, space, 100)
+        for rowid, vector in zip(rowids, matrix)
+    }
+    stored = cursor.execute(f"SELECT rowid, embedding FROM {space.vec_table}").fetchall()
+
+    assert sorted(scanned) == sorted(rowid for rowid, _ in stored)
+    for rowid, blob in stored:
+        assert np.array_equal(scanned[rowid], np.frombuffer(blob, dtype=np.float32))
+
+
+def test_postings_without_vectors_are_refiled(synthetic):
+    cursor, vectors = synthetic
+    indexed = build_ivf(cursor, get_space(cursor, "synthetic"), lists=5)
+    expected = nearest_ids(cursor, indexed, vectors[9])
+    filed = cursor.execute(
+        f"SELECT centroid_id, vec_rowid FROM {indexed.postings_table} ORDER BY vec_rowid"
+    ).fetchall()
+    # indexes were briefly built with only the rowids of their vectors
+    cursor.executescript(
+        f"""
+        CREATE TABLE old AS SELECT centroid_id, vec_rowid FROM {indexed.postings_table};
+        DROP TABLE {indexed.postings_table};
+        ALTER TABLE old RENAME TO {indexed.postings_table};
+        """
+    )
+
+    restore_posting_vectors(cursor)
+
+    columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({indexed.postings_table})")]
+    assert columns == ["centroid_id", "vec_rowid", "embedding"]
+    assert cursor.execute(
+        f"SELECT centroid_id, vec_rowid FROM {indexed.postings_table} ORDER BY vec_rowid"
+    ).fetchall() == filed
+    assert nearest_ids(cursor, indexed, vectors[9]) == expected
+
+
+def test_ivf_over_quantized_space(synthetic):
+    cursor, vectors = synthetic
+    space = get_or_create_space(cursor, "synthetic-bit", 16, quantization="bit")
+    for section_id, vector in enumerate(vectors, start=1):
+        store_embedding(cursor, space, section_id, vector)
+
+    indexed = build_ivf(cursor, space, lists=10)
+
+    rows = search.semantic_search(cursor.connection, indexed, vectors[42], 3, probes=10)
+    assert rows[0]["id"] == 43
+    assert rows[0]["distance"] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_build_ivf_validates(synthetic):
+    cursor, _ = synthetic
+    space = get_space(cursor, "synthetic")
+    empty = get_or_create_space(cursor, "unused", 16)
+
+    with pytest.raises(ValueError, match="no embeddings"):
+        build_ivf(cursor, empty)
+    with pytest.raises(ValueError, match="lists"):
+        build_ivf(cursor, space, lists=301)
+    with pytest.raises(ValueError, match="probes"):
+        build_ivf(cursor, space, lists=4, probes=5)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+from pdf2sqlite.embeddings import store_section_keywords
+from pdf2sqlite.init_db import init_db
+from pdf2sqlite.keywords import (
+    batch_idf,
+    class_keywords,
+    count_terms,
+    counted_sections,
+    keywords_name,
+    section_keywords,
+)
+
+
+@pytest.fixture
+def cursor(tmp_path):
+    db = sqlite3.connect(tmp_path / "keywords.db")
+    cursor = db.cursor()
+    init_db(cursor)
+    return cursor
+
+
+def frequency(cursor, term):
+    row = cursor.execute(
+        "SELECT sections FROM term_document_frequency WHERE term = ?", [term]
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def test_count_terms_builds_a_sparse_count_matrix():
+    # stop words, and words shorter than three letters, aren't terms
+    matrix, terms = count_terms(["Pump the pump", "valve and pump to it", ""])
+
+    assert terms == ["pump", "valve"]
+    assert matrix.toarray().tolist() == [[2, 0], [1, 1], [0, 0]]
+
+
+def test_section_keywords_discount_boilerplate_and_persist_frequencies(cursor):
+    subjects = ["hydraulic", "wiring", "brakes", "fuel", "landing",
+                "cabin", "avionics", "engine", "propeller", "lighting"]
+    texts = [f"manual manual manual revision {subject}" for subject in subjects]
+    section_ids = list(range(1, len(texts) + 1))
+
+    keywords = section_keywords(cursor, section_ids, *count_terms(texts), count=2)
+
+    # raw counts would put "manual" first everywhere
+    assert [words[0] for words in keywords] == subjects
+    assert frequency(cursor, "manual") == 10
+    assert frequency(cursor, "wiring") == 1
+
+    for section_id, words in zip(section_ids, keywords):
+        store_section_keywords(cursor, section_id, words)
+    # re-ingested sections aren't counted again, new ones are
+    section_keywords(cursor, [1, 11], *count_terms([texts[0], "manual wiring"]))
+    assert frequency(cursor, "manual") == 11
+    assert frequency(cursor, "hydraulic") == 1
+    assert frequency(cursor, "wiring") == 2
+
+
+def test_sections_keyworded_before_frequencies_are_not_counted(cursor):
+    # keywords stored before document frequencies were kept
+    store_section_keywords(cursor, 1, ["pump"])
+
+    section_keywords(cursor, [2], *count_terms(["pump valve"]))
+    assert counted_sections(cursor) == 1
+
+    # once the old section is ingested again, its terms are counted too
+    section_keywords(cursor, [1], *count_terms(["pump"]))
+    assert counted_sections(cursor) == 2
+    assert frequency(cursor, "pump") == 2
+
+
+def test_class_keywords_pool_each_class():
+    texts = [
+        "engine turbine airflow",
+        "engine turbine cooling",
+        "engine cabin seating",
+        "engine oil",
+        "engine mount",
+        "engine start",
+    ]
+    matrix, terms = count_terms(texts)
+    classes = ["jet", "jet", "cabin", "other", "other", "other"]
+
+    labels = class_keywords(matrix, classes, terms, batch_idf(matrix), count=2)
+
+    # "engine" is the most frequent term of every class, but is everywhere
+    assert labels["jet"] == ["turbine", "airflow"]
+    assert labels["cabin"] == ["cabin", "seating"]
+    assert np.all(batch_idf(matrix) >= 1.0)
+
+
+def test_keywords_name_titles_the_top_keywords():
+    assert keywords_name(["engine", "turbine", "airflow", "cooling"]) == "Engine & Turbine - Airflow"
+    assert keywords_name(["engine", "turbine"]) == "Engine & Turbine"
+    assert keywords_name([]) == "Miscellaneous"
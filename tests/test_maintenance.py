@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+from pdf2sqlite.init_db import init_db
+from pdf2sqlite.maintenance import database_bytes, maintain
+from pdf2sqlite.topics import update_topics
+from pdf2sqlite.vector_store import get_or_create_space, store_embedding
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = sqlite3.connect(tmp_path / "maintain.db")
+    cursor = db.cursor()
+    init_db(cursor)
+    for pdf_id in (1, 2):
+        cursor.execute("INSERT INTO pdfs (id, title) VALUES (?, ?)", [pdf_id, f"doc {pdf_id}"])
+        cursor.execute(
+            "INSERT INTO pdf_pages (id, page_number, text, data, pdf_id) VALUES (?, 1, 'text', ?, ?)",
+            [pdf_id, b"%" * 20_000, pdf_id],
+        )
+        cursor.execute("INSERT INTO pdf_to_page (pdf_id, page_id) VALUES (?, ?)", [pdf_id, pdf_id])
+        cursor.execute(
+            "INSERT INTO pdf_figures (id, mime_type, data) VALUES (?, 'image/png', ?)",
+            [pdf_id, b"\x89" * 20_000],
+        )
+        cursor.execute("INSERT INTO page_to_figure (page_id, figure_id) VALUES (?, ?)", [pdf_id, pdf_id])
+        cursor.execute(
+            "INSERT INTO pdf_sections (id, start_page, title, pdf_id) VALUES (?, 1, 'intro', ?)",
+            [pdf_id, pdf_id],
+        )
+        cursor.execute(
+            "INSERT INTO section_keywords (section_id, keywords) VALUES (?, 'intro')", [pdf_id]
+        )
+    db.commit()
+    return db
+
+
+def test_maintain_removes_orphans_of_deleted_pdfs(db):
+    cursor = db.cursor()
+    space = get_or_create_space(cursor, "model-a", 4)
+    for section_id in (1, 2):
+        store_embedding(cursor, space, section_id, np.full(4, section_id))
+    # a vector nothing maps to, as re-ingests used to leave behind
+    cursor.execute(
+        f"INSERT INTO {space.vec_table} (embedding, pdf_id, collection) VALUES (?, 1, '')",
+        [np.ones(4, dtype=np.float32)],
+    )
+    cursor.execute("DELETE FROM pdfs WHERE id = 2")
+    db.commit()
+
+    report = maintain(db)
+
+    assert report.rows == {
+        "pdf_pages": 1,
+        "pdf_sections": 1,
+        "pdf_to_page": 1,
+        "page_to_figure": 1,
+        "pdf_figures": 1,
+        "section_keywords": 1,
+    }
+    assert report.vectors == {space.vec_table: 2}
+    assert report.bytes_reclaimed > 0
+    assert db.execute("SELECT id FROM pdf_figures").fetchall() == [(1,)]
+    assert db.execute(f"SELECT item_id FROM {space.mapping_table}").fetchall() == [(1,)]
+    assert db.execute(f"SELECT COUNT(*) FROM {space.vec_table}").fetchone()[0] == 1
+    assert db.execute(
+        f"SELECT rowid FROM {space.vec_table} WHERE embedding MATCH ? AND k = 5 AND pdf_id = 1",
+        [np.ones(4, dtype=np.float32)],
+    ).fetchall() == db.execute(f"SELECT vec_rowid FROM {space.mapping_table}").fetchall()
+
+    again = maintain(db, rebuild=False)
+    assert again.rows == {} and again.vectors == {}
+
+
+def test_maintain_sweeps_the_topics_of_deleted_pdfs(db):
+    cursor = db.cursor()
+    update_topics(cursor, "model-a", [1, 2], [np.eye(4)[0], np.eye(4)[1]], n_topics=2)
+    cursor.execute("INSERT INTO topic_terms (topic_id, term, count) SELECT id, 'intro', 1 FROM topics")
+    kept = cursor.execute("SELECT topic_id FROM section_topics WHERE section_id = 1").fetchone()[0]
+    cursor.execute("DELETE FROM pdfs WHERE id = 2")
+    db.commit()
+
+    report = maintain(db)
+
+    assert report.rows["topics"] == 1
+    assert report.rows["topic_centroids"] == 1
+    assert report.rows["topic_terms"] == 1
+    for table in ("topics", "topic_centroids", "topic_terms"):
+        column = "id" if table == "topics" else "topic_id"
+        assert db.execute(f"SELECT {column} FROM {table}").fetchall() == [(kept,)]
+    # the size reported is that of the database as maintain leaves it
+    assert report.bytes_after == database_bytes(db)
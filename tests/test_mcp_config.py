@@ -51,6 +51,15 @@ def test_from_cli_env_overrides(tmp_path, monkeypatch):
     assert cfg.max_limit == 6
 
 
+@pytest.mark.parametrize("budget", ["sql_timeout", "sql_max_rows", "sql_max_bytes"])
+def test_from_cli_rejects_a_zero_sql_budget(tmp_path, budget):
+    db = tmp_path / "t.db"
+    db.write_bytes(b"SQLite format 3\0")
+
+    with pytest.raises(ValueError):
+        ServerConfig.from_cli(str(db), **{budget: 0})
+
+
 def test_from_cli_rejects_missing_database(monkeypatch):
     monkeypatch.delenv("PDF2SQLITE_MCP_DATABASE", raising=False)
     with pytest.raises(ValueError):
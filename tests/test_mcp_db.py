@@ -1,10 +1,19 @@
 from __future__ import annotations
 
+import base64
+import io
+import sqlite3
 from pathlib import Path
 
 import pytest
 
-from pdf2sqlite.mcp_server.db import Database
+from pdf2sqlite.init_db import init_db
+from pdf2sqlite.mcp_server.db import (
+    BlobTooLargeError,
+    Database,
+    NotFoundError,
+    encode_base64_chunks,
+)
 
 
 TEST_DB = Path("tests/test.db").resolve()
@@ -76,8 +85,185 @@ def test_db_page_assets_optional():
         assert isinstance(img, (bytes, bytearray))
 
 
+def test_db_reuses_pooled_connections(tmp_path):
+    path = tmp_path / "pool.db"
+    writer = sqlite3.connect(path)
+    init_db(writer.cursor())
+    writer.execute("INSERT INTO pdfs (id, title) VALUES (1, 'doc')")
+    writer.commit()
+
+    db = Database(path, read_connections=2)
+    try:
+        async def lookups():
+            return await asyncio.gather(*(db.get_pdf_counts(10, 0) for _ in range(20)))
+
+        assert all(rows[0]["title"] == "doc" for rows in asyncio_run(lookups()))
+        assert 1 <= len(db._connections) <= 2
+        first = list(db._connections)
+
+        # pooled connections see rows committed after they were opened
+        writer.execute("INSERT INTO pdfs (id, title) VALUES (2, 'later')")
+        writer.commit()
+        assert len(asyncio_run(db.get_pdf_counts(10, 0))) == 2
+        assert db._connections[: len(first)] == first
+        assert asyncio_run(db.fetch_value("PRAGMA query_only")) == 1
+    finally:
+        db.close()
+        writer.close()
+    assert db._connections == []
+
+
+def test_db_page_assets_bundle_matches_single_lookups(tmp_path):
+    path = tmp_path / "assets.db"
+    writer = sqlite3.connect(path)
+    init_db(writer.cursor())
+    writer.execute("INSERT INTO pdfs (id, title) VALUES (1, 'doc')")
+    writer.execute("INSERT INTO pdf_pages (id, page_number, data, pdf_id) VALUES (1, 1, x'00', 1)")
+    for figure_id in (2, 1):
+        writer.execute(
+            "INSERT INTO pdf_figures (id, mime_type, data) VALUES (?, 'image/png', x'00')",
+            [figure_id],
+        )
+        writer.execute("INSERT INTO page_to_figure (page_id, figure_id) VALUES (1, ?)", [figure_id])
+    writer.commit()
+    writer.close()
+
+    db = Database(path)
+    try:
+        summary, figures, tables = asyncio_run(db.get_page_assets(1))
+
+        assert summary == asyncio_run(db.get_page_summary(1))
+        assert figures == asyncio_run(db.get_figures_for_page(1))
+        assert [figure["id"] for figure in figures] == [1, 2]
+        assert tables == []
+        with pytest.raises(NotFoundError):
+            asyncio_run(db.get_page_assets(99))
+        # the snapshot's read transaction ends with the bundle
+        assert not any(conn.in_transaction for conn in db._connections)
+    finally:
+        db.close()
+
+
+
+def test_db_reads_blob_ranges_incrementally(tmp_path):
+    path = tmp_path / "blobs.db"
+    writer = sqlite3.connect(path)
+    init_db(writer.cursor())
+    figure = bytes(range(256)) * 1000
+    writer.execute("INSERT INTO pdf_figures (id, mime_type, data) VALUES (1, 'image/png', ?)", [figure])
+    writer.execute("INSERT INTO pdf_figures (id, mime_type) VALUES (2, 'image/png')")
+    writer.commit()
+    writer.close()
+
+    db = Database(path)
+    try:
+        assert asyncio_run(db.get_figure_blob(1)) == (figure, "image/png")
+        part = asyncio_run(db.read_blob("figure", 1, 1000, 500))
+        assert (part.size, part.length, part.data) == (len(figure), 500, figure[1000:1500])
+        assert part.next_offset == 1500
+        tail = asyncio_run(db.read_blob("figure", 1, len(figure) - 10, 100, encode=True))
+        assert base64.b64decode(tail.data) == figure[-10:]
+        assert tail.next_offset is None
+
+        with pytest.raises(BlobTooLargeError):
+            asyncio_run(db.get_figure_blob(1, max_bytes=1000))
+        # a range within the limit is still readable
+        assert asyncio_run(db.read_blob("figure", 1, 0, 1000, max_bytes=1000)).length == 1000
+        with pytest.raises(NotFoundError):
+            asyncio_run(db.get_figure_blob(2))
+        with pytest.raises(NotFoundError):
+            asyncio_run(db.read_blob("figure", 3))
+        with pytest.raises(ValueError):
+            asyncio_run(db.read_blob("figure", 1, len(figure) + 1))
+    finally:
+        db.close()
+
+
+def test_base64_chunks_match_a_single_encoding():
+    data = bytes(range(256)) * 7
+    for chunk_bytes in (3, 6, 300):
+        encoded = encode_base64_chunks(io.BytesIO(data).read, len(data), chunk_bytes)
+        assert encoded == base64.b64encode(data).decode("ascii")
+    assert encode_base64_chunks(io.BytesIO().read, 0) == ""
+
+
+
+def test_db_caches_listings_until_the_database_changes(tmp_path):
+    path = tmp_path / "cached.db"
+    writer = sqlite3.connect(path)
+    init_db(writer.cursor())
+    writer.execute("INSERT INTO pdfs (id, title) VALUES (1, 'doc')")
+    writer.commit()
+
+    statements: list[str] = []
+
+    class TracedDatabase(Database):
+        def _connect(self) -> sqlite3.Connection:
+            conn = Database._connect(self)
+            conn.set_trace_callback(statements.append)
+            return conn
+
+    db = TracedDatabase(path, read_connections=1)
+    try:
+        listed = asyncio_run(db.get_pdf_counts(10, 0))
+        queries = [statement for statement in statements if "FROM pdfs" in statement]
+        assert asyncio_run(db.get_pdf_counts(10, 0)) == listed
+        assert [statement for statement in statements if "FROM pdfs" in statement] == queries
+
+        # a commit from another connection changes data_version
+        writer.execute("INSERT INTO pdfs (id, title) VALUES (2, 'later')")
+        writer.commit()
+        assert len(asyncio_run(db.get_pdf_counts(10, 0))) == 2
+
+        uncached = Database(path, result_cache_entries=0)
+        assert len(asyncio_run(uncached.get_pdf_counts(10, 0))) == 2
+        assert len(uncached._results) == 0
+        uncached.close()
+    finally:
+        db.close()
+        writer.close()
+
+
+def test_db_does_not_cache_rows_read_before_a_commit(tmp_path):
+    path = tmp_path / "cached.db"
+    writer = sqlite3.connect(path)
+    init_db(writer.cursor())
+    writer.execute("INSERT INTO pdfs (id, title) VALUES (1, 'doc')")
+    writer.commit()
+
+    db = Database(path, read_connections=2)
+    reading = threading.Event()
+    committed = threading.Event()
+
+    def slow_titles(conn: sqlite3.Connection) -> list[str]:
+        titles = [row["title"] for row in conn.execute("SELECT title FROM pdfs")]
+        reading.set()
+        committed.wait()
+        return titles
+
+    async def scenario() -> list[str]:
+        # one worker reads the titles, and holds them until after a commit
+        slow = asyncio.ensure_future(db._submit_cached(("titles",), slow_titles))
+        await asyncio.to_thread(reading.wait)
+        writer.execute("UPDATE pdfs SET title = 'renamed'")
+        writer.commit()
+        # the other worker sees the commit, and empties the cache
+        await db._submit_cached(("other",), lambda conn: None)
+        committed.set()
+        return await slow
+
+    try:
+        assert asyncio_run(scenario()) == ["doc"]
+        assert db._results.get(("titles",)) is None
+    finally:
+        committed.set()
+        db.close()
+        writer.close()
+
+
 # helpers
 import asyncio
+import threading
 
 
 def asyncio_run(awaitable):
@@ -1,16 +1,24 @@
 from __future__ import annotations
 
+import base64
+import io
+import sqlite3
 from pathlib import Path
 
 import pytest
+from pypdf import PdfReader, PdfWriter
 
+from pdf2sqlite.init_db import init_db
+from pdf2sqlite.mcp_server.cache import ByteLRUCache, ResultCache
 from pdf2sqlite.mcp_server.config import ServerConfig
 from pdf2sqlite.mcp_server.db import Database
 from pdf2sqlite.mcp_server.resources import (
     ResourceService,
     ResourceTooLargeError,
     build_page_payload,
+    register_resources,
 )
+from mcp.server.fastmcp import FastMCP
 from mcp.server.fastmcp.utilities.types import Image as MCPImage
 from pdf2sqlite.mcp_server.uri import PdfResource
 
@@ -68,6 +76,194 @@ def test_build_page_payload_validates_fields():
         build_page_payload({"id": 1, "pdf_id": 1, "page_number": "x"})
 
 
+def test_byte_lru_cache_evicts_least_recently_used():
+    cache = ByteLRUCache(10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"
+    cache.put("c", b"1234")
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size == 8
+    cache.put("huge", b"x" * 11)
+    assert cache.get("huge") is None
+
+
+def test_result_cache_expires_and_evicts():
+    now = [0.0]
+    cache = ResultCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    cache.put("b", None)
+    cache.put("a", [])
+    assert cache.get("b", "missing") is None
+    cache.put("c", 3)
+    # "b" was used more recently than "a"
+    assert cache.get("a", "missing") == "missing"
+    assert cache.get("b", "missing") is None
+    now[0] = 11
+    assert cache.get("c", "missing") == "missing"
+
+
+def single_page_pdf(width: int) -> bytes:
+    writer = PdfWriter()
+    writer.add_blank_page(width=width, height=100)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def test_full_pdfs_are_cached_until_their_pages_change(tmp_path):
+    path = tmp_path / "cache.db"
+    writer = sqlite3.connect(path)
+    init_db(writer.cursor())
+    writer.execute("INSERT INTO pdfs (id, title) VALUES (1, 'doc')")
+    for page_number in (1, 2):
+        writer.execute(
+            "INSERT INTO pdf_pages (page_number, data, pdf_id) VALUES (?, ?, 1)",
+            [page_number, single_page_pdf(100 * page_number)],
+        )
+    writer.commit()
+
+    rebuilds = []
+
+    class CountingDatabase(Database):
+        async def get_versioned_pdf_page_rows(self, pdf_id):
+            rebuilds.append(pdf_id)
+            return await Database.get_versioned_pdf_page_rows(self, pdf_id)
+
+    cfg = ServerConfig(database_path=path, pdf_cache_dir=tmp_path / "pdfs")
+    db = CountingDatabase(path)
+    svc = ResourceService(database=db, config=cfg)
+    try:
+        first = asyncio_run(svc.load_pdf_blob(PdfResource(1)))
+        assert len(PdfReader(io.BytesIO(first)).pages) == 2
+        assert asyncio_run(svc.load_pdf_blob(PdfResource(1))) is first
+        assert rebuilds == [1]
+
+        # a restarted server finds the document on disk
+        restarted = ResourceService(database=db, config=cfg)
+        assert asyncio_run(restarted.load_pdf_blob(PdfResource(1))) == first
+        assert rebuilds == [1]
+
+        writer.execute(
+            "INSERT INTO pdf_pages (page_number, data, pdf_id) VALUES (3, ?, 1)",
+            [single_page_pdf(300)],
+        )
+        writer.commit()
+        updated = asyncio_run(svc.load_pdf_blob(PdfResource(1)))
+        assert len(PdfReader(io.BytesIO(updated)).pages) == 3
+        assert rebuilds == [1, 1]
+        assert len(list((tmp_path / "pdfs").glob("*/pdf-1-*.pdf"))) == 1
+    finally:
+        db.close()
+        writer.close()
+
+
+def test_databases_sharing_a_cache_directory_keep_their_own_pdfs(tmp_path):
+    # two databases whose PDF 1 has the same version, but different pages
+    services = []
+    for name, widths in (("a", (100, 200)), ("b", (500, 600))):
+        path = tmp_path / f"{name}.db"
+        writer = sqlite3.connect(path)
+        init_db(writer.cursor())
+        writer.execute("INSERT INTO pdfs (id, title) VALUES (1, 'doc')")
+        for page_number, width in enumerate(widths, start=1):
+            writer.execute(
+                "INSERT INTO pdf_pages (page_number, data, pdf_id) VALUES (?, ?, 1)",
+                [page_number, single_page_pdf(width)],
+            )
+        writer.commit()
+        writer.close()
+        cfg = ServerConfig(database_path=path, pdf_cache_dir=tmp_path / "pdfs")
+        services.append(ResourceService(database=Database(path), config=cfg))
+
+    try:
+        widths = []
+        for svc in services:
+            payload = asyncio_run(svc.load_pdf_blob(PdfResource(1)))
+            widths.append(PdfReader(io.BytesIO(payload)).pages[0].mediabox.width)
+        assert widths == [100, 500]
+        assert len(list((tmp_path / "pdfs").glob("*/pdf-1-*.pdf"))) == 2
+    finally:
+        for svc in services:
+            svc.database.close()
+
+
+
+def test_resources_over_the_limit_are_read_in_ranges(tmp_path):
+    path = tmp_path / "ranges.db"
+    writer = sqlite3.connect(path)
+    init_db(writer.cursor())
+    writer.execute("INSERT INTO pdfs (id, title) VALUES (1, 'doc')")
+    page = single_page_pdf(100)
+    writer.execute("INSERT INTO pdf_pages (page_number, data, pdf_id) VALUES (1, ?, 1)", [page])
+    writer.commit()
+    writer.close()
+
+    cfg = ServerConfig(database_path=path, max_blob_bytes=100)
+    db = Database(path)
+    svc = ResourceService(database=db, config=cfg)
+    try:
+        with pytest.raises(ResourceTooLargeError):
+            asyncio_run(svc.embed_pdf(PdfResource(1, 1), "pdf2sqlite://pdf/1/page/1"))
+
+        for descriptor in (PdfResource(1, 1), PdfResource(1)):
+            parts, offset = [], 0
+            while offset is not None:
+                part = asyncio_run(svc.load_blob_range(descriptor, offset, 1000))
+                assert part.length <= 100
+                parts.append(base64.b64decode(part.data))
+                offset = part.next_offset
+            assert len(parts) > 1
+            data = b"".join(parts)
+            assert PdfReader(io.BytesIO(data)).pages
+        assert data == asyncio_run(svc._load_full_pdf(1))
+
+        cfg.max_blob_bytes = len(page)
+        size, embed = asyncio_run(svc.embed_pdf(PdfResource(1, 1), "pdf2sqlite://pdf/1/page/1"))
+        assert size == len(page)
+        assert base64.b64decode(embed.resource.blob) == page
+    finally:
+        db.close()
+
+
+
+def test_page_images_are_rendered_and_stored(tmp_path):
+    path = tmp_path / "renders.db"
+    writer = sqlite3.connect(path)
+    init_db(writer.cursor())
+    writer.execute("INSERT INTO pdfs (id, title) VALUES (1, 'doc')")
+    writer.execute(
+        "INSERT INTO pdf_pages (id, page_number, data, pdf_id) VALUES (1, 1, ?, 1)",
+        [single_page_pdf(144)],
+    )
+    writer.commit()
+
+    cfg = ServerConfig(database_path=path, store_renders=True)
+    db = Database(path)
+    server = FastMCP("renders")
+    register_resources(server, ResourceService(database=db, config=cfg))
+    try:
+        contents = asyncio_run(
+            server.read_resource("pdf2sqlite://pdf/1/page/1/image?dpi=36")
+        )
+        png = contents[0].content
+        assert contents[0].mime_type == "image/png"
+        assert png.startswith(b"\x89PNG")
+        # 144 by 100 points at half a pixel per point
+        assert writer.execute(
+            "SELECT width, height, data FROM page_renders WHERE page_id = 1 AND dpi = 36"
+        ).fetchone() == (72, 50, png)
+
+        default = asyncio_run(server.read_resource("pdf2sqlite://pdf/1/page/1/image"))
+        assert len(default[0].content) > len(png)
+        with pytest.raises(ValueError):
+            asyncio_run(server.read_resource("pdf2sqlite://pdf/1/page/1/image?dpi=9000"))
+    finally:
+        db.close()
+        writer.close()
+
+
 # helpers
 import asyncio
 
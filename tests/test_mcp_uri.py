@@ -3,11 +3,13 @@ from __future__ import annotations
 import pytest
 
 from pdf2sqlite.mcp_server.uri import (
+    PageImageResource,
     PdfResource,
     FigureResource,
     TableImageResource,
     build_pdf_uri,
     build_pdf_page_uri,
+    build_page_image_uri,
     build_figure_uri,
     build_table_image_uri,
     parse_resource_uri,
@@ -32,6 +34,15 @@ def test_parse_pdf_uri_single_page():
     assert build_pdf_page_uri(456, 7) == uri
 
 
+def test_parse_page_image_uri():
+    desc = parse_resource_uri("pdf2sqlite://pdf/456/page/7/image?dpi=150")
+    assert desc == PageImageResource(pdf_id=456, page_number=7, dpi=150)
+    assert build_page_image_uri(456, 7, 150) == "pdf2sqlite://pdf/456/page/7/image?dpi=150"
+    assert parse_resource_uri(build_page_image_uri(456, 7)).dpi is None
+    with pytest.raises(ValueError):
+        parse_resource_uri("pdf2sqlite://pdf/456/page/7/image?dpi=high")
+
+
 def test_parse_figure_uri():
     uri = "pdf2sqlite://figure/999"
     desc = parse_resource_uri(uri)
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+import sqlite_vec
+
+from pdf2sqlite.indexes import SECONDARY_INDEXES
+from pdf2sqlite.init_db import init_db
+from pdf2sqlite.mcp_server.db import Database
+from pdf2sqlite.migrations import (
+    SCHEMA_VERSION,
+    migrate,
+    pending_migrations,
+    run_backfills,
+    schema_version,
+)
+
+
+# the schema of pdf2sqlite 0.0.3, the last release before versioning, frozen
+# so that migrations are tested against the databases it really made
+LEGACY_SCHEMA = Path(__file__).with_name("create_db_0.0.3.sql")
+
+
+def legacy_db(path) -> sqlite3.Connection:
+    """A database made before versioning, with the 0.0.3 schema"""
+    db = sqlite3.connect(path)
+    db.enable_load_extension(True)
+    sqlite_vec.load(db)
+    db.executescript(LEGACY_SCHEMA.read_text())
+    db.execute("INSERT INTO pdfs (id, title) VALUES (1, 'doc')")
+    for page_number in (1, 2, 3):
+        db.execute(
+            "INSERT INTO pdf_pages (page_number, text, pdf_id) VALUES (?, 'hydraulic pump', 1)",
+            [page_number],
+        )
+    db.commit()
+    return db
+
+
+def test_new_databases_are_current(tmp_path):
+    db = sqlite3.connect(tmp_path / "new.db")
+    init_db(db.cursor())
+
+    assert schema_version(db) == SCHEMA_VERSION
+    assert pending_migrations(db) == []
+    assert Database(tmp_path / "new.db").schema_warning() is None
+
+
+def test_legacy_databases_are_migrated_and_backfilled(tmp_path):
+    db = legacy_db(tmp_path / "legacy.db")
+    assert schema_version(db) == 0
+    assert "pdf2sqlite migrate" in Database(tmp_path / "legacy.db").schema_warning()
+
+    applied = migrate(db.cursor())
+
+    assert [migration.version for migration in applied] == list(range(1, SCHEMA_VERSION + 1))
+    assert schema_version(db) == SCHEMA_VERSION
+    assert "collection" in {row[1] for row in db.execute("PRAGMA table_info(pdfs)")}
+    # legacy embeddings are left for `pdf2sqlite migrate --legacy_embedder`
+    assert db.execute("SELECT COUNT(*) FROM section_embeddings_vec").fetchone()[0] == 0
+    indexes = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {index.name for index in SECONDARY_INDEXES} <= indexes
+    # existing rows are only indexed by the backfill, a batch at a time
+    matches = "SELECT COUNT(*) FROM pdf_pages_fts WHERE pdf_pages_fts MATCH 'pump'"
+    assert db.execute(matches).fetchone()[0] == 0
+    # three pages indexed, and one PDF's statistics counted
+    assert run_backfills(db.cursor(), batch_size=2) == 4
+    assert db.execute(matches).fetchone()[0] == 3
+    assert db.execute("SELECT page_count, gists_complete FROM pdf_stats").fetchall() == [(3, 0)]
+
+    assert migrate(db.cursor()) == []
+    assert run_backfills(db.cursor()) == 0
+
+
+def test_collections_are_added_before_their_index(tmp_path):
+    db = legacy_db(tmp_path / "legacy.db")
+    # a database whose base tables were recorded before they had collections
+    migrate(db.cursor())
+    db.execute("DELETE FROM schema_version WHERE version > 1")
+    db.execute("DROP INDEX idx_pdfs_collection")
+    db.execute("ALTER TABLE pdfs DROP COLUMN collection")
+    db.commit()
+
+    migrate(db.cursor())
+
+    assert schema_version(db) == SCHEMA_VERSION
+    assert "collection" in {row[1] for row in db.execute("PRAGMA table_info(pdfs)")}
+    indexes = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_pdfs_collection" in indexes
+
+
+def test_newer_schemas_are_refused(tmp_path):
+    db = sqlite3.connect(tmp_path / "new.db")
+    init_db(db.cursor())
+    db.execute(
+        "INSERT INTO schema_version (version, name) VALUES (?, 'future')",
+        [SCHEMA_VERSION + 1],
+    )
+
+    with pytest.raises(ValueError, match="upgrade pdf2sqlite"):
+        migrate(db.cursor())
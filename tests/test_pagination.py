@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from pdf2sqlite.init_db import init_db
+from pdf2sqlite.mcp_server.config import ServerConfig
+from pdf2sqlite.mcp_server.pagination import decode_cursor, encode_cursor
+from pdf2sqlite.mcp_server.server import build_server
+
+
+@pytest.fixture
+def listing_db(tmp_path):
+    path = tmp_path / "listing.db"
+    db = sqlite3.connect(path)
+    init_db(db.cursor())
+    for pdf_id in range(1, 8):
+        db.execute("INSERT INTO pdfs (id, title) VALUES (?, ?)", [pdf_id, f"doc {pdf_id}"])
+    for page_number in range(1, 12):
+        db.execute(
+            "INSERT INTO pdf_pages (page_number, text, pdf_id) VALUES (?, 'text', 1)",
+            [page_number],
+        )
+    db.commit()
+    db.close()
+    return path
+
+
+def walk(server, tool, arguments, listing, key):
+    """Every item of a listing, following its cursors"""
+    items, cursor = [], None
+    while True:
+        _, result = asyncio.run(server.call_tool(tool, {**arguments, "cursor": cursor}))
+        items += [item[key] for item in result[listing]]
+        cursor = result["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def test_cursors_round_trip_and_reject_other_listings():
+    cursor = encode_cursor("pages", 3, 41)
+    assert decode_cursor(cursor, "pages", 2) == (3, 41)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "pdfs", 1)
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor!", "pages", 2)
+
+
+def test_cursors_walk_the_same_rows_as_offsets(listing_db):
+    server = build_server(ServerConfig(database_path=listing_db))
+
+    assert walk(server, "list_pdfs", {"limit": 3}, "pdfs", "pdf_id") == list(range(1, 8))
+    pages = walk(server, "list_pdf_pages", {"pdf_id": 1, "limit": 4}, "pages", "page_number")
+    assert pages == list(range(1, 12))
+
+    _, by_offset = asyncio.run(
+        server.call_tool("list_pdf_pages", {"pdf_id": 1, "limit": 4, "offset": 4})
+    )
+    assert [page["page_number"] for page in by_offset["pages"]] == [5, 6, 7, 8]
+
+    _, first = asyncio.run(server.call_tool("list_pdf_pages", {"pdf_id": 1, "limit": 4}))
+    with pytest.raises(Exception, match="another PDF"):
+        asyncio.run(
+            server.call_tool(
+                "list_pdf_pages", {"pdf_id": 2, "cursor": first["next_cursor"]}
+            )
+        )
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import sqlite3
+
+import pytest
+
+from pdf2sqlite.init_db import init_db
+from pdf2sqlite.mcp_server.db import Database
+
+# Database methods that build their SQL in pdf2sqlite.search, whose plans
+# depend on the vec0 and FTS5 virtual tables rather than on the schema
+DELEGATED = {
+    "run",
+    "fetch_one",
+    "fetch_all",
+    "fetch_value",
+    "fetch_many",
+    "get_embedding_space",
+    "get_search_space",
+    "semantic_search",
+    "asset_search",
+    "keyword_search",
+}
+
+# Database methods that read blobs incrementally by rowid, issuing no SQL
+BLOB_READS = {
+    "read_blob",
+    "get_page_blob_by_id",
+    "get_table_image_blob",
+}
+
+# Database methods that write, through a connection of their own
+WRITES = {"store_page_render"}
+
+# Database methods that run the caller's own SQL
+AD_HOC = {"run_sql"}
+
+# every query of the other methods, by the call that issues it
+CALLS = {
+    "ensure_pdf_exists": (1,),
+    "get_pdf_counts": (10, 0, 0),
+    "get_pdf_pages": (1, 10, 0, 0),
+    "get_page_summary": (1,),
+    "get_page_id": (1, 1),
+    "get_page_blob": (1, 1),
+    "get_page_render": (1, 36),
+    "get_pdf_page_rows": (1,),
+    "get_pdf_version": (1,),
+    "get_versioned_pdf_page_rows": (1,),
+    "get_figures_for_page": (1,),
+    "get_tables_for_page": (1,),
+    "get_page_assets": (1,),
+    "get_figure_blob": (1,),
+    "get_table_summary": (1,),
+    "get_figure_summary": (1,),
+    "get_schema": ("pdfs",),
+}
+
+# full scans that are the point of the query: schema lookups read
+# sqlite_master. Listings are checked with a cursor, which seeks to its page
+ALLOWED_SCANS = {
+    "get_schema": {"sqlite_master"},
+}
+
+
+# lookups made while ingesting and labelling, which the secondary indexes serve
+INGEST_QUERIES = (
+    "SELECT id FROM section_keywords WHERE section_id = 1",
+    "SELECT id FROM section_topics WHERE section_id = 1 AND topic_id = 1",
+    "SELECT section_id FROM section_topics WHERE topic_id = 1 ORDER BY confidence DESC LIMIT 50",
+    "SELECT topic_id, centroid, count FROM topic_centroids WHERE model = 'm' ORDER BY topic_id",
+    "SELECT MIN(page_id) FROM page_to_figure WHERE figure_id = 1",
+    "SELECT page_id FROM page_to_table WHERE table_id = 1",
+    "SELECT id FROM pdf_sections WHERE pdf_id = 1 ORDER BY start_page",
+    "SELECT id FROM pdfs WHERE collection = 'manuals'",
+)
+
+
+def assert_indexed(conn: sqlite3.Connection, statement: str, scans: set[str]) -> None:
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}")]
+    for detail in plan:
+        assert "TEMP B-TREE" not in detail, (statement, plan)
+        if detail.startswith("SCAN "):
+            assert detail.split()[1] in scans, (statement, plan)
+
+
+class TracedDatabase(Database):
+    statements: list[str]
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = Database._connect(self)
+        conn.set_trace_callback(self.statements.append)
+        return conn
+
+
+@pytest.fixture(scope="module")
+def path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("plans") / "plans.db"
+    db = sqlite3.connect(path)
+    cursor = db.cursor()
+    init_db(cursor)
+    cursor.execute("INSERT INTO pdfs (id, title) VALUES (1, 'doc')")
+    cursor.execute(
+        "INSERT INTO pdf_pages (id, page_number, data, pdf_id) VALUES (1, 1, x'25504446', 1)"
+    )
+    cursor.execute("INSERT INTO pdf_figures (id, mime_type, data) VALUES (1, 'image/png', x'00')")
+    cursor.execute("INSERT INTO page_to_figure (page_id, figure_id) VALUES (1, 1)")
+    cursor.execute(
+        "INSERT INTO pdf_tables (id, image, pdf_id, page_number, ymin, xmin) "
+        "VALUES (1, x'00', 1, 1, 0, 0)"
+    )
+    cursor.execute("INSERT INTO page_to_table (page_id, table_id) VALUES (1, 1)")
+    db.commit()
+    db.close()
+    return path
+
+
+def test_every_query_method_is_checked():
+    methods = {
+        name
+        for name, member in inspect.getmembers(Database, inspect.iscoroutinefunction)
+        if not name.startswith("_")
+    }
+    assert methods - DELEGATED - BLOB_READS - WRITES - AD_HOC == set(CALLS)
+
+
+@pytest.mark.parametrize("method", sorted(CALLS))
+def test_queries_use_indexes(path, method):
+    database = TracedDatabase(path)
+    database.statements = []
+    asyncio.run(getattr(database, method)(*CALLS[method]))
+    assert database.statements
+
+    conn = sqlite3.connect(path)
+    for statement in database.statements:
+        assert_indexed(conn, statement, ALLOWED_SCANS.get(method, set()))
+    conn.close()
+
+
+@pytest.mark.parametrize("statement", INGEST_QUERIES)
+def test_ingest_lookups_use_indexes(path, statement):
+    conn = sqlite3.connect(path)
+    assert_indexed(conn, statement, set())
+    conn.close()
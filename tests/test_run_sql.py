@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from pdf2sqlite.init_db import init_db
+from pdf2sqlite.mcp_server import server as server_module
+from pdf2sqlite.mcp_server.config import ServerConfig
+from pdf2sqlite.mcp_server.db import Database, QueryError
+from pdf2sqlite.mcp_server.server import build_server
+
+BUDGET = {"timeout": 1.0, "max_rows": 100, "max_bytes": 10_000}
+
+# counts forever, unless it is interrupted
+RUNAWAY = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT MAX(i) FROM n"
+
+
+@pytest.fixture
+def sql_db(tmp_path):
+    path = tmp_path / "sql.db"
+    db = sqlite3.connect(path)
+    init_db(db.cursor())
+    db.execute("INSERT INTO pdfs (id, title) VALUES (1, 'manual')")
+    for page_number in range(1, 21):
+        db.execute(
+            "INSERT INTO pdf_pages (page_number, text, data, pdf_id) VALUES (?, ?, x'25504446', 1)",
+            [page_number, "hydraulic pump " * 50],
+        )
+    db.commit()
+    db.close()
+    return path
+
+
+@pytest.fixture
+def server_databases(monkeypatch):
+    """Close the Databases that build_server opens"""
+    opened: list[Database] = []
+
+    def database(*args, **kwargs) -> Database:
+        opened.append(Database(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(server_module, "Database", database)
+    yield opened
+    for db in opened:
+        db.close()
+
+
+def run(database, sql, params=(), **budget):
+    return asyncio.run(database.run_sql(sql, params, **{**BUDGET, **budget}))
+
+
+def test_selects_return_rows_timing_and_plan(sql_db):
+    database = Database(sql_db)
+    try:
+        result = run(
+            database,
+            "SELECT page_number, data FROM pdf_pages WHERE pdf_id = ? ORDER BY page_number",
+            [1],
+            max_rows=3,
+        )
+        assert result["columns"] == ["page_number", "data"]
+        assert result["rows"] == [[1, "<blob: 4 bytes>"], [2, "<blob: 4 bytes>"], [3, "<blob: 4 bytes>"]]
+        assert result["truncated"]
+        assert result["elapsed_ms"] >= 0
+        assert any("pdf_pages" in step for step in result["plan"])
+
+        # each page's text is 750 bytes, so 10,000 bytes hold 13 of them
+        result = run(database, "SELECT text FROM pdf_pages")
+        assert (result["row_count"], result["truncated"]) == (13, True)
+    finally:
+        database.close()
+
+
+def test_ordered_queries_keep_their_order(sql_db):
+    database = Database(sql_db)
+    try:
+        result = run(
+            database,
+            "SELECT page_number, data FROM pdf_pages ORDER BY page_number DESC LIMIT 3",
+        )
+        assert result["rows"] == [[20, "<blob: 4 bytes>"], [19, "<blob: 4 bytes>"], [18, "<blob: 4 bytes>"]]
+        # and are still cut short at the budgets
+        result = run(database, "SELECT text FROM pdf_pages ORDER BY page_number DESC")
+        assert (result["row_count"], result["truncated"]) == (13, True)
+    finally:
+        database.close()
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "DELETE FROM pdfs",
+        "PRAGMA writable_schema = 1",
+        "ATTACH DATABASE ':memory:' AS other",
+        "SELECT 1; DROP TABLE pdfs",
+    ],
+)
+def test_anything_but_reads_is_refused(sql_db, sql):
+    database = Database(sql_db)
+    try:
+        with pytest.raises(QueryError):
+            run(database, sql)
+        # the pooled connection is left as it was
+        assert asyncio.run(database.get_pdf_counts(10, 0))[0]["title"] == "manual"
+    finally:
+        database.close()
+
+
+def test_full_text_search_is_a_read(sql_db):
+    database = Database(sql_db)
+    try:
+        result = run(
+            database,
+            "SELECT COUNT(*) FROM pdf_pages_fts WHERE pdf_pages_fts MATCH 'pump'",
+        )
+        assert result["rows"] == [[20]]
+        with pytest.raises(QueryError):
+            run(database, "PRAGMA data_version = 1")
+    finally:
+        database.close()
+
+
+def test_runaway_queries_are_interrupted(sql_db):
+    database = Database(sql_db, read_connections=1)
+    try:
+        with pytest.raises(QueryError, match="budget"):
+            run(database, RUNAWAY, timeout=0.2)
+        assert run(database, "SELECT COUNT(*) FROM pdf_pages")["rows"] == [[20]]
+    finally:
+        database.close()
+
+
+def test_values_are_held_to_the_byte_budget(sql_db):
+    writer = sqlite3.connect(sql_db)
+    writer.execute("UPDATE pdf_pages SET data = zeroblob(50000) WHERE page_number = 1")
+    writer.commit()
+    writer.close()
+
+    database = Database(sql_db, read_connections=1)
+    try:
+        # blobs larger than the budget come back as their lengths
+        result = run(database, "SELECT page_number, data FROM pdf_pages WHERE page_number = 1;")
+        assert result["rows"] == [[1, "<blob: 50000 bytes>"]]
+        with pytest.raises(QueryError, match="10000 bytes"):
+            run(database, "SELECT randomblob(1000000000)")
+
+        # and the connection's own limit is restored
+        limit = asyncio.run(
+            database._submit(
+                lambda: database._connection().getlimit(sqlite3.SQLITE_LIMIT_LENGTH)
+            )
+        )
+        assert limit > 10_000
+    finally:
+        database.close()
+
+
+def test_run_sql_tool_applies_the_configured_limits(sql_db, server_databases):
+    server = build_server(ServerConfig(database_path=sql_db, sql_max_rows=5))
+
+    _, result = asyncio.run(
+        server.call_tool("run_sql", {"sql": "SELECT id FROM pdf_pages", "max_rows": 50})
+    )
+    assert result["row_count"] == 5
+    assert result["truncated"]
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import types
+
+import numpy as np
+import pytest
+import sqlite_vec
+
+from pdf2sqlite import embeddings, search
+from pdf2sqlite.embeddings import store_section_embedding
+from pdf2sqlite.init_db import init_db
+from pdf2sqlite.mcp_server.config import ServerConfig
+from pdf2sqlite.mcp_server.db import Database
+from pdf2sqlite.mcp_server.server import build_server
+from pdf2sqlite.vector_store import get_or_create_space
+
+DIMENSION = 1024
+
+
+def unit_vector(index: int) -> np.ndarray:
+    vector = np.zeros(DIMENSION, dtype=np.float32)
+    vector[index] = 1.0
+    return vector
+
+
+@pytest.fixture
+def vector_db(tmp_path):
+    path = tmp_path / "vectors.db"
+    db = sqlite3.connect(path)
+    cursor = db.cursor()
+    init_db(cursor)
+    cursor.execute("INSERT INTO pdfs (id, title) VALUES (1, 'Manual')")
+    space = get_or_create_space(cursor, "fake-model", DIMENSION)
+    for section_id, title in enumerate(["Wiring", "Hydraulics", "Brakes"], start=1):
+        cursor.execute(
+            "INSERT INTO pdf_sections (id, start_page, title, pdf_id) VALUES (?,?,?,1)",
+            [section_id, section_id * 10, title],
+        )
+        store_section_embedding(cursor, space, section_id, unit_vector(section_id))
+        cursor.execute(
+            "INSERT INTO pdf_pages (page_number, text, pdf_id) VALUES (?,?,1)",
+            [section_id * 10 + 1, f"{title} overview for part P/N-44{section_id}"],
+        )
+    db.commit()
+    db.close()
+    return path
+
+
+def fake_embedding(calls: list[list[str]]):
+    def embedding(model, input):
+        calls.append(list(input))
+        vector = unit_vector(2) + 0.5 * unit_vector(3)
+        return types.SimpleNamespace(
+            data=[types.SimpleNamespace(embedding=vector.tolist())]
+        )
+
+    return embedding
+
+
+def test_query_embedder_caches_per_query(monkeypatch):
+    calls: list[list[str]] = []
+    monkeypatch.setattr(search.litellm, "embedding", fake_embedding(calls))
+    embedder = search.QueryEmbedder("fake-model", max_entries=1)
+
+    first = embedder.embed("pumps")
+    again = embedder.embed("  pumps ")
+    embedder.embed("valves")
+    embedder.embed("pumps")
+
+    assert again is first
+    assert calls == [["pumps"], ["valves"], ["pumps"]]
+    assert embedder.cache_size() == 1
+
+    with pytest.raises(ValueError):
+        embedder.embed("   ")
+
+
+def test_database_semantic_search_ranks_sections(vector_db):
+    database = Database(vector_db)
+    query = unit_vector(2) + 0.5 * unit_vector(3)
+
+    space = asyncio.run(database.get_embedding_space("fake-model"))
+    rows = asyncio.run(database.semantic_search(space, query, 2))
+
+    assert [row["title"] for row in rows] == ["Hydraulics", "Brakes"]
+    assert rows[0]["pdf_title"] == "Manual"
+    assert rows[0]["distance"] < rows[1]["distance"]
+
+
+def test_semantic_search_tool_returns_page_resources(vector_db, monkeypatch):
+    calls: list[list[str]] = []
+    monkeypatch.setattr(search.litellm, "embedding", fake_embedding(calls))
+    server = build_server(ServerConfig(database_path=vector_db, embedder="fake-model"))
+
+    _, result = asyncio.run(
+        server.call_tool("semantic_search", {"query": "pressure", "limit": 1})
+    )
+
+    assert result["limit"] == 1
+    [section] = result["sections"]
+    assert section["title"] == "Hydraulics"
+    assert section["page_number"] == 21
+    assert section["resource"] == "pdf2sqlite://pdf/1/page/21"
+
+
+def test_semantic_search_tool_rejects_unknown_model(vector_db, monkeypatch):
+    monkeypatch.setattr(search.litellm, "embedding", fake_embedding([]))
+    server = build_server(ServerConfig(database_path=vector_db, embedder="other-model"))
+
+    with pytest.raises(Exception, match="no section embeddings from other-model"):
+        asyncio.run(server.call_tool("semantic_search", {"query": "pressure"}))
+
+
+def test_semantic_search_tool_requires_embedder(vector_db):
+    server = build_server(ServerConfig(database_path=vector_db))
+
+    tools = asyncio.run(server.list_tools())
+
+    assert "semantic_search" not in {tool.name for tool in tools}
+    assert "hybrid_search" in {tool.name for tool in tools}
+
+
+def test_fts_query_quotes_terms():
+    assert search.fts_query('P/N-4471 "brake" OR -') == '"P/N-4471" OR """brake""" OR "OR"'
+    assert search.fts_query("  ") == ""
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = search.reciprocal_rank_fusion([["a", "b", "a"], ["b", "c"]], k=1)
+
+    assert [item for item, _ in fused] == ["b", "a", "c"]
+    assert fused[0][1] == pytest.approx(1 / 3 + 1 / 2)
+    assert fused[1][1] == pytest.approx(1 / 2)
+
+
+def test_hybrid_search_fuses_keyword_and_vector_hits(vector_db):
+    class Embedder(search.QueryEmbedder):
+        def embed(self, query):
+            return unit_vector(3)
+
+    result = search.hybrid_search(vector_db, "P/N-442", Embedder("fake-model"), limit=3)
+
+    assert result["sections"][0]["title"] == "Brakes"
+    assert result["sections"][0]["vector_rank"] == 1
+    assert result["sections"][0]["keyword_rank"] is None
+    pages = [(hit["page_number"], hit.get("snippet")) for hit in result["pages"]]
+    # the keyword hit and the page where the nearest section starts tie
+    assert {page for page, _ in pages[:2]} == {21, 31}
+    assert "[P/N-442]" in dict(pages)[21]
+
+
+def test_hybrid_search_without_embedder_is_keyword_only(vector_db):
+    result = search.hybrid_search(vector_db, "hydraulics", limit=5)
+    other_model = search.hybrid_search(
+        vector_db, "hydraulics", search.QueryEmbedder("other-model"), limit=5
+    )
+
+    assert other_model == result
+    assert [hit["title"] for hit in result["sections"]] == ["Hydraulics"]
+    assert result["sections"][0]["keyword_rank"] == 1
+    assert [hit["page_number"] for hit in result["pages"]] == [21]
+
+
+def test_hybrid_search_tool(vector_db, monkeypatch):
+    calls: list[list[str]] = []
+    monkeypatch.setattr(search.litellm, "embedding", fake_embedding(calls))
+    server = build_server(ServerConfig(database_path=vector_db, embedder="fake-model"))
+
+    _, result = asyncio.run(
+        server.call_tool("hybrid_search", {"query": "wiring", "limit": 2})
+    )
+
+    assert result["semantic"] is True
+    # wiring is third by vector but first by keyword, which beats hydraulics
+    assert [hit["title"] for hit in result["sections"]] == ["Wiring", "Hydraulics"]
+    assert result["pages"][0]["resource"] == "pdf2sqlite://pdf/1/page/11"
+    assert calls == [["wiring"]]
+
+
+def test_asset_embeddings_resolve_to_figures(vector_db, monkeypatch):
+    def embedding(model, input):
+        vectors = [unit_vector(4 if "wiring" in text.lower() else 5) for text in input]
+        return types.SimpleNamespace(
+            data=[types.SimpleNamespace(embedding=vector.tolist()) for vector in vectors]
+        )
+
+    monkeypatch.setattr(embeddings.litellm, "embedding", embedding)
+    monkeypatch.setattr(search.litellm, "embedding", embedding)
+    db = sqlite3.connect(vector_db)
+    db.enable_load_extension(True)
+    sqlite_vec.load(db)
+    cursor = db.cursor()
+    page_id = cursor.execute("SELECT id FROM pdf_pages WHERE page_number = 21").fetchone()[0]
+    for figure_id, description in [(1, "Wiring diagram for the starter"), (2, "Pump cutaway")]:
+        cursor.execute(
+            "INSERT INTO pdf_figures (id, mime_type, description) VALUES (?, 'image/png', ?)",
+            [figure_id, description],
+        )
+        cursor.execute(
+            "INSERT INTO page_to_figure (page_id, figure_id) VALUES (?, ?)",
+            [page_id, figure_id],
+        )
+    embeddings.embed_pdf_assets(cursor, 1, ["page", "figure"], "fake-model")
+    db.commit()
+    db.close()
+    server = build_server(ServerConfig(database_path=vector_db, embedder="fake-model"))
+
+    _, result = asyncio.run(server.call_tool(
+        "semantic_search", {"query": "wiring diagram", "limit": 1, "scope": "figures"}
+    ))
+
+    [figure] = result["figures"]
+    assert figure["figure_id"] == 1
+    assert figure["resource"] == "pdf2sqlite://figure/1"
+    assert figure["page_resource"] == "pdf2sqlite://pdf/1/page/21"
+    # pages without a summary aren't embedded
+    with pytest.raises(Exception, match="no page embeddings"):
+        asyncio.run(server.call_tool(
+            "semantic_search", {"query": "wiring", "scope": "pages"}
+        ))
+
+
+def test_semantic_search_filters_by_pdf_and_collection(vector_db, monkeypatch):
+    db = sqlite3.connect(vector_db)
+    db.enable_load_extension(True)
+    sqlite_vec.load(db)
+    cursor = db.cursor()
+    cursor.execute("INSERT INTO pdfs (id, title, collection) VALUES (2, 'Supplement', 'fleet')")
+    cursor.execute(
+        "INSERT INTO pdf_sections (id, start_page, title, pdf_id) VALUES (4, 0, 'Hydraulics addendum', 2)"
+    )
+    space = get_or_create_space(cursor, "fake-model", DIMENSION)
+    store_section_embedding(cursor, space, 4, unit_vector(2))
+    db.commit()
+    query = unit_vector(2) + 0.5 * unit_vector(3)
+
+    def titles(**filters):
+        rows = search.semantic_search(db, space, query, 2, **filters)
+        return [row["title"] for row in rows]
+
+    assert titles() == ["Hydraulics", "Hydraulics addendum"]
+    assert titles(pdf_ids=[1]) == ["Hydraulics", "Brakes"]
+    assert titles(pdf_ids=[1, 2]) == ["Hydraulics", "Hydraulics addendum"]
+    assert titles(collection="fleet") == ["Hydraulics addendum"]
+    assert titles(pdf_ids=[1], collection="fleet") == []
+    db.close()
+
+    monkeypatch.setattr(search.litellm, "embedding", fake_embedding([]))
+    server = build_server(ServerConfig(database_path=vector_db, embedder="fake-model"))
+    _, result = asyncio.run(server.call_tool(
+        "semantic_search", {"query": "pressure", "collection": "fleet"}
+    ))
+    assert [section["pdf_id"] for section in result["sections"]] == [2]
+    assert result["collection"] == "fleet"
+
+
+def test_hybrid_search_filters_by_pdf_and_collection(vector_db, monkeypatch):
+    db = sqlite3.connect(vector_db)
+    db.enable_load_extension(True)
+    sqlite_vec.load(db)
+    cursor = db.cursor()
+    cursor.execute("INSERT INTO pdfs (id, title, collection) VALUES (2, 'Supplement', 'fleet')")
+    cursor.execute(
+        "INSERT INTO pdf_sections (id, start_page, title, pdf_id) VALUES (4, 0, 'Hydraulics addendum', 2)"
+    )
+    cursor.execute(
+        "INSERT INTO pdf_pages (page_number, text, pdf_id) VALUES (1, 'Hydraulics addendum', 2)"
+    )
+    space = get_or_create_space(cursor, "fake-model", DIMENSION)
+    store_section_embedding(cursor, space, 4, unit_vector(2))
+    db.commit()
+    db.close()
+
+    class Embedder(search.QueryEmbedder):
+        def embed(self, query):
+            return unit_vector(2)
+
+    def hits(**filters):
+        result = search.hybrid_search(vector_db, "hydraulics", Embedder("fake-model"), 5, **filters)
+        return (
+            {hit["pdf_id"] for hit in result["sections"]},
+            {hit["pdf_id"] for hit in result["pages"]},
+        )
+
+    assert hits() == ({1, 2}, {1, 2})
+    assert hits(pdf_ids=[1]) == ({1}, {1})
+    assert hits(collection="fleet") == ({2}, {2})
+    assert hits(pdf_ids=[1], collection="fleet") == (set(), set())
+    # keyword search alone applies the same filters
+    keyword_only = search.hybrid_search(vector_db, "hydraulics", limit=5, collection="fleet")
+    assert [hit["title"] for hit in keyword_only["sections"]] == ["Hydraulics addendum"]
+
+    monkeypatch.setattr(search.litellm, "embedding", fake_embedding([]))
+    server = build_server(ServerConfig(database_path=vector_db, embedder="fake-model"))
+    _, result = asyncio.run(server.call_tool(
+        "hybrid_search", {"query": "hydraulics", "pdf_ids": [2]}
+    ))
+    assert {hit["pdf_id"] for hit in result["sections"] + result["pages"]} == {2}
+    assert result["pdf_ids"] == [2]
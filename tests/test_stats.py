@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+
+from pdf2sqlite.init_db import init_db
+from pdf2sqlite.mcp_server.db import Database
+from pdf2sqlite.mcp_server.resources import build_pdf_payload
+from pdf2sqlite.stats import pending_stats, refresh_pdf_stats
+
+
+def stats_db(path) -> sqlite3.Connection:
+    db = sqlite3.connect(path)
+    init_db(db.cursor())
+    db.execute("INSERT INTO pdfs (id, title, description) VALUES (1, 'manual', 'an abstract')")
+    db.execute("INSERT INTO pdfs (id, title) VALUES (2, 'uncounted')")
+    db.execute("INSERT INTO pdf_pages (id, page_number, gist, data, pdf_id) VALUES (1, 1, 'a gist', x'0000', 1)")
+    db.execute("INSERT INTO pdf_pages (id, page_number, data, pdf_id) VALUES (2, 2, x'0000', 1)")
+    db.execute("INSERT INTO pdf_pages (id, page_number, pdf_id) VALUES (3, 1, 2)")
+    db.execute("INSERT INTO pdf_figures (id, mime_type, description, data) VALUES (1, 'image/png', 'a pump', x'000000')")
+    # a figure repeated on two pages is counted once
+    db.execute("INSERT INTO page_to_figure (page_id, figure_id) VALUES (1, 1), (2, 1)")
+    db.execute(
+        "INSERT INTO pdf_tables (id, image, pdf_id, page_number, ymin, xmin) "
+        "VALUES (1, x'00', 1, 2, 0, 0)"
+    )
+    db.commit()
+    return db
+
+
+def test_stats_are_counted_per_pdf(tmp_path):
+    db = stats_db(tmp_path / "stats.db")
+    refresh_pdf_stats(db.cursor(), 1)
+
+    row = db.execute(
+        """
+        SELECT page_count, figure_count, table_count, total_bytes, has_abstract,
+            gists_complete, figure_descriptions_complete, table_descriptions_complete
+        FROM pdf_stats WHERE pdf_id = 1
+        """
+    ).fetchone()
+    assert row == (2, 1, 1, 2 + 2 + 3 + 1, 1, 0, 1, 0)
+    assert pending_stats(db.cursor()) == 1
+
+
+def test_listing_reads_stats_and_counts_the_rest(tmp_path):
+    db = stats_db(tmp_path / "stats.db")
+    refresh_pdf_stats(db.cursor(), 1)
+    db.commit()
+
+    database = Database(tmp_path / "stats.db")
+    try:
+        counted, uncounted = [
+            build_pdf_payload(row) for row in asyncio.run(database.get_pdf_counts(10, 0))
+        ]
+        assert counted["page_count"] == 2
+        assert counted["figure_count"] == 1
+        assert counted["enrichments"] == {
+            "abstract": True,
+            "page_gists": False,
+            "figure_descriptions": True,
+            "table_descriptions": False,
+        }
+        assert uncounted["page_count"] == 1
+        assert "enrichments" not in uncounted
+
+        # databases from before statistics were kept still list their PDFs
+        db.execute("DROP TABLE pdf_stats")
+        db.commit()
+        database.close()
+        assert [row["page_count"] for row in asyncio.run(database.get_pdf_counts(10, 0))] == [2, 1]
+    finally:
+        database.close()
+        db.close()
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+from pdf2sqlite.init_db import init_db
+from pdf2sqlite.keywords import count_terms
+from pdf2sqlite.topics import (
+    load_topics,
+    refresh_topic_labels,
+    topic_confidences,
+    update_topics,
+)
+
+DIMENSION = 8
+
+
+@pytest.fixture
+def cursor(tmp_path):
+    db = sqlite3.connect(tmp_path / "topics.db")
+    cursor = db.cursor()
+    init_db(cursor)
+    cursor.execute("INSERT INTO pdfs (id, title) VALUES (1, 'doc')")
+    return cursor
+
+
+def add_sections(cursor, start, directions, text):
+    """
+    Sections near the given axes, returning their ids, embeddings and term
+    counts
+    """
+    rng = np.random.default_rng(start)
+    ids, vectors = [], []
+    for offset, axis in enumerate(directions):
+        section_id = start + offset
+        cursor.execute(
+            "INSERT INTO pdf_sections (id, start_page, title, pdf_id) VALUES (?, 0, ?, 1)",
+            [section_id, f"section {section_id}"],
+        )
+        vector = np.eye(DIMENSION, dtype=np.float32)[axis] + 0.1 * rng.standard_normal(DIMENSION)
+        ids.append(section_id)
+        vectors.append(vector.astype(np.float32))
+    return ids, vectors, count_terms([text[axis] for axis in directions])
+
+
+TEXT = {
+    0: "hydraulic pump pressure hydraulic valve",
+    1: "wiring harness connector wiring relay",
+    2: "brake caliper brake rotor",
+}
+
+
+def assignments(cursor, section_id):
+    return cursor.execute(
+        "SELECT topic_id, confidence FROM section_topics WHERE section_id = ? "
+        "ORDER BY confidence DESC",
+        [section_id],
+    ).fetchall()
+
+
+def test_topics_are_kept_and_updated_across_pdfs(cursor):
+    ids, vectors, _ = add_sections(cursor, 1, [0, 0, 0, 1, 1, 1], TEXT)
+    update_topics(cursor, "model", ids, vectors, n_topics=2)
+    topic_ids, centroids, counts = load_topics(cursor, "model")
+    hydraulics = assignments(cursor, 1)[0][0]
+    wiring = assignments(cursor, 4)[0][0]
+
+    assert len(topic_ids) == 2 and hydraulics != wiring
+    assert counts.tolist() == [3, 3]
+    assert {assignments(cursor, section)[0][0] for section in (1, 2, 3)} == {hydraulics}
+
+    # a later PDF joins the existing topics rather than replacing them
+    more_ids, more_vectors, _ = add_sections(cursor, 7, [0, 0], TEXT)
+    update_topics(cursor, "model", more_ids, more_vectors, n_topics=2)
+    later_ids, later_centroids, later_counts = load_topics(cursor, "model")
+
+    assert later_ids == topic_ids
+    assert dict(zip(later_ids, later_counts.tolist()))[hydraulics] == 5
+    assert assignments(cursor, 7)[0][0] == hydraulics
+    [(_, confidence)] = assignments(cursor, 7)
+    assert 0.5 < confidence <= 1.0
+    assert np.allclose(np.linalg.norm(later_centroids, axis=1), 1.0)
+    # re-ingesting a PDF reassigns its sections without counting them again
+    update_topics(cursor, "model", more_ids, more_vectors, n_topics=2)
+    reingested_ids, reingested_centroids, reingested_counts = load_topics(cursor, "model")
+    assert reingested_counts.tolist() == later_counts.tolist()
+    assert np.array_equal(reingested_centroids, later_centroids)
+    assert assignments(cursor, 7)[0][0] == hydraulics
+    # another model has its own topics
+    update_topics(cursor, "other", more_ids, more_vectors, n_topics=2)
+    assert set(load_topics(cursor, "other")[0]).isdisjoint(topic_ids)
+
+
+def test_topic_confidences_follow_distance():
+    centroids = np.eye(3, dtype=np.float32)
+    vectors = np.array([[1, 0, 0], [0.7071, 0.7071, 0]], dtype=np.float32)
+
+    confidences = topic_confidences(vectors, centroids)
+
+    assert np.allclose(confidences.sum(axis=1), 1.0)
+    assert confidences[0, 0] > 0.99
+    assert confidences[1, 0] == pytest.approx(confidences[1, 1])
+
+
+def topic_terms(cursor, topic_id):
+    return dict(cursor.execute("SELECT term, count FROM topic_terms WHERE topic_id = ?", [topic_id]))
+
+
+def test_labels_are_refreshed_once_topics_grow(cursor):
+    ids, vectors, counts = add_sections(cursor, 1, [0, 0, 2, 2], TEXT)
+    update_topics(cursor, "model", ids, vectors, n_topics=2, term_counts=counts)
+
+    assert refresh_topic_labels(cursor, "model") == 2
+    names = dict(cursor.execute("SELECT id, name FROM topics"))
+    hydraulics = assignments(cursor, 1)[0][0]
+    assert names[hydraulics].startswith("Hydraulic")
+    # each section's terms are pooled into the topic that absorbed it
+    assert topic_terms(cursor, hydraulics) == {"hydraulic": 4, "pump": 2, "pressure": 2, "valve": 2}
+    assert refresh_topic_labels(cursor, "model") == 0
+
+    more_ids, more_vectors, more_counts = add_sections(cursor, 5, [2], TEXT)
+    update_topics(cursor, "model", more_ids, more_vectors, n_topics=2, term_counts=more_counts)
+    assert refresh_topic_labels(cursor, "model") == 1
+    # re-ingested sections aren't pooled again
+    update_topics(cursor, "model", more_ids, more_vectors, n_topics=2, term_counts=more_counts)
+    brakes = assignments(cursor, 5)[0][0]
+    assert topic_terms(cursor, brakes)["brake"] == 6
+    assert refresh_topic_labels(cursor, "model", force=True) == 2
+
+
+def test_topics_without_pooled_terms_keep_their_names(cursor):
+    ids, vectors, _ = add_sections(cursor, 1, [0, 1], TEXT)
+    update_topics(cursor, "model", ids, vectors, n_topics=2)
+    cursor.execute("UPDATE topics SET name = 'Hydraulics' WHERE id = ?", [assignments(cursor, 1)[0][0]])
+
+    assert refresh_topic_labels(cursor, "model") == 2
+    assert sorted(name for (name,) in cursor.execute("SELECT name FROM topics")) == [
+        "Hydraulics", "Miscellaneous",
+    ]
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import sqlite3
+import types
+from dataclasses import replace
+
+import numpy as np
+import pytest
+import sqlite_vec
+
+from pdf2sqlite import embeddings, search
+from pdf2sqlite.init_db import init_db
+from pdf2sqlite.vector_store import (
+    adopt_legacy_embeddings,
+    backfill_partitions,
+    create_vec_table,
+    get_or_create_space,
+    get_space,
+    has_legacy_embeddings,
+    list_spaces,
+    partition_space,
+    set_collection,
+    store_embedding,
+    unpartitioned_spaces,
+)
+
+
+@pytest.fixture
+def cursor(tmp_path):
+    db = sqlite3.connect(tmp_path / "spaces.db")
+    cursor = db.cursor()
+    init_db(cursor)
+    cursor.execute("INSERT INTO pdfs (id, title) VALUES (1, 'doc')")
+    for section_id in (1, 2):
+        cursor.execute(
+            "INSERT INTO pdf_sections (id, start_page, title, pdf_id) VALUES (?, 1, ?, 1)",
+            [section_id, f"section {section_id}"],
+        )
+    return cursor
+
+
+def test_spaces_have_their_own_dimension(cursor):
+    small = get_or_create_space(cursor, "model-a", 4)
+    large = get_or_create_space(cursor, "model-b", 8, distance_metric="l2")
+
+    store_embedding(cursor, small, 1, np.ones(4))
+    store_embedding(cursor, large, 1, np.ones(8))
+
+    assert [space.model for space in list_spaces(cursor)] == ["model-a", "model-b"]
+    assert get_space(cursor, "model-b") == large
+    assert get_or_create_space(cursor, "model-a", 4) == small
+    assert large.distance_metric == "l2"
+    with pytest.raises(ValueError):
+        get_or_create_space(cursor, "model-a", 8)
+    with pytest.raises(ValueError):
+        store_embedding(cursor, small, 2, np.ones(8))
+
+
+def test_store_embedding_replaces_in_place(cursor):
+    space = get_or_create_space(cursor, "model-a", 4)
+
+    first = store_embedding(cursor, space, 1, np.ones(4))
+    again = store_embedding(cursor, space, 1, np.arange(4))
+
+    assert again == first
+    assert cursor.execute(f"SELECT COUNT(*) FROM {space.vec_table}").fetchone() == (1,)
+    stored = cursor.execute(f"SELECT embedding FROM {space.vec_table}").fetchone()[0]
+    assert np.frombuffer(stored, dtype=np.float32).tolist() == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize("quantization", ["int8", "bit"])
+def test_quantized_spaces_rescore_with_full_vectors(cursor, quantization):
+    space = get_or_create_space(cursor, "model-q", 16, quantization=quantization)
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((2, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    first = store_embedding(cursor, space, 1, vectors[1])
+    assert store_embedding(cursor, space, 1, vectors[0]) == first
+    store_embedding(cursor, space, 2, vectors[1])
+
+    rows = search.semantic_search(cursor.connection, space, vectors[1], 2)
+    assert [row["id"] for row in rows] == [2, 1]
+    # distances come from the full-precision vectors
+    assert rows[0]["distance"] == pytest.approx(0.0, abs=1e-6)
+    assert rows[1]["distance"] == pytest.approx(1 - float(vectors[0] @ vectors[1]), abs=1e-5)
+    full = cursor.execute(f"SELECT COUNT(*) FROM {space.full_table}").fetchone()
+    assert full == (2,)
+    assert get_or_create_space(cursor, "model-q", 16) == space
+    with pytest.raises(ValueError):
+        get_or_create_space(cursor, "model-q", 16, quantization="none")
+
+
+@pytest.mark.parametrize("quantization", ["none", "bit"])
+def test_unpartitioned_spaces_are_rebuilt_with_partitions(cursor, quantization):
+    cursor.execute("INSERT INTO pdfs (id, title) VALUES (2, 'other')")
+    cursor.execute(
+        "INSERT INTO pdf_sections (id, start_page, title, pdf_id) VALUES (3, 1, 'other', 2)"
+    )
+    partitioned = get_or_create_space(cursor, "model-p", 16, quantization=quantization)
+    # recreate the space as it was before spaces were partitioned
+    space = replace(partitioned, partitioned=False)
+    cursor.execute(f"DROP TABLE {space.vec_table}")
+    create_vec_table(cursor, space)
+    cursor.execute("UPDATE embedding_spaces SET partitioned = 0 WHERE id = ?", [space.id])
+    vectors = np.eye(16, dtype=np.float32)
+    rowids = [store_embedding(cursor, space, item, vectors[item]) for item in (1, 2, 3)]
+
+    with pytest.raises(ValueError, match="pdf2sqlite migrate"):
+        search.semantic_search(cursor.connection, space, vectors[3], 2, pdf_ids=[2])
+    assert unpartitioned_spaces(cursor) == [space]
+    assert backfill_partitions(cursor) == 3
+    assert unpartitioned_spaces(cursor) == []
+    rebuilt = get_space(cursor, "model-p")
+    set_collection(cursor, 2, "fleet")
+
+    assert get_space(cursor, "model-p") == rebuilt == partitioned
+    stored = cursor.execute(
+        f"SELECT rowid, pdf_id, collection FROM {rebuilt.vec_table} ORDER BY rowid"
+    ).fetchall()
+    assert stored == [(rowids[0], 1, ""), (rowids[1], 1, ""), (rowids[2], 2, "fleet")]
+    rows = search.semantic_search(cursor.connection, rebuilt, vectors[1], 3, pdf_ids=[2])
+    assert [row["id"] for row in rows] == [3]
+    rows = search.semantic_search(cursor.connection, rebuilt, vectors[3], 3, collection="")
+    assert {row["id"] for row in rows} == {1, 2}
+
+
+def test_figures_on_no_page_get_no_partition(cursor):
+    cursor.execute("INSERT INTO pdf_pages (id, page_number, pdf_id) VALUES (1, 1, 1)")
+    cursor.execute("INSERT INTO pdf_figures (id, mime_type) VALUES (1, 'image/png'), (2, 'image/png')")
+    cursor.execute("INSERT INTO page_to_figure (page_id, figure_id) VALUES (1, 1), (1, 2)")
+    space = get_or_create_space(cursor, "model-f", 4, target="figure")
+    vectors = np.eye(4, dtype=np.float32)
+    for figure_id in (1, 2):
+        store_embedding(cursor, space, figure_id, vectors[figure_id])
+
+    cursor.execute("DELETE FROM page_to_figure WHERE figure_id = 2")
+    with pytest.raises(ValueError, match="belongs to no PDF"):
+        store_embedding(cursor, space, 2, vectors[2])
+    partition_space(cursor, replace(space, partitioned=False))
+
+    assert cursor.execute(f"SELECT rowid, pdf_id FROM {space.vec_table}").fetchall() == [(1, 1)]
+    assert cursor.execute(f"SELECT item_id FROM {space.mapping_table}").fetchall() == [(1,)]
+
+
+def test_legacy_embeddings_are_only_adopted_by_a_named_model(tmp_path):
+    db = sqlite3.connect(tmp_path / "legacy.db")
+    db.enable_load_extension(True)
+    sqlite_vec.load(db)
+    cursor = db.cursor()
+    cursor.executescript(
+        """
+        CREATE TABLE pdfs(id INTEGER PRIMARY KEY, title STRING, collection STRING);
+        CREATE TABLE pdf_sections(id INTEGER PRIMARY KEY, title STRING, pdf_id INTEGER);
+        CREATE VIRTUAL TABLE section_embeddings_vec USING vec0(embedding float[4]);
+        CREATE TABLE section_vec_mapping(section_id INTEGER PRIMARY KEY, vec_rowid INTEGER NOT NULL);
+        INSERT INTO pdfs (id, title) VALUES (7, 'doc');
+        INSERT INTO pdf_sections VALUES (1, 'one', 7);
+        """
+    )
+    for value in (1.0, 2.0):  # the first vector was orphaned by a re-ingest
+        cursor.execute(
+            "INSERT INTO section_embeddings_vec (embedding) VALUES (?)",
+            [np.full(4, value, dtype=np.float32)],
+        )
+    cursor.execute("INSERT INTO section_vec_mapping VALUES (1, 2)")
+
+    # nothing says which model made them, so no model searches them
+    assert get_space(cursor, "anything") is None
+    other = get_or_create_space(cursor, "model-b", 4)
+    assert cursor.execute(f"SELECT COUNT(*) FROM {other.vec_table}").fetchone() == (0,)
+    assert has_legacy_embeddings(cursor)
+    with pytest.raises(ValueError):
+        adopt_legacy_embeddings(cursor, "model-b")
+
+    space = adopt_legacy_embeddings(cursor, "model-a")
+
+    assert cursor.execute(f"SELECT rowid, pdf_id FROM {space.vec_table}").fetchall() == [(2, 7)]
+    assert cursor.execute(f"SELECT * FROM {space.mapping_table}").fetchall() == [(1, 2)]
+    assert get_space(cursor, "model-a") == space
+    assert not has_legacy_embeddings(cursor)
+
+
+def test_setup_embedding_client_probes_once(monkeypatch):
+    calls: list[str] = []
+
+    def embedding(model, input):
+        calls.append(model)
+        return types.SimpleNamespace(
+            data=[types.SimpleNamespace(embedding=[0.0] * 12)]
+        )
+
+    monkeypatch.setattr(embeddings.litellm, "embedding", embedding)
+    monkeypatch.setattr(embeddings, "_probed_dimensions", {})
+
+    assert embeddings.setup_embedding_client("probe-model") == 12
+    assert embeddings.setup_embedding_client("probe-model") == 12
+    assert calls == ["probe-model"]
+
+
+def test_get_embeddings_uses_cache(cursor, monkeypatch):
+    calls: list[list[str]] = []
+
+    def embedding(model, input):
+        calls.append(list(input))
+        return types.SimpleNamespace(
+            data=[types.SimpleNamespace(embedding=[float(len(text)), 1.0]) for text in input]
+        )
+
+    monkeypatch.setattr(embeddings.litellm, "embedding", embedding)
+
+    first = embeddings.get_embeddings(["pump", "valve", "pump"], "model-a", cursor)
+    again = embeddings.get_embeddings(["valve", "gearbox"], "model-a", cursor)
+    other = embeddings.get_embeddings(["pump"], "model-b", cursor)
+
+    # duplicates are embedded once, and cached texts are never sent again
+    assert calls == [["pump", "valve"], ["gearbox"], ["pump"]]
+    assert [list(vector) for vector in first] == [[4.0, 1.0], [5.0, 1.0], [4.0, 1.0]]
+    np.testing.assert_array_equal(again[0], first[1])
+    np.testing.assert_array_equal(other[0], first[0])
+    count = cursor.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+    assert count == 4